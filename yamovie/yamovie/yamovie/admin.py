@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify, g, request, send_file, Response
+
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def jsonify_error_message(message, code: int):
+    return jsonify({"error_message": message}), code
+
+
+@admin_bp.before_request
+def check_profiler_access():
+    profiler = g.get('profiler')
+    if profiler is None or not profiler.enabled:
+        return jsonify_error_message("Профилирование отключено.", 404)
+    if profiler.token and not profiler.is_authorized(request.headers.get('X-Profile') or request.args.get('token')):
+        return jsonify_error_message("Нет доступа.", 403)
+    return None
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    recent = min(max(request.args.get('recent', 100, type=int), 1), 1000)
+    profiles = g.profiler.get_slowest_profiles(limit, recent)
+    for profile in profiles:
+        profile['hot_spots'] = g.profiler.get_hot_spots(profile['id'], limit=5) or []
+    return jsonify(profiles), 200
+
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id: str):
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in PROFILE_SORT_KEYS:
+        return jsonify_error_message(f"sort должен быть одним из: {', '.join(PROFILE_SORT_KEYS)}.", 400)
+    report = g.profiler.get_report(profile_id, request.args.get('limit', 40, type=int), sort)
+    if report is None:
+        return jsonify_error_message("Профиль не найден.", 404)
+    return Response(report, mimetype='text/plain'), 200
+
+
+@admin_bp.route('/profiles/<profile_id>/download', methods=['GET'])
+def download_profile(profile_id: str):
+    path = g.profiler.path(profile_id)
+    if path is None:
+        return jsonify_error_message("Профиль не найден.", 404)
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True)
@@ -1,23 +1,43 @@
-import requests
-from flask import Blueprint, jsonify, g, request
+from flask import Blueprint, jsonify, g, request, current_app, stream_with_context
 
-api = Blueprint('api', __name__)
+from movie_filters import get_movie_filters, get_movie_sort
+from pagination import get_page_args, add_page_headers, iter_pages
+from json_provider import stream_json_array
+from movie_import import import_movies
+from conditional_get import conditional_get
+from data_manager.search import search_terms
 
-API_KEY = 'ff742994'
-BASE_URL_KEY = f'http://www.omdbapi.com/?apikey={API_KEY}'
-IMDB_BASE_URL = 'https://www.imdb.com/title/'
+api = Blueprint('api', __name__)
 
 
 def jsonify_error_message(message, code: int):
     return jsonify({"error_message": message}), code
 
 
+def jsonify_page(get_page, cursor_type=int):
+    """
+    The requested page with the next page headers, or with ?stream=1
+    every item from the cursor on as one JSON array, read in pages of
+    limit items while it is being sent
+    :return: None if the first page could not be read
+    """
+    limit, after = get_page_args(cursor_type)
+    page = get_page(limit, after)
+    if page is None:
+        return None
+    if request.args.get('stream') != '1':
+        return add_page_headers(jsonify(page[0]), page[1])
+    return current_app.response_class(stream_with_context(stream_json_array(iter_pages(get_page, limit, page))),
+                                      mimetype='application/json')
+
+
 @api.route('/users', methods=['GET'])
+@conditional_get('users', 'users_movies', 'movies')
 def get_users():
-    users = g.users_data_manager.get_all_users()
-    if users is None:
+    response = jsonify_page(g.users_data_manager.get_users_page)
+    if response is None:
         return jsonify_error_message("Пользователь не найден", 404)
-    return jsonify(users), 200  # ok
+    return response, 200  # ok
 
 
 def validate_user_input(user_info: dict) -> list:
@@ -41,18 +61,22 @@ def add_user():
     new_user = {"user_name": user_name,
                 "movies": []}
 
-    if g.users_data_manager.add_user(new_user) is None:
+    if not g.users_data_manager.add_user(new_user):
         return jsonify_error_message("Не могу добавить пользователя.", 500)
 
     return jsonify_error_message("Пользователь успешно добавлен.", 201)
 
 
 @api.route('/users/<int:user_id>/movies', methods=['GET'])
+@conditional_get('users', 'users_movies', 'movies')
 def get_user_movies(user_id: int):
-    user = g.users_data_manager.get_user(user_id)
-    if user is None:
+    if not g.users_data_manager.has_user(user_id):
         return jsonify_error_message("Пользователь не найден", 404)
-    return jsonify(user['movies']), 200
+    response = jsonify_page(lambda limit, after:
+                            g.users_movies_data_manager.get_user_movies_page(user_id, limit, after))
+    if response is None:
+        return jsonify_error_message("Фильмы не найдены.", 404)
+    return response, 200
 
 
 @api.route('/users/<int:user_id>/movies/<int:movie_id>', methods=['POST'])
@@ -61,16 +85,57 @@ def add_user_movie(user_id: int, movie_id: int):
         'user_id': user_id,
         'movie_id': movie_id
     }
-    user = g.users_data_manager.get_user(user_id)
-    if user is None:
+    if not g.users_data_manager.has_user(user_id):
         return jsonify_error_message("Пользователь не найден", 404)
-    if movie_id in [user_movie['id'] for user_movie in user['movies']]:
+    added = g.users_movies_data_manager.add_user_movie(user_movie_info)
+    if added is False:
         return jsonify_error_message("Невозможно добавить фильм, так как он уже добавлен.", 400)
-    if g.users_movies_data_manager.add_user_movie(user_movie_info) is None:
+    if added is None:
         return jsonify_error_message("Невозможно добавить фильм.", 500)
     return jsonify({"message": "Фильм успешно добавлен пользователю."}), 201
 
 
+def jsonify_bulk_report(report: dict, rejected: list):
+    report['failed'] = sorted(report['failed'] + rejected, key=lambda failure: failure['index'])
+    return jsonify(report), 201 if not report['failed'] else 207  # multi-status
+
+
+def map_failed_indexes(report: dict, accepted_indexes: list) -> dict:
+    for failure in report['failed']:
+        failure['index'] = accepted_indexes[failure['index']]
+    return report
+
+
+@api.route('/users/<int:user_id>/movies/bulk', methods=['POST'])
+def add_user_movies(user_id: int):
+    movie_ids = request.json.get('movie_ids', [])
+    if not isinstance(movie_ids, list):
+        return jsonify_error_message("movie_ids должен быть списком.", 400)
+    if not g.users_data_manager.has_user(user_id):
+        return jsonify_error_message("Пользователь не найден", 404)
+
+    existing_movie_ids = g.movies_data_manager.get_existing_movie_ids(
+        {movie_id for movie_id in movie_ids if isinstance(movie_id, int)})
+    if existing_movie_ids is None:
+        return jsonify_error_message("Невозможно добавить фильмы.", 500)
+
+    accepted_indexes, rejected = [], []
+    for index, movie_id in enumerate(movie_ids):
+        if not isinstance(movie_id, int):
+            rejected.append({'index': index, 'error': 'Идентификатор фильма должен быть числом'})
+        elif movie_id not in existing_movie_ids:
+            rejected.append({'index': index, 'error': 'Фильм не найден'})
+        else:
+            accepted_indexes.append(index)
+
+    report = g.users_movies_data_manager.add_user_movies(user_id,
+                                                         [movie_ids[index] for index in accepted_indexes],
+                                                         current_app.config['BULK_CHUNK_SIZE'])
+    if report is None:
+        return jsonify_error_message("Невозможно добавить фильмы.", 500)
+    return jsonify_bulk_report(map_failed_indexes(report, accepted_indexes), rejected)
+
+
 @api.route('/users/movies/<int:user_movie_id>', methods=['DELETE'])
 def delete_user_movie(user_movie_id: int):
     user_movie = g.users_movies_data_manager.get_user_movie(user_movie_id)
@@ -84,17 +149,47 @@ def delete_user_movie(user_movie_id: int):
 
 
 @api.route('/movies', methods=['GET'])
+@conditional_get('movies', 'movies_reviews', 'users')
 def get_movies():
-    movies = g.movies_data_manager.get_movies()
-    if movies is None:
+    filters = get_movie_filters()
+    sort = get_movie_sort()
+    include_reviews = request.args.get('reviews') != 'false'
+    response = jsonify_page(lambda limit, after:
+                            g.movies_data_manager.get_movies_page(limit, after,
+                                                                  filters=filters,
+                                                                  sort=sort,
+                                                                  include_reviews=include_reviews),
+                            cursor_type=str)
+    if response is None:
         return jsonify_error_message("Фильмы не найдены.", 404)
-    return jsonify(movies), 200
+    return response, 200
 
 
-def fetch_movie_api_response(title: str) -> dict:
-    response = requests.get(f'{BASE_URL_KEY}&t={title}', timeout=5)
-    response.raise_for_status()
-    return response.json()
+AUTOCOMPLETE_LIMIT = 8
+MAX_AUTOCOMPLETE_LIMIT = 20
+
+
+@api.route('/movies/search', methods=['GET'])
+@conditional_get('movies')
+def search_movies():
+    query = request.args.get('q', '')
+    if not search_terms(query):
+        return jsonify_error_message("Введите слова для поиска.", 400)
+    response = jsonify_page(lambda limit, after: g.movies_data_manager.search_movies(query, limit, after))
+    if response is None:
+        return jsonify_error_message("Фильмы не найдены.", 404)
+    return response, 200
+
+
+@api.route('/movies/autocomplete', methods=['GET'])
+@conditional_get('movies')
+def autocomplete_movies():
+    limit = request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int)
+    movies = g.movies_data_manager.autocomplete_movies(request.args.get('q', ''),
+                                                       min(max(limit, 1), MAX_AUTOCOMPLETE_LIMIT))
+    if movies is None:
+        return jsonify_error_message("Фильмы не найдены.", 404)
+    return jsonify(movies), 200
 
 
 def isfloat(number: str) -> bool:
@@ -137,58 +232,95 @@ def get_error_messages(movie_info: dict) -> list:
     return error_messages
 
 
-def format_movie_info(response: dict, movie_name: str) -> dict:
-    return {'movie_name': response.get('Название', movie_name),
-            'director': response.get('Режиссер', ''),
-            'year': int(response.get('Год', '0000')[:4]),
-            'rating': float(response.get('imdbРейтинг', 0.0)),
-            'poster': response.get('Постер', ''),
-            'website': IMDB_BASE_URL + response.get('imdbID', '')
-            }
-
-
-def get_empty_info(movie_name: str) -> dict:
-    return {'movie_name': movie_name,
-            'director': '',
-            'year': 0,
-            'rating': 0.0,
-            'poster': '',
-            'website': ''
-            }
-
-
-def get_new_movie_info() -> dict | list:
+def get_new_movie_name() -> str | list:
     movie_name = request.json.get('movie_name', '')
 
-    error_messages = get_error_messages({'movie_name': movie_name})
+    error_messages = get_error_messages({'Название': movie_name})
     if error_messages:
         return error_messages
 
-    try:
-        response = fetch_movie_api_response(movie_name)
-        return format_movie_info(response, movie_name)
-
-    except (requests.exceptions.Timeout,
-            requests.exceptions.HTTPError,
-            requests.exceptions.ConnectionError,
-            requests.exceptions.RequestException):
-        print("Ошибка запроса. "
-              "Проверьте подключение к Интернету"
-              "и убедитесь, что веб-сайт доступен.")
-        return get_empty_info(movie_name)
+    return movie_name
 
 
 @api.route('/movies/add_movie', methods=['POST'])
 def add_new_movie():
-    new_movie_info = get_new_movie_info()
-    if isinstance(new_movie_info, list):
-        return jsonify_error_message(new_movie_info, 400)
+    movie_name = get_new_movie_name()
+    if isinstance(movie_name, list):
+        return jsonify_error_message(movie_name, 400)
 
-    if g.movies_data_manager.add_new_movie(new_movie_info) is None:
+    added = g.movies_data_manager.add_movie_for_enrichment(movie_name)
+    if added is False:
         return jsonify_error_message('Невозможно добавить фильм. '
-                                     'Фильм уже есть в базе данных.', 500)
+                                     'Фильм уже есть в базе данных.', 400)
+    if added is None:
+        return jsonify_error_message('Невозможно добавить фильм.', 500)
 
-    return jsonify({'message': 'Фильм успешно добавлен.'}), 201
+    g.enrichment_queue.notify()
+    return jsonify({'message': 'Фильм успешно добавлен.', 'enrichment_status': 'pending'}), 201
+
+
+def get_bulk_movie_info(movie_info) -> dict | list:
+    if not isinstance(movie_info, dict):
+        return ['Фильм должен быть объектом']
+
+    year = movie_info.get('year') or ''
+    rating = movie_info.get('rating') or ''
+    error_messages = get_error_messages({'Название': str(movie_info.get('movie_name', '')),
+                                         'Режиссер': str(movie_info.get('director', '')),
+                                         'Год': str(year),
+                                         'Рейтинг': str(rating)})
+    if error_messages:
+        return error_messages
+
+    return {'movie_name': movie_info['movie_name'],
+            'director': movie_info.get('director', ''),
+            'year': int(year or 0),
+            'rating': float(rating or 0.0),
+            'poster': movie_info.get('poster', ''),
+            'website': movie_info.get('website', '')
+            }
+
+
+@api.route('/movies/bulk', methods=['POST'])
+def add_new_movies():
+    movies_info = request.json.get('movies', [])
+    if not isinstance(movies_info, list):
+        return jsonify_error_message("movies должен быть списком.", 400)
+
+    accepted_indexes, new_movies_info, rejected = [], [], []
+    for index, movie_info in enumerate(movies_info):
+        new_movie_info = get_bulk_movie_info(movie_info)
+        if isinstance(new_movie_info, list):
+            rejected.append({'index': index, 'error': ' '.join(new_movie_info)})
+        else:
+            accepted_indexes.append(index)
+            new_movies_info.append(new_movie_info)
+
+    report = g.movies_data_manager.add_new_movies(new_movies_info, current_app.config['BULK_CHUNK_SIZE'])
+    if report is None:
+        return jsonify_error_message('Невозможно добавить фильмы.', 500)
+    return jsonify_bulk_report(map_failed_indexes(report, accepted_indexes), rejected)
+
+
+@api.route('/movies/import', methods=['POST'])
+def import_new_movies():
+    titles = request.json.get('titles', [])
+    if not isinstance(titles, list):
+        return jsonify_error_message("titles должен быть списком.", 400)
+    if len(titles) > current_app.config['OMDB_IMPORT_MAX_TITLES']:
+        return jsonify_error_message(f"Можно импортировать не более "
+                                     f"{current_app.config['OMDB_IMPORT_MAX_TITLES']} фильмов за раз.", 400)
+
+    accepted_indexes = [index for index, title in enumerate(titles) if isinstance(title, str) and title.strip()]
+    rejected = [{'index': index, 'error': 'Название фильма не может быть пустым'}
+                for index, title in enumerate(titles) if not (isinstance(title, str) and title.strip())]
+
+    report = import_movies(g.omdb_client, g.movies_data_manager,
+                           [titles[index].strip() for index in accepted_indexes],
+                           current_app.config['BULK_CHUNK_SIZE'])
+    if report is None:
+        return jsonify_error_message('Невозможно добавить фильмы.', 500)
+    return jsonify_bulk_report(map_failed_indexes(report, accepted_indexes), rejected)
 
 
 def get_movie_info() -> dict:
@@ -201,24 +333,22 @@ def get_movie_info() -> dict:
 
 def get_updated_movie_info(movie_id) -> dict | list:
     updated_movie_info = get_movie_info()
-    error_messages = get_error_messages(updated_movie_info)
+    # JSON numbers are validated like the strings of the HTML form
+    year = updated_movie_info['year'] or ''
+    rating = updated_movie_info['rating'] or ''
+    error_messages = get_error_messages({'Название': str(updated_movie_info['movie_name']),
+                                         'Режиссер': str(updated_movie_info['director']),
+                                         'Год': str(year),
+                                         'Рейтинг': str(rating)})
 
     if len(error_messages) != 0:
         return error_messages
 
-    year = updated_movie_info['year']
-    if len(year) == 0:
-        year = 0
-
-    rating = updated_movie_info['rating']
-    if len(rating) == 0:
-        rating = 0.0
-
     return {'id': movie_id,
             'movie_name': updated_movie_info['movie_name'],
             'director': updated_movie_info['director'],
-            'year': int(year),
-            'rating': float(rating)
+            'year': int(year or 0),
+            'rating': float(rating or 0.0)
             }
 
 
@@ -251,31 +381,60 @@ def delete_movie(movie_id: int):
 
 
 @api.route('/movies/<int:movie_id>/reviews', methods=['GET'])
+@conditional_get('movies', 'movies_reviews', 'users')
 def get_movie_reviews(movie_id: int):
-    movie = g.movies_data_manager.get_movie(movie_id)
-    if movie is None:
+    if not g.movies_data_manager.has_movie(movie_id):
         return jsonify_error_message("Фильм не найден", 404)
-    return jsonify(movie["movie_reviews"]), 200  # ok
+    sort = get_movie_sort()
+    response = jsonify_page(lambda limit, after:
+                            g.movies_reviews_data_manager.get_movie_reviews_page(movie_id, limit, after, sort),
+                            cursor_type=str)
+    if response is None:
+        return jsonify_error_message("Отзывы не найдены.", 404)
+    return response, 200  # ok
+
+
+@api.route('/users/<int:user_id>/reviews', methods=['GET'])
+@conditional_get('users', 'movies_reviews')
+def get_user_reviews(user_id: int):
+    if not g.users_data_manager.has_user(user_id):
+        return jsonify_error_message("Пользователь не найден", 404)
+    sort = get_movie_sort()
+    response = jsonify_page(lambda limit, after:
+                            g.movies_reviews_data_manager.get_user_reviews_page(user_id, limit, after, sort),
+                            cursor_type=str)
+    if response is None:
+        return jsonify_error_message("Отзывы не найдены.", 404)
+    return response, 200  # ok
+
+
+RECOMMENDATIONS_LIMIT = 20
+MAX_RECOMMENDATIONS_LIMIT = 100
+
+
+@api.route('/users/<int:user_id>/recommendations', methods=['GET'])
+@conditional_get('users_movies', 'movies_reviews', 'movie_neighbours', 'movies')
+def get_user_recommendations(user_id: int):
+    limit = request.args.get('limit', RECOMMENDATIONS_LIMIT, type=int)
+    movies = g.recommendation_engine.recommend_movies(user_id, min(max(limit, 1), MAX_RECOMMENDATIONS_LIMIT))
+    if movies is None:
+        return jsonify_error_message("Рекомендации не найдены.", 404)
+    # only an empty answer is worth the user lookup
+    if not movies and not g.users_data_manager.has_user(user_id):
+        return jsonify_error_message("Пользователь не найден", 404)
+    return jsonify(movies), 200
 
 
 def get_error_message(user_id: int, movie_id: int):
-    user = g.users_data_manager.get_user(user_id)
-    if user is None:
+    if not g.users_data_manager.has_user(user_id):
         return jsonify_error_message("Пользователь не найден", 404)
 
-    movie = g.movies_data_manager.get_movie(movie_id)
-    if not movie:
+    if not g.movies_data_manager.has_movie(movie_id):
         return jsonify_error_message("Фильм не найден.", 404)
 
-    user_movies = user.get('movies')
-    if movie_id not in [user_movie['id'] for user_movie in user_movies]:
+    if not g.users_movies_data_manager.has_user_movie(user_id, movie_id):
         return jsonify_error_message("Пользователь, не добавивший этот фильм в избранное, не может оставить отзыв.", 404)
 
-    movie_reviews = movie["movie_reviews"]
-    movie_reviews_user_ids = [movie_review["user_id"] for movie_review in movie_reviews]
-    if user_id in movie_reviews_user_ids:
-        return jsonify_error_message("Невозможно добавить отзыв, так как он уже добавлен.", 400)
-
     return False
 
 
@@ -289,11 +448,39 @@ def get_reviewed_info(user_id: int, movie_id: int) -> dict:
 
 @api.route('/users/<int:user_id>/add_movie_review/<int:movie_id>', methods=['POST'])
 def add_movie_review(user_id: int, movie_id: int):
-    if get_error_message(user_id, movie_id):
-        return get_error_message(user_id, movie_id)
+    error_message = get_error_message(user_id, movie_id)
+    if error_message:
+        return error_message
 
-    if g.movies_reviews_data_manager. \
-            add_movie_review(get_reviewed_info(user_id, movie_id)) is None:
+    added = g.movies_reviews_data_manager.add_movie_review(get_reviewed_info(user_id, movie_id))
+    if added is False:
+        return jsonify_error_message("Невозможно добавить отзыв, так как он уже добавлен.", 400)
+    if added is None:
         return jsonify_error_message("Невозможно добавить отзыв.", 500)
 
     return jsonify({"message": "Обзор фильма успешно добавлен для этого пользователя."}), 201
+
+
+@api.route('/omdb/stats', methods=['GET'])
+def get_omdb_stats():
+    cache = g.omdb_client.cache
+    if cache is None:
+        return jsonify_error_message("Кэш OMDb отключён.", 404)
+    return jsonify(cache.stats()), 200
+
+
+@api.route('/page_cache/stats', methods=['GET'])
+def get_page_cache_stats():
+    if g.page_cache is None:
+        return jsonify_error_message("Кэш страниц отключён.", 404)
+    return jsonify(g.page_cache.stats()), 200
+
+
+@api.route('/recommendations/status', methods=['GET'])
+def get_recommendations_status():
+    return jsonify(g.recommendation_engine.status()), 200
+
+
+@api.route('/enrichment/status', methods=['GET'])
+def get_enrichment_status():
+    return jsonify(g.enrichment_queue.status()), 200
@@ -1,34 +1,103 @@
-import os
+import time
+
+import click
 from flask import Flask, render_template, g
 from flask_cors import CORS
 from users_routes import users_bp
 from movies_routes import movies_bp
 from api import api
-from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from admin import admin_bp
+from config import DATABASE_URI, ENGINE_PROFILE_NAME, BULK_CHUNK_SIZE, get_engine_profile, \
+    OMDB_BASE_URL, OMDB_API_KEY, OMDB_TIMEOUT, OMDB_CACHE_PATH, OMDB_CACHE_TTL, \
+    OMDB_CACHE_NEGATIVE_TTL, OMDB_CACHE_MAX_ENTRIES, OMDB_MAX_WORKERS, OMDB_IMPORT_MAX_TITLES, \
+    ENRICHMENT_WORKERS, ENRICHMENT_MAX_ATTEMPTS, ENRICHMENT_BACKOFF_BASE, ENRICHMENT_BACKOFF_MAX, \
+    ENRICHMENT_POLL_INTERVAL, PAGE_CACHE_BACKEND, PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_DIRECTORY, \
+    JSON_PROVIDER, QUERY_BUDGET, QUERY_MAX_REPEATS, METRICS_DIRECTORY, METRICS_FLUSH_INTERVAL, \
+    PROFILING_ENABLED, PROFILING_TOKEN, PROFILING_DIRECTORY, PROFILING_MAX_PROFILES, \
+    RECOMMENDATIONS_TOP_K, RECOMMENDATIONS_BATCH_SIZE, RECOMMENDATIONS_REFRESH_INTERVAL, \
+    RECOMMENDATIONS_REBUILD_FRACTION
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db, \
+    create_missing_columns, create_missing_indexes, create_missing_search_indexes, rebuild_search_indexes, \
+    recompute_movie_review_aggregates
 from data_manager.users import Users
 from data_manager.movies import Movies
 from data_manager.users_movies import UsersMovies
 from data_manager.movies_reviews import MoviesReviews
 from data_manager.sqlite_data_manager import SQLiteDataManager
+from data_manager.sqlite_engine import apply_sqlite_pragmas, get_effective_pragmas
+from omdb_client import OMDbClient, OMDbCache
+from movie_import import import_movies
+from enrichment import EnrichmentQueue
+from page_cache import PageCache, LRUPageCacheBackend, FilePageCacheBackend
+from json_provider import get_json_provider_class
+from query_stats import QueryMonitor
+from metrics import MetricsRegistry, RequestMetrics
+from profiler import RequestProfiler
+from recommendations import RecommendationEngine
 
 app = Flask(__name__)
+app.json = get_json_provider_class(JSON_PROVIDER)(app)
 app.app_context()
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + \
-                                        os.path.join(basedir, 'data/yamovie.sqlite')
+engine_profile = get_engine_profile()
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_profile['engine_options']
+app.config['BULK_CHUNK_SIZE'] = BULK_CHUNK_SIZE
+app.config['OMDB_IMPORT_MAX_TITLES'] = OMDB_IMPORT_MAX_TITLES
 
 db.init_app(app)
 with app.app_context():
+    apply_sqlite_pragmas(db.engine, engine_profile['pragmas'])
     db.create_all()
+    create_missing_columns()
+    create_missing_indexes()
+    create_missing_search_indexes()
+    print(f'SQLite engine profile "{ENGINE_PROFILE_NAME}": '
+          f'{get_effective_pragmas(db.engine, engine_profile["pragmas"])}')
+    QueryMonitor(QUERY_BUDGET, QUERY_MAX_REPEATS).init_app(app, db.engine)
 
 users_data_manager = Users(SQLiteDataManager('id', User, db))
 movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
 users_movies_data_manager = UsersMovies(SQLiteDataManager('id', UserMovie, db))
 movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
 
+omdb_client = OMDbClient(OMDB_BASE_URL, OMDB_API_KEY,
+                         OMDbCache(OMDB_CACHE_PATH,
+                                   ttl=OMDB_CACHE_TTL,
+                                   negative_ttl=OMDB_CACHE_NEGATIVE_TTL,
+                                   max_entries=OMDB_CACHE_MAX_ENTRIES),
+                         timeout=OMDB_TIMEOUT,
+                         max_workers=OMDB_MAX_WORKERS)
+enrichment_queue = EnrichmentQueue(app, omdb_client,
+                                   workers=ENRICHMENT_WORKERS,
+                                   max_attempts=ENRICHMENT_MAX_ATTEMPTS,
+                                   backoff_base=ENRICHMENT_BACKOFF_BASE,
+                                   backoff_max=ENRICHMENT_BACKOFF_MAX,
+                                   poll_interval=ENRICHMENT_POLL_INTERVAL,
+                                   lease=OMDB_TIMEOUT * 4)
+recommendation_engine = RecommendationEngine(app,
+                                             top_k=RECOMMENDATIONS_TOP_K,
+                                             batch_size=RECOMMENDATIONS_BATCH_SIZE,
+                                             refresh_interval=RECOMMENDATIONS_REFRESH_INTERVAL,
+                                             rebuild_fraction=RECOMMENDATIONS_REBUILD_FRACTION)
+
+page_cache = None
+if PAGE_CACHE_BACKEND == 'lru':
+    page_cache = PageCache(LRUPageCacheBackend(PAGE_CACHE_MAX_ENTRIES))
+elif PAGE_CACHE_BACKEND == 'file':
+    page_cache = PageCache(FilePageCacheBackend(PAGE_CACHE_DIRECTORY, PAGE_CACHE_MAX_ENTRIES))
+if page_cache is not None:
+    for data_manager in (users_data_manager, movies_data_manager, users_movies_data_manager,
+                         movies_reviews_data_manager, enrichment_queue):
+        data_manager.add_write_listener(page_cache.invalidate)
+
+RequestMetrics(MetricsRegistry(METRICS_DIRECTORY, METRICS_FLUSH_INTERVAL)).init_app(app, omdb_client, page_cache)
+profiler = RequestProfiler(PROFILING_DIRECTORY, PROFILING_ENABLED, PROFILING_TOKEN, PROFILING_MAX_PROFILES)
+profiler.init_app(app)
+
 app.register_blueprint(users_bp)
 app.register_blueprint(movies_bp)
 app.register_blueprint(api, url_prefix='/api')
+app.register_blueprint(admin_bp, url_prefix='/admin')
 
 
 CORS(app)
@@ -40,6 +109,74 @@ def before_request():
     g.movies_data_manager = movies_data_manager
     g.users_movies_data_manager = users_movies_data_manager
     g.movies_reviews_data_manager = movies_reviews_data_manager
+    g.omdb_client = omdb_client
+    g.enrichment_queue = enrichment_queue
+    g.page_cache = page_cache
+    g.profiler = profiler
+    g.recommendation_engine = recommendation_engine
+    enrichment_queue.start()
+    recommendation_engine.start()
+
+
+@app.cli.command('repair-review-aggregates')
+def repair_review_aggregates():
+    """Recompute review_count and avg_user_rating of every movie"""
+    print(f'Updated {recompute_movie_review_aggregates()} movies')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Reindex the full-text search tables from their content tables"""
+    rebuild_search_indexes()
+    print('Rebuilt the search indexes')
+
+
+def print_recommendations_report(report: dict):
+    print(f"{report['mode'].capitalize()} ({report['backend']}): {report['movies']} movies, "
+          f"{report['interactions']} favourites, {report['neighbours']} neighbours written")
+    print(', '.join(f'{name} {seconds:.3f} s' for name, seconds in report['timings'].items()))
+    if not report['written'] and report['movies']:
+        print('Not written, another process stored newer neighbours meanwhile')
+
+
+@app.cli.command('rebuild-recommendations')
+def rebuild_recommendations():
+    """Recompute the neighbours of every movie and print the timings"""
+    print_recommendations_report(recommendation_engine.rebuild())
+
+
+@app.cli.command('refresh-recommendations')
+def refresh_recommendations():
+    """Recompute the neighbours of the movies whose favourites changed"""
+    print_recommendations_report(recommendation_engine.refresh())
+
+
+@app.cli.command('enrich-movies')
+def enrich_movies():
+    """Process the due movie enrichment jobs in the foreground"""
+    print(f'Enriched {enrichment_queue.run_pending()} movies')
+
+
+@app.cli.command('requeue-enrichment')
+def requeue_enrichment():
+    """Queue the movies whose enrichment failed for another round of attempts"""
+    print(f'Queued {enrichment_queue.requeue_failed()} movies')
+
+
+@app.cli.command('import-movies')
+@click.argument('titles_file', type=click.File('r', encoding='utf-8'), default='-')
+def import_movies_command(titles_file):
+    """Look up the titles (one per line) on OMDb and add the movies found"""
+    titles = [line.strip() for line in titles_file if line.strip()]
+    started = time.perf_counter()
+    report = import_movies(omdb_client, movies_data_manager, titles, BULK_CHUNK_SIZE)
+    if report is None:
+        print('Unable to add movies')
+        return
+    for failure in report['failed']:
+        print(f'{titles[failure["index"]]}: {failure["error"]}')
+    print(f'Imported {report["succeeded"]} of {len(titles)} movies '
+          f'in {time.perf_counter() - started:.2f}s')
 
 
 @app.route('/')
@@ -0,0 +1,109 @@
+"""
+Cost per listed movie of building the movie list from ORM instances
+against assembling it from flat row mappings (SQLiteDataManager.get_rows).
+
+Run from the application directory:
+    python -m benchmarks.row_projection --movies 20000 --reviews 3
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from flask import Flask
+
+from data_manager.data_models import User, Movie, MovieReview, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+ORM_LOADING_PLAN = {'movie_reviews': 'selectin',
+                    'movie_reviews.user': 'joined'}
+
+
+def create_data(movies: int, reviews_per_movie: int, users: int = 100):
+    db.create_all()
+    db.session.execute(db.insert(User), [{'id': number, 'user_name': f'User {number}'}
+                                         for number in range(1, users + 1)])
+    db.session.execute(db.insert(Movie), [{'id': number, 'movie_name': f'Movie {number}', 'director': 'Director',
+                                           'year': 1950 + number % 70, 'rating': number % 100 / 10,
+                                           'poster': '', 'website': ''}
+                                          for number in range(1, movies + 1)])
+    db.session.execute(db.insert(MovieReview), [{'user_id': (movie_id + number) % users + 1, 'movie_id': movie_id,
+                                                 'rating': float(number % 5 + 1), 'review_text': 'Review'}
+                                                for movie_id in range(1, movies + 1)
+                                                for number in range(reviews_per_movie)])
+    db.session.commit()
+
+
+def list_movies_from_instances(data_manager: SQLiteDataManager, limit: int) -> list:
+    """The movie list as built before get_rows: hydrate, then copy the attributes"""
+    movies = []
+    for movie in data_manager.get_page(limit, loading_plan=ORM_LOADING_PLAN):
+        movie_dict = {column: getattr(movie, column) for column in Movies.MOVIE_COLUMNS}
+        movie_dict['movie_reviews'] = [{"id": review.id,
+                                        "user_id": review.user_id,
+                                        "movie_id": review.movie_id,
+                                        "review_text": review.review_text,
+                                        "rating": review.rating,
+                                        "user": {"user_id": review.user.id,
+                                                 "user_name": review.user.user_name}}
+                                       for review in movie.movie_reviews]
+        movies.append(movie_dict)
+    return movies
+
+
+def list_movies_from_rows(movies_data_manager: Movies, limit: int) -> list:
+    return movies_data_manager.get_movies_page(limit)[0]
+
+
+def measure(function, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started)
+
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_bytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--movies', type=int, default=20000)
+    parser.add_argument('--reviews', type=int, default=3, help='reviews per movie')
+    parser.add_argument('--limit', type=int, default=5000, help='movies listed per call')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        create_data(args.movies, args.reviews)
+        data_manager = SQLiteDataManager('id', Movie, db)
+        movies_data_manager = Movies(data_manager)
+        assert list_movies_from_instances(data_manager, 10) == list_movies_from_rows(movies_data_manager, 10)
+
+        results = {'orm instances': measure(lambda: list_movies_from_instances(data_manager, args.limit),
+                                            args.repeat),
+                   'row mappings': measure(lambda: list_movies_from_rows(movies_data_manager, args.limit),
+                                           args.repeat)}
+
+    print(f'{args.limit} movies with {args.reviews} reviews each')
+    for name, result in results.items():
+        print(f"{name:>14}: {result['seconds'] / args.limit * 1e6:8.1f} us/movie  "
+              f"{result['peak_bytes'] / args.limit:8.0f} peak bytes/movie")
+    baseline, projected = results['orm instances'], results['row mappings']
+    print(f"{'speedup':>14}: {baseline['seconds'] / projected['seconds']:.2f}x  "
+          f"memory {baseline['peak_bytes'] / projected['peak_bytes']:.2f}x less")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,525 @@
+"""
+Timings of every public method of the Users, Movies, UsersMovies and
+MoviesReviews facades, on SQLite and on the JSON data managers, and of
+every api.py route through the Flask test client, on a synthetic
+catalog (see benchmarks.synthetic_data). Results are saved as JSON and
+two result files can be compared to flag regressions.
+
+Run from the application directory:
+    python -m benchmarks.suite run --size medium --output benchmarks/results/before.json
+    python -m benchmarks.suite compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from flask import Flask, g
+
+from api import api
+from config import BULK_CHUNK_SIZE, OMDB_IMPORT_MAX_TITLES, get_engine_profile
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from data_manager.indexed_json_data_manager import IndexedJSONDataManager
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.movies import Movies
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from data_manager.sqlite_engine import apply_sqlite_pragmas
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+from enrichment import EnrichmentQueue
+from omdb_client import OMDbClient, OMDbCache
+from page_cache import PageCache, LRUPageCacheBackend
+from recommendations import RecommendationEngine
+from benchmarks.synthetic_data import SyntheticCatalog, load_sqlite, write_json_files, \
+    add_size_arguments, catalog_from_arguments
+
+BACKENDS = ('sqlite', 'json', 'indexed_json')
+PAGE_SIZE = 20
+BATCH_SIZE = 20
+SAMPLE_SIZE = 50
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class Benchmark:
+    """
+    run(*arguments) is timed, with the arguments setup(iteration)
+    returns, or with the iteration number when there is no setup. A run
+    returning None, the facades' failure value, fails the benchmark.
+    """
+
+    def __init__(self, name: str, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+class BenchmarkFailure(Exception):
+    pass
+
+
+def summarize(seconds: list) -> dict:
+    ordered = sorted(seconds)
+    return {'runs': len(seconds),
+            'min': ordered[0],
+            'median': statistics.median(ordered),
+            'mean': statistics.fmean(ordered),
+            'p90': ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)],
+            'max': ordered[-1]}
+
+
+def measure(benchmark: Benchmark, repeat: int, time_budget: float, before_each=None) -> dict:
+    """
+    Up to repeat runs, fewer once they have taken time_budget seconds
+    :return: summarize() of the run times, or {'error': message}
+    """
+    seconds = []
+    try:
+        for iteration in range(repeat):
+            arguments = benchmark.setup(iteration) if benchmark.setup is not None else (iteration,)
+            if before_each is not None:
+                before_each()
+            gc.collect()
+            started = time.perf_counter()
+            result = benchmark.run(*arguments)
+            seconds.append(time.perf_counter() - started)
+            if result is None:
+                raise BenchmarkFailure('returned None')
+            if sum(seconds) >= time_budget:
+                break
+    except Exception as err:  # a failing benchmark is reported, the others still run
+        if before_each is not None:
+            before_each()
+        return {'error': f'{type(err).__name__}: {err}'}
+    return summarize(seconds)
+
+
+def pick(ids: list, iteration: int):
+    return ids[iteration % len(ids)]
+
+
+def read_benchmarks(facades: dict, catalog: SyntheticCatalog) -> list:
+    """The read methods, run on every backend"""
+    users, movies = facades['users'], facades['movies']
+    users_movies, movies_reviews = facades['users_movies'], facades['movies_reviews']
+    user_ids = catalog.sample_ids('users', SAMPLE_SIZE, catalog.users)
+    movie_ids = catalog.sample_ids('movies', SAMPLE_SIZE, catalog.movies)
+    favourite_ids = catalog.sample_ids('favourites', SAMPLE_SIZE, catalog.favourites)
+    movie_filters = {'year_from': 1990, 'year_to': 2010, 'name_prefix': 'Dark'}
+    return [
+        Benchmark('Users.get_all_users', lambda _: users.get_all_users()),
+        Benchmark('Users.get_users_page', lambda n: users.get_users_page(PAGE_SIZE, pick(user_ids, n) - 1)),
+        Benchmark('Users.has_user', lambda n: users.has_user(pick(user_ids, n))),
+        Benchmark('Users.get_user', lambda n: users.get_user(pick(user_ids, n))),
+        Benchmark('Movies.get_movies', lambda _: movies.get_movies()),
+        Benchmark('Movies.get_movies_page', lambda n: movies.get_movies_page(PAGE_SIZE, pick(movie_ids, n) - 1)),
+        Benchmark('Movies.get_movies_page[sort=-rating,reviews=false]',
+                  lambda _: movies.get_movies_page(PAGE_SIZE, sort='-rating', include_reviews=False)),
+        Benchmark('Movies.get_movies_page[filters]',
+                  lambda _: movies.get_movies_page(PAGE_SIZE, filters=movie_filters)),
+        Benchmark('Movies.get_candidate_movies_page',
+                  lambda n: movies.get_candidate_movies_page(pick(user_ids, n), PAGE_SIZE)),
+        Benchmark('Movies.search_movies', lambda n: movies.search_movies(str(pick(movie_ids, n)), PAGE_SIZE)),
+        Benchmark('Movies.search_movies[common]', lambda _: movies.search_movies('dark', PAGE_SIZE)),
+        Benchmark('Movies.autocomplete_movies', lambda _: movies.autocomplete_movies('da', 8)),
+        Benchmark('Movies.has_movie', lambda n: movies.has_movie(pick(movie_ids, n))),
+        Benchmark('Movies.get_existing_movie_ids', lambda _: movies.get_existing_movie_ids(movie_ids)),
+        Benchmark('Movies.get_movie', lambda n: movies.get_movie(pick(movie_ids, n))),
+        Benchmark('Movies.get_movie[reviews=false]',
+                  lambda n: movies.get_movie(pick(movie_ids, n), include_reviews=False)),
+        Benchmark('UsersMovies.get_all_users_movies', lambda _: users_movies.get_all_users_movies()),
+        Benchmark('UsersMovies.get_user_movies_page',
+                  lambda n: users_movies.get_user_movies_page(pick(user_ids, n), PAGE_SIZE)),
+        Benchmark('UsersMovies.has_user_movie',
+                  lambda n: users_movies.has_user_movie(pick(user_ids, n), pick(movie_ids, n))),
+        Benchmark('UsersMovies.get_user_movie', lambda n: users_movies.get_user_movie(pick(favourite_ids, n))),
+        Benchmark('MoviesReviews.get_movie_reviews', lambda _: movies_reviews.get_movie_reviews()),
+        Benchmark('MoviesReviews.get_movie_reviews_page[sort=-rating]',
+                  lambda n: movies_reviews.get_movie_reviews_page(pick(movie_ids, n), PAGE_SIZE, sort='-rating')),
+        Benchmark('MoviesReviews.get_user_reviews_page',
+                  lambda n: movies_reviews.get_user_reviews_page(pick(user_ids, n), PAGE_SIZE)),
+        Benchmark('MoviesReviews.has_movie_review',
+                  lambda n: movies_reviews.has_movie_review(pick(user_ids, n), pick(movie_ids, n))),
+    ]
+
+
+def new_movie_info(name: str) -> dict:
+    return {'movie_name': name, 'director': 'Bench Director', 'year': 2000, 'rating': 5.0,
+            'poster': '', 'website': ''}
+
+
+def insert_user(name: str, movie_ids=()) -> int:
+    """A user with the movies as favourites, added around the facades for a benchmark's setup"""
+    user = User(user_name=name, movies=[UserMovie(movie_id=movie_id) for movie_id in movie_ids])
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def insert_favourite(user_name: str, movie_id: int) -> int:
+    """The id of the favourite of a new user"""
+    favourite = UserMovie(user=User(user_name=user_name), movie_id=movie_id)
+    db.session.add(favourite)
+    db.session.commit()
+    return favourite.id
+
+
+def insert_movies(names: list) -> list:
+    new_movies = [Movie(**new_movie_info(name)) for name in names]
+    db.session.add_all(new_movies)
+    db.session.commit()
+    return [movie.id for movie in new_movies]
+
+
+def write_benchmarks(facades: dict, catalog: SyntheticCatalog) -> list:
+    """
+    The write methods, run on SQLite only: the facades hand model
+    instances to add_item, which the JSON data managers do not store.
+    Deletes remove rows their setup added, so the catalog stays whole.
+    """
+    users, movies = facades['users'], facades['movies']
+    users_movies, movies_reviews = facades['users_movies'], facades['movies_reviews']
+    user_ids = catalog.sample_ids('users', SAMPLE_SIZE, catalog.users)
+    movie_ids = catalog.sample_ids('movies', SAMPLE_SIZE, catalog.movies)
+    batch_movie_ids = movie_ids[:BATCH_SIZE]
+
+    def add_review(user_id: int, movie_id: int) -> tuple:
+        review = MovieReview(user_id=user_id, movie_id=movie_id, rating=5.0, review_text='Bench')
+        db.session.add(review)
+        db.session.commit()
+        return review.id,
+
+    return [
+        Benchmark('Users.add_user', lambda n: users.add_user({'user_name': f'Bench user {n}', 'movies': []})),
+        Benchmark('Users.update_user',
+                  lambda n: users.update_user({'id': pick(user_ids, n), 'user_name': f'Renamed user {n}'})),
+        Benchmark('Users.delete_user', users.delete_user,
+                  lambda n: (insert_user(f'Deleted user {n}', batch_movie_ids),)),
+        Benchmark('Movies.add_new_movie', lambda n: movies.add_new_movie(new_movie_info(f'Bench movie {n}'))),
+        Benchmark('Movies.add_movie_for_enrichment', lambda n: movies.add_movie_for_enrichment(f'Pending movie {n}')),
+        Benchmark('Movies.add_new_movies',
+                  lambda n: movies.add_new_movies([new_movie_info(f'Bulk movie {n} {number}')
+                                                   for number in range(BATCH_SIZE)])),
+        Benchmark('Movies.update_movie',
+                  lambda n: movies.update_movie({'id': pick(movie_ids, n), 'rating': float(n % 10 + 1)})),
+        Benchmark('Movies.update_movies',
+                  lambda n: movies.update_movies([{'id': movie_id, 'rating': float(n % 10 + 1)}
+                                                  for movie_id in batch_movie_ids])),
+        Benchmark('Movies.delete_movie', movies.delete_movie,
+                  lambda n: tuple(insert_movies([f'Deleted movie {n}']))),
+        Benchmark('Movies.delete_movies', movies.delete_movies,
+                  lambda n: (insert_movies([f'Deleted movie {n} {number}' for number in range(BATCH_SIZE)]),)),
+        Benchmark('UsersMovies.add_user_movie',
+                  lambda user_id, movie_id: users_movies.add_user_movie({'user_id': user_id, 'movie_id': movie_id}),
+                  lambda n: (insert_user(f'Favourite user {n}'), pick(movie_ids, n))),
+        Benchmark('UsersMovies.add_user_movies',
+                  lambda user_id: users_movies.add_user_movies(user_id, batch_movie_ids),
+                  lambda n: (insert_user(f'Favourites user {n}'),)),
+        Benchmark('UsersMovies.delete_user_movie', users_movies.delete_user_movie,
+                  lambda n: (insert_favourite(f'Unfavourite user {n}', pick(movie_ids, n)),)),
+        Benchmark('MoviesReviews.add_movie_review',
+                  lambda user_id, movie_id: movies_reviews.add_movie_review({'user_id': user_id, 'movie_id': movie_id,
+                                                                             'rating': 7.0, 'review_text': 'Bench'}),
+                  lambda n: (insert_user(f'Reviewer {n}', [pick(movie_ids, n)]), pick(movie_ids, n))),
+        Benchmark('MoviesReviews.delete_movie_review', movies_reviews.delete_movie_review,
+                  lambda n: add_review(insert_user(f'Unreviewer {n}', [pick(movie_ids, n)]), pick(movie_ids, n))),
+    ]
+
+
+def send(client, method: str, url: str, json_body=None):
+    response = client.open(url, method=method, json=json_body)
+    response.get_data()  # a streamed body is produced here
+    if response.status_code >= 400:
+        raise BenchmarkFailure(f'{method} {url} answered {response.status_code}')
+    return response
+
+
+def api_benchmarks(client, catalog: SyntheticCatalog, import_titles: list) -> list:
+    """Every api.py route, on SQLite; the OMDb import reads titles the cache already holds"""
+    user_ids = catalog.sample_ids('users', SAMPLE_SIZE, catalog.users)
+    movie_ids = catalog.sample_ids('movies', SAMPLE_SIZE, catalog.movies)
+    batch_movie_ids = movie_ids[:BATCH_SIZE]
+
+    def get(url: str) -> Benchmark:
+        return Benchmark(f'GET {url}', lambda n: send(client, 'GET', url.format(user_id=pick(user_ids, n),
+                                                                                  movie_id=pick(movie_ids, n))))
+
+    return [
+        get('/api/users'),
+        get('/api/users?limit=500&stream=1'),
+        get('/api/users/{user_id}/movies'),
+        get('/api/movies'),
+        get('/api/movies?reviews=false&sort=-rating'),
+        get('/api/movies?year_from=1990&year_to=2010&name_prefix=Dark'),
+        get('/api/movies?limit=500&reviews=false&stream=1'),
+        get('/api/movies/search?q=dark'),
+        get('/api/movies/search?q={movie_id}'),
+        get('/api/movies/autocomplete?q=da'),
+        get('/api/movies/{movie_id}/reviews?sort=-rating'),
+        get('/api/users/{user_id}/reviews'),
+        get('/api/omdb/stats'),
+        get('/api/page_cache/stats'),
+        get('/api/enrichment/status'),
+        get('/api/users/{user_id}/recommendations'),
+        get('/api/recommendations/status'),
+        Benchmark('POST /api/users', lambda n: send(client, 'POST', '/api/users', {'user_name': f'Api user {n}'})),
+        Benchmark('POST /api/users/<user_id>/movies/<movie_id>',
+                  lambda user_id, movie_id: send(client, 'POST', f'/api/users/{user_id}/movies/{movie_id}'),
+                  lambda n: (insert_user(f'Api favourite user {n}'), pick(movie_ids, n))),
+        Benchmark('POST /api/users/<user_id>/movies/bulk',
+                  lambda user_id: send(client, 'POST', f'/api/users/{user_id}/movies/bulk',
+                                       {'movie_ids': batch_movie_ids}),
+                  lambda n: (insert_user(f'Api favourites user {n}'),)),
+        Benchmark('DELETE /api/users/movies/<user_movie_id>',
+                  lambda user_movie_id: send(client, 'DELETE', f'/api/users/movies/{user_movie_id}'),
+                  lambda n: (insert_favourite(f'Api unfavourite user {n}', pick(movie_ids, n)),)),
+        Benchmark('POST /api/movies/add_movie',
+                  lambda n: send(client, 'POST', '/api/movies/add_movie', {'movie_name': f'Api movie {n}'})),
+        Benchmark('POST /api/movies/bulk',
+                  lambda n: send(client, 'POST', '/api/movies/bulk',
+                                 {'movies': [new_movie_info(f'Api bulk movie {n} {number}')
+                                             for number in range(BATCH_SIZE)]})),
+        Benchmark('POST /api/movies/import',
+                  lambda n: send(client, 'POST', '/api/movies/import',
+                                 {'titles': import_titles[n * BATCH_SIZE:(n + 1) * BATCH_SIZE]})),
+        Benchmark('PATCH /api/movies/update_movie/<movie_id>',
+                  lambda n: send(client, 'PATCH', f'/api/movies/update_movie/{pick(movie_ids, n)}',
+                                 {'movie_name': f'Api renamed movie {n}', 'director': 'Bench Director',
+                                  'year': '2001', 'rating': '6.5'})),
+        Benchmark('DELETE /api/movies/delete_movie/<movie_id>',
+                  lambda movie_id: send(client, 'DELETE', f'/api/movies/delete_movie/{movie_id}'),
+                  lambda n: tuple(insert_movies([f'Api deleted movie {n}']))),
+        Benchmark('POST /api/users/<user_id>/add_movie_review/<movie_id>',
+                  lambda user_id, movie_id: send(client, 'POST', f'/api/users/{user_id}/add_movie_review/{movie_id}',
+                                                 {'rating': 8.0, 'review_text': 'Api review'}),
+                  lambda n: (insert_user(f'Api reviewer {n}', [pick(movie_ids, n)]), pick(movie_ids, n))),
+    ]
+
+
+def create_sqlite_app(database_path: str, engine_profile: str,
+                      omdb_cache_path: str) -> tuple[Flask, dict, OMDbCache, RecommendationEngine]:
+    """
+    A Flask app with the api blueprint and the g attributes app.py
+    sets, on its own database
+    :return: app, {facade name: facade}, the OMDb cache, the recommendation engine
+    """
+    profile = get_engine_profile(engine_profile)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = profile['engine_options']
+    app.config['BULK_CHUNK_SIZE'] = BULK_CHUNK_SIZE
+    app.config['OMDB_IMPORT_MAX_TITLES'] = OMDB_IMPORT_MAX_TITLES
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, profile['pragmas'])
+    app.register_blueprint(api, url_prefix='/api')
+
+    facades = {'users': Users(SQLiteDataManager('id', User, db)),
+               'movies': Movies(SQLiteDataManager('id', Movie, db)),
+               'users_movies': UsersMovies(SQLiteDataManager('id', UserMovie, db)),
+               'movies_reviews': MoviesReviews(SQLiteDataManager('id', MovieReview, db))}
+    # nothing listens on the address: every import title must be in the cache
+    omdb_client = OMDbClient('http://127.0.0.1:9/', 'benchmark',
+                             OMDbCache(omdb_cache_path, ttl=86400, negative_ttl=86400, max_entries=100000))
+    enrichment_queue = EnrichmentQueue(app, omdb_client, workers=0)
+    recommendation_engine = RecommendationEngine(app, refresh_interval=0)
+    page_cache = PageCache(LRUPageCacheBackend(512))
+    for data_manager in (*facades.values(), enrichment_queue):
+        data_manager.add_write_listener(page_cache.invalidate)
+
+    @app.before_request
+    def before_request():
+        g.users_data_manager = facades['users']
+        g.movies_data_manager = facades['movies']
+        g.users_movies_data_manager = facades['users_movies']
+        g.movies_reviews_data_manager = facades['movies_reviews']
+        g.omdb_client = omdb_client
+        g.enrichment_queue = enrichment_queue
+        g.recommendation_engine = recommendation_engine
+        g.page_cache = page_cache
+
+    return app, facades, omdb_client.cache, recommendation_engine
+
+
+def cache_import_titles(cache: OMDbCache, count: int) -> list:
+    titles = [f'Imported movie {number}' for number in range(count)]
+    for number, title in enumerate(titles):
+        cache.set(title, {'Title': title, 'Year': '1999', 'Director': 'Imported Director',
+                          'imdbRating': '7.1', 'Poster': 'N/A', 'imdbID': f'tt9{number:06d}', 'Response': 'True'})
+    return titles
+
+
+def report_progress(backend: str, name: str, result: dict):
+    if 'error' in result:
+        print(f'{backend:>12}  {name:<62} FAILED {result["error"]}', file=sys.stderr)
+    else:
+        print(f'{backend:>12}  {name:<62} {result["median"] * 1000:10.3f} ms  ({result["runs"]} runs)',
+              file=sys.stderr)
+
+
+def run_sqlite(catalog: SyntheticCatalog, directory: str, repeat: int, time_budget: float,
+               engine_profile: str) -> dict:
+    app, facades, omdb_cache, recommendation_engine = create_sqlite_app(
+        os.path.join(directory, 'benchmark.sqlite'), engine_profile, os.path.join(directory, 'omdb_cache.sqlite'))
+    results = {}
+    with app.app_context():
+        load_sqlite(catalog)
+        recommendation_engine.rebuild()
+        import_titles = cache_import_titles(omdb_cache, repeat * BATCH_SIZE)
+        benchmarks = [*read_benchmarks(facades, catalog), *write_benchmarks(facades, catalog),
+                      *api_benchmarks(app.test_client(), catalog, import_titles)]
+        for benchmark in benchmarks:
+            results[benchmark.name] = measure(benchmark, repeat, time_budget, db.session.expunge_all)
+            report_progress('sqlite', benchmark.name, results[benchmark.name])
+    return results
+
+
+def run_json(catalog: SyntheticCatalog, directory: str, repeat: int, time_budget: float,
+             data_manager_class) -> dict:
+    paths = write_json_files(catalog, os.path.join(directory, data_manager_class.__name__))
+    facades = {'users': Users(data_manager_class(paths['users'], 'id')),
+               'movies': Movies(data_manager_class(paths['movies'], 'id',
+                                                   search_weights=Movie.__search_columns__)),
+               'users_movies': UsersMovies(data_manager_class(paths['users_movies'], 'id')),
+               'movies_reviews': MoviesReviews(data_manager_class(paths['movies_reviews'], 'id'))}
+    backend = 'json' if data_manager_class is JSONDataManager else 'indexed_json'
+    results = {}
+    for benchmark in read_benchmarks(facades, catalog):
+        results[benchmark.name] = measure(benchmark, repeat, time_budget)
+        report_progress(backend, benchmark.name, results[benchmark.name])
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(catalog: SyntheticCatalog, backends=BACKENDS, repeat: int = 20, time_budget: float = 1.0,
+              engine_profile: str = 'production') -> dict:
+    """
+    :return: {'created_at', 'commit', 'environment', 'catalog', 'repeat',
+              'time_budget', 'results': {backend: {benchmark name: summarize() or {'error'}}}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='yamovie-benchmark-') as directory:
+        for backend in backends:
+            if backend == 'sqlite':
+                results[backend] = run_sqlite(catalog, directory, repeat, time_budget, engine_profile)
+            else:
+                data_manager_class = JSONDataManager if backend == 'json' else IndexedJSONDataManager
+                results[backend] = run_json(catalog, directory, repeat, time_budget, data_manager_class)
+    return {'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'environment': {'python': platform.python_version(),
+                            'sqlite': sqlite3.sqlite_version,
+                            'platform': platform.platform(),
+                            'engine_profile': engine_profile},
+            'catalog': catalog.describe(),
+            'repeat': repeat,
+            'time_budget': time_budget,
+            'results': results}
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1, min_delta: float = 0.0005) -> list:
+    """
+    Median times of the benchmarks both runs have. A benchmark is a
+    regression when it is more than threshold (a fraction) slower and
+    the difference is above min_delta seconds, which keeps the noise of
+    sub-millisecond calls out, or when it fails only in current.
+    :return: [{'backend', 'name', 'baseline', 'current', 'ratio', 'status'}]
+    """
+    rows = []
+    for backend, results in current['results'].items():
+        for name, result in results.items():
+            previous = baseline['results'].get(backend, {}).get(name)
+            row = {'backend': backend, 'name': name, 'baseline': None, 'current': None, 'ratio': None}
+            if previous is None:
+                row['status'] = 'new'
+            elif 'error' in result:
+                row['status'] = 'failing' if 'error' in previous else 'regression'
+            elif 'error' in previous:
+                row.update(current=result['median'], status='fixed')
+            else:
+                row.update(baseline=previous['median'], current=result['median'],
+                           ratio=result['median'] / previous['median'] if previous['median'] else None)
+                delta = result['median'] - previous['median']
+                if delta > min_delta and delta > previous['median'] * threshold:
+                    row['status'] = 'regression'
+                elif -delta > min_delta and -delta > result['median'] * threshold:
+                    row['status'] = 'improvement'
+                else:
+                    row['status'] = 'unchanged'
+            rows.append(row)
+    return rows
+
+
+def print_comparison(rows: list):
+    for row in rows:
+        baseline = f'{row["baseline"] * 1000:10.3f}' if row['baseline'] is not None else ' ' * 10
+        current = f'{row["current"] * 1000:10.3f}' if row['current'] is not None else ' ' * 10
+        ratio = f'{row["ratio"]:6.2f}x' if row['ratio'] is not None else ' ' * 7
+        print(f'{row["backend"]:>12}  {row["name"]:<62} {baseline} {current} ms {ratio}  {row["status"]}')
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as results_file:
+        return json.load(results_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time the benchmarks and save the results')
+    add_size_arguments(run_parser)
+    run_parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    run_parser.add_argument('--repeat', type=int, default=20, help='most runs per benchmark')
+    run_parser.add_argument('--time-budget', type=float, default=1.0,
+                            help='seconds after which a benchmark stops repeating')
+    run_parser.add_argument('--engine-profile', default='production')
+    run_parser.add_argument('--output', help=f'results file, by default a new file in {RESULTS_DIRECTORY}')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='slowdown, as a fraction of the baseline median, that is a regression')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                                help='slowdowns below this many milliseconds are noise')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_suite(catalog_from_arguments(args), args.backends, args.repeat, args.time_budget,
+                            args.engine_profile)
+        output = args.output or os.path.join(RESULTS_DIRECTORY,
+                                             f'{datetime.now().strftime("%Y%m%dT%H%M%S")}_{args.size}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f'Results saved to {output}')
+        return
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline['catalog'] != current['catalog']:
+        print(f'Warning: the catalogs differ, {baseline["catalog"]} and {current["catalog"]}', file=sys.stderr)
+    rows = compare_results(baseline, current, args.threshold, args.min_delta_ms / 1000)
+    print_comparison(rows)
+    regressions = [row for row in rows if row['status'] == 'regression']
+    print(f'{len(regressions)} regressions in {len(rows)} benchmarks')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Reproducible synthetic catalogs of users, movies, favourites and
+reviews, loaded into SQLite through the models or written as the NDJSON
+documents the JSON data managers read.
+
+Write the NDJSON files of a catalog from the application directory:
+    python -m benchmarks.synthetic_data --size small --json-directory /tmp/catalog
+"""
+import argparse
+import json
+import os
+import random
+from itertools import accumulate, islice
+from typing import Iterator
+
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db, recompute_movie_review_aggregates
+
+SIZES = {'tiny': {'users': 20, 'movies': 50, 'favourites': 200, 'reviews': 80},
+         'small': {'users': 500, 'movies': 1000, 'favourites': 10000, 'reviews': 5000},
+         'medium': {'users': 5000, 'movies': 10000, 'favourites': 100000, 'reviews': 50000},
+         'large': {'users': 50000, 'movies': 100000, 'favourites': 1000000, 'reviews': 500000}}
+
+WORDS = ('Dark', 'Silent', 'Lost', 'Golden', 'Last', 'Hidden', 'Broken', 'Winter', 'Red', 'Little',
+         'River', 'Night', 'City', 'Storm', 'Garden', 'Empire', 'Shadow', 'Station', 'Island', 'Song')
+FIRST_NAMES = ('Anna', 'Boris', 'Clara', 'Dmitri', 'Elena', 'Felix', 'Galina', 'Igor', 'Katya', 'Leon',
+               'Maria', 'Nikolai', 'Olga', 'Pavel', 'Sofia', 'Timur', 'Vera', 'Yuri', 'Zoya', 'Oleg')
+LAST_NAMES = ('Ivanov', 'Petrova', 'Smirnov', 'Kuznetsova', 'Popov', 'Sokolova', 'Lebedev', 'Kozlova',
+              'Novikov', 'Morozova', 'Volkov', 'Orlova', 'Zaitsev', 'Pavlova', 'Semenov', 'Golubeva')
+REVIEW_PHRASES = ('A slow start, but worth it.', 'The score carries every scene.', 'Too long by half.',
+                  'Great performances all round.', 'I would watch it again.', 'The ending fell flat.',
+                  'Beautifully shot.', 'Not for everyone.', 'A modern classic.', 'Forgettable.')
+
+MOVIE_FIELDS = ('movie_name', 'director', 'year', 'rating', 'poster', 'website')
+# favourites and reviews pick movies with a Zipf-like popularity
+POPULARITY_EXPONENT = 0.8
+
+
+class SyntheticCatalog:
+    """
+    Users, movies, favourites and reviews generated from a seed. Every
+    iteration yields the same rows, so the catalog is never held in
+    memory by the SQLite loader. Favourites are distinct (user, movie)
+    pairs and reviews are left on a random subset of them, as the API
+    only lets users review their favourites.
+    """
+
+    def __init__(self, users: int, movies: int, favourites: int, reviews: int, seed: int = 0):
+        if favourites > users * movies // 2:
+            raise ValueError(f'{favourites} favourites do not fit {users} users and {movies} movies, '
+                             f'at most {users * movies // 2} are generated')
+        if reviews > favourites:
+            raise ValueError(f'reviews ({reviews}) are left on favourites ({favourites}), '
+                             f'so there can be no more of them')
+        self.users = users
+        self.movies = movies
+        self.favourites = favourites
+        self.reviews = reviews
+        self.seed = seed
+
+    @classmethod
+    def from_size(cls, size: str, seed: int = 0, **overrides):
+        """A catalog of the named SIZES, with any count given in overrides"""
+        counts = {**SIZES[size], **{name: count for name, count in overrides.items() if count is not None}}
+        return cls(seed=seed, **counts)
+
+    def describe(self) -> dict:
+        return {'users': self.users, 'movies': self.movies, 'favourites': self.favourites,
+                'reviews': self.reviews, 'seed': self.seed}
+
+    def _random(self, name: str) -> random.Random:
+        return random.Random(f'{self.seed}:{name}')
+
+    def iter_users(self) -> Iterator[dict]:
+        rng = self._random('users')
+        for user_id in range(1, self.users + 1):
+            yield {'id': user_id,
+                   'user_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {user_id}'}
+
+    def iter_movies(self) -> Iterator[dict]:
+        rng = self._random('movies')
+        directors = [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+                     for _ in range(max(self.movies // 20, 1))]
+        for movie_id in range(1, self.movies + 1):
+            # the name's first word makes name_prefix filters selective
+            yield {'id': movie_id,
+                   'movie_name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {movie_id}',
+                   'director': rng.choice(directors),
+                   'year': rng.randint(1920, 2024),
+                   'rating': round(rng.uniform(1.0, 10.0), 1),
+                   'poster': f'https://posters.example.com/{movie_id}.jpg',
+                   'website': f'https://www.imdb.com/title/tt{movie_id:07d}'}
+
+    def iter_favourites(self) -> Iterator[dict]:
+        rng = self._random('favourites')
+        ranked_movie_ids = list(range(1, self.movies + 1))
+        rng.shuffle(ranked_movie_ids)
+        cumulative_weights = list(accumulate(1 / rank ** POPULARITY_EXPONENT
+                                             for rank in range(1, self.movies + 1)))
+        pairs = set()
+        favourite_id = 0
+        while favourite_id < self.favourites:
+            batch = min(self.favourites - favourite_id, 10000)
+            movie_ids = rng.choices(ranked_movie_ids, cum_weights=cumulative_weights, k=batch)
+            for movie_id in movie_ids:
+                user_id = rng.randint(1, self.users)
+                pair = user_id * (self.movies + 1) + movie_id
+                if pair in pairs:
+                    continue
+                pairs.add(pair)
+                favourite_id += 1
+                yield {'id': favourite_id, 'user_id': user_id, 'movie_id': movie_id}
+
+    def iter_reviews(self) -> Iterator[dict]:
+        rng = self._random('reviews')
+        reviewed = set(rng.sample(range(self.favourites), self.reviews))
+        review_id = 0
+        for position, favourite in enumerate(self.iter_favourites()):
+            if position not in reviewed:
+                continue
+            review_id += 1
+            yield {'id': review_id,
+                   'user_id': favourite['user_id'],
+                   'movie_id': favourite['movie_id'],
+                   'rating': float(rng.randint(1, 10)),
+                   'review_text': ' '.join(rng.sample(REVIEW_PHRASES, rng.randint(1, 3)))}
+
+    def sample_ids(self, name: str, count: int, upper: int) -> list:
+        """count ids from 1 to upper, the same ones for every run of the seed"""
+        return self._random(f'sample:{name}').sample(range(1, upper + 1), min(count, upper))
+
+
+def chunks(rows, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def load_sqlite(catalog: SyntheticCatalog, chunk_size: int = 10000):
+    """
+    Create the tables in the app's database and insert the catalog;
+    the bulk inserts skip the review listeners, so the movie review
+    aggregates are recomputed afterwards
+    """
+    db.create_all()
+    for model, rows in ((User, catalog.iter_users()),
+                        (Movie, catalog.iter_movies()),
+                        (UserMovie, catalog.iter_favourites()),
+                        (MovieReview, catalog.iter_reviews())):
+        for chunk in chunks(rows, chunk_size):
+            db.session.execute(db.insert(model), chunk)
+        db.session.commit()
+    recompute_movie_review_aggregates()
+
+
+JSON_FILE_NAMES = {'users': 'users.ndjson',
+                   'movies': 'movies.ndjson',
+                   'users_movies': 'users_movies.ndjson',
+                   'movies_reviews': 'movies_reviews.ndjson'}
+
+
+def write_json_files(catalog: SyntheticCatalog, directory: str) -> dict:
+    """
+    Write the catalog as one NDJSON file per facade, each item embedding
+    the related items the facade reads (the column paths of get_rows)
+    :return: {'users': path, 'movies': path, 'users_movies': path, 'movies_reviews': path}
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, file_name) for name, file_name in JSON_FILE_NAMES.items()}
+    user_names = {user['id']: user['user_name'] for user in catalog.iter_users()}
+    movies = {movie['id']: movie for movie in catalog.iter_movies()}
+
+    favourites_by_user, favourite_user_ids_by_movie = {}, {}
+    with open(paths['users_movies'], 'w', encoding='utf-8') as users_movies_file:
+        for favourite in catalog.iter_favourites():
+            movie = movies[favourite['movie_id']]
+            favourites_by_user.setdefault(favourite['user_id'], []).append({'id': favourite['id'], 'movie': movie})
+            favourite_user_ids_by_movie.setdefault(favourite['movie_id'], []).append(favourite['user_id'])
+            users_movies_file.write(json.dumps({**favourite, 'user': {'user_name': user_names[favourite['user_id']]},
+                                                 'movie': movie}) + '\n')
+
+    reviews_by_movie = {}
+    with open(paths['movies_reviews'], 'w', encoding='utf-8') as reviews_file:
+        for review in catalog.iter_reviews():
+            review = {**review, 'user': {'user_name': user_names[review['user_id']]}}
+            reviews_by_movie.setdefault(review['movie_id'], []).append(review)
+            reviews_file.write(json.dumps(review) + '\n')
+
+    with open(paths['users'], 'w', encoding='utf-8') as users_file:
+        for user_id, user_name in user_names.items():
+            users_file.write(json.dumps({'id': user_id, 'user_name': user_name,
+                                         'movies': favourites_by_user.get(user_id, [])}) + '\n')
+
+    with open(paths['movies'], 'w', encoding='utf-8') as movies_file:
+        for movie_id, movie in movies.items():
+            reviews = reviews_by_movie.get(movie_id, [])
+            movies_file.write(json.dumps({**movie,
+                                          'review_count': len(reviews),
+                                          'avg_user_rating': (sum(review['rating'] for review in reviews)
+                                                              / len(reviews) if reviews else 0.0),
+                                          'enrichment_status': 'done',
+                                          'movie_reviews': reviews,
+                                          'users': [{'user_id': user_id} for user_id
+                                                    in favourite_user_ids_by_movie.get(movie_id, [])]})
+                              + '\n')
+    return paths
+
+
+def add_size_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    for name in ('users', 'movies', 'favourites', 'reviews'):
+        parser.add_argument(f'--{name}', type=int, help=f'overrides the number of {name} of --size')
+
+
+def catalog_from_arguments(args) -> SyntheticCatalog:
+    return SyntheticCatalog.from_size(args.size, args.seed, users=args.users, movies=args.movies,
+                                      favourites=args.favourites, reviews=args.reviews)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_size_arguments(parser)
+    parser.add_argument('--json-directory', required=True)
+    args = parser.parse_args()
+
+    catalog = catalog_from_arguments(args)
+    for name, path in write_json_files(catalog, args.json_directory).items():
+        print(f'{name:>14}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import pytest
+
+from benchmarks.suite import Benchmark, measure, compare_results, create_sqlite_app
+from benchmarks.synthetic_data import SyntheticCatalog, load_sqlite, write_json_files
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.movies import Movies
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+
+catalog = SyntheticCatalog.from_size('tiny', seed=7)
+
+
+def sorted_by(items: list, key: str) -> list:
+    return sorted(items, key=lambda item: item[key])
+
+
+def test_catalog_is_reproducible_and_consistent():
+    favourites = list(catalog.iter_favourites())
+    reviews = list(catalog.iter_reviews())
+    assert favourites == list(SyntheticCatalog.from_size('tiny', seed=7).iter_favourites())
+    assert favourites != list(SyntheticCatalog.from_size('tiny', seed=8).iter_favourites())
+    assert len(favourites) == catalog.favourites and len(reviews) == catalog.reviews
+    pairs = {(favourite['user_id'], favourite['movie_id']) for favourite in favourites}
+    assert len(pairs) == len(favourites)
+    assert {(review['user_id'], review['movie_id']) for review in reviews} <= pairs
+
+
+def test_catalog_rejects_more_reviews_than_favourites():
+    with pytest.raises(ValueError):
+        SyntheticCatalog(users=10, movies=10, favourites=20, reviews=30)
+
+
+def test_sqlite_and_json_facades_read_the_same_catalog(tmp_path):
+    app, sqlite_facades, _, _ = create_sqlite_app(str(tmp_path / 'catalog.sqlite'), 'testing',
+                                                  str(tmp_path / 'omdb_cache.sqlite'))
+    paths = write_json_files(catalog, str(tmp_path / 'json'))
+    json_facades = {'users': Users(JSONDataManager(paths['users'], 'id')),
+                    'movies': Movies(JSONDataManager(paths['movies'], 'id')),
+                    'users_movies': UsersMovies(JSONDataManager(paths['users_movies'], 'id')),
+                    'movies_reviews': MoviesReviews(JSONDataManager(paths['movies_reviews'], 'id'))}
+
+    def read(facades: dict, user_id: int, movie_id: int) -> dict:
+        user = facades['users'].get_user(user_id)
+        movie = facades['movies'].get_movie(movie_id)
+        return {'user': {**user, 'movies': sorted_by(user['movies'], 'user_movie_id')},
+                'movie': {**movie, 'avg_user_rating': pytest.approx(movie['avg_user_rating']),
+                          'movie_reviews': sorted_by(movie['movie_reviews'], 'id')},
+                'movies_page': facades['movies'].get_movies_page(10, sort='-rating', include_reviews=False),
+                'candidates': facades['movies'].get_candidate_movies_page(user_id, 10),
+                'user_movies': facades['users_movies'].get_user_movies_page(user_id, 100),
+                'reviews': facades['movies_reviews'].get_movie_reviews_page(movie_id, 100, sort='-rating')}
+
+    with app.app_context():
+        load_sqlite(catalog)
+        for user_id, movie_id in zip(catalog.sample_ids('users', 5, catalog.users),
+                                     catalog.sample_ids('movies', 5, catalog.movies)):
+            assert read(sqlite_facades, user_id, movie_id) == read(json_facades, user_id, movie_id)
+        assert sqlite_facades['users_movies'].get_all_users_movies() == \
+               json_facades['users_movies'].get_all_users_movies()
+
+
+def test_failing_benchmark_is_reported():
+    assert measure(Benchmark('none', lambda _: None), repeat=3, time_budget=1.0) == {
+        'error': 'BenchmarkFailure: returned None'}
+    result = measure(Benchmark('sum', lambda n: sum(range(n))), repeat=3, time_budget=1.0)
+    assert result['runs'] == 3 and result['min'] <= result['median'] <= result['max']
+
+
+def test_compare_flags_slowdowns_above_the_threshold_and_noise_floor():
+    def results(**medians) -> dict:
+        return {'results': {'sqlite': {name: {'error': median} if isinstance(median, str) else {'median': median}
+                                       for name, median in medians.items()}}}
+
+    baseline = results(slower=0.010, noisy=0.0001, faster=0.010, broken=0.010, failing='TypeError')
+    current = results(slower=0.012, noisy=0.0003, faster=0.005, broken='TypeError', failing='TypeError',
+                      added=0.010)
+    statuses = {row['name']: row['status'] for row in compare_results(baseline, current, threshold=0.1,
+                                                                      min_delta=0.0005)}
+    assert statuses == {'slower': 'regression', 'noisy': 'unchanged', 'faster': 'improvement',
+                        'broken': 'regression', 'failing': 'failing', 'added': 'new'}
@@ -0,0 +1,34 @@
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+from data_manager.data_models import get_table_versions
+
+
+def conditional_get(*table_names):
+    """
+    ETag the view's response with the change versions of the tables it
+    reads and answer a matching If-None-Match with 304 before the view
+    runs. The versions are read first, so a write racing with the view
+    can only make the ETag older than the body, never newer.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(table_names)
+            if versions is None:
+                return view(*args, **kwargs)
+
+            etag = hashlib.sha1(f'{request.full_path} {sorted(versions.items())}'.encode()).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'  # revalidate on every poll
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+DATABASE_URI = os.environ.get('YAMOVIE_DATABASE_URI',
+                              'sqlite:///' + os.path.join(basedir, 'data/yamovie.sqlite'))
+
+# WAL lets readers in other gunicorn workers run while one worker writes;
+# synchronous=NORMAL is durable in WAL mode except for the last commits
+# before a power loss
+SERVER_PRAGMAS = {'journal_mode': 'WAL',
+                  'synchronous': 'NORMAL',
+                  'busy_timeout': 5000,
+                  'temp_store': 'MEMORY'}
+
+ENGINE_PROFILES = {
+    'development': {
+        'pragmas': {**SERVER_PRAGMAS,
+                    'cache_size': -16000,  # KiB
+                    'mmap_size': 64 * 1024 * 1024},
+        'engine_options': {'pool_pre_ping': True},
+    },
+    'production': {
+        'pragmas': {**SERVER_PRAGMAS,
+                    'cache_size': -64000,  # KiB
+                    'mmap_size': 256 * 1024 * 1024},
+        'engine_options': {'pool_size': 10,
+                           'max_overflow': 10,
+                           'pool_timeout': 30,
+                           'pool_recycle': 3600,
+                           'pool_pre_ping': True},
+    },
+    'testing': {
+        'pragmas': {'synchronous': 'OFF',
+                    'temp_store': 'MEMORY'},
+        'engine_options': {},
+    },
+}
+
+BULK_CHUNK_SIZE = int(os.environ.get('YAMOVIE_BULK_CHUNK_SIZE', 1000))
+
+ENGINE_PROFILE_NAME = os.environ.get('YAMOVIE_ENV', 'development')
+
+
+def get_engine_profile(name: str = ENGINE_PROFILE_NAME) -> dict:
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f'Unknown engine profile {name!r}, '
+                         f'expected one of {", ".join(ENGINE_PROFILES)}')
+    return ENGINE_PROFILES[name]
+
+
+OMDB_BASE_URL = os.environ.get('YAMOVIE_OMDB_BASE_URL', 'http://www.omdbapi.com/')
+OMDB_API_KEY = os.environ.get('YAMOVIE_OMDB_API_KEY', 'ff742994')
+OMDB_TIMEOUT = float(os.environ.get('YAMOVIE_OMDB_TIMEOUT', 5))
+OMDB_CACHE_PATH = os.environ.get('YAMOVIE_OMDB_CACHE_PATH',
+                                 os.path.join(basedir, 'data/omdb_cache.sqlite'))
+OMDB_CACHE_TTL = int(os.environ.get('YAMOVIE_OMDB_CACHE_TTL', 7 * 24 * 3600))
+# titles OMDb does not know are retried sooner, they may be added there later
+OMDB_CACHE_NEGATIVE_TTL = int(os.environ.get('YAMOVIE_OMDB_CACHE_NEGATIVE_TTL', 24 * 3600))
+OMDB_CACHE_MAX_ENTRIES = int(os.environ.get('YAMOVIE_OMDB_CACHE_MAX_ENTRIES', 10000))
+OMDB_MAX_WORKERS = int(os.environ.get('YAMOVIE_OMDB_MAX_WORKERS', 8))
+OMDB_IMPORT_MAX_TITLES = int(os.environ.get('YAMOVIE_OMDB_IMPORT_MAX_TITLES', 1000))
+
+# movies added through the add_movie forms get their OMDb fields from
+# background workers; the testing profile runs none, see flask enrich-movies
+ENRICHMENT_WORKERS = int(os.environ.get('YAMOVIE_ENRICHMENT_WORKERS',
+                                        0 if ENGINE_PROFILE_NAME == 'testing' else 2))
+ENRICHMENT_MAX_ATTEMPTS = int(os.environ.get('YAMOVIE_ENRICHMENT_MAX_ATTEMPTS', 8))
+ENRICHMENT_BACKOFF_BASE = float(os.environ.get('YAMOVIE_ENRICHMENT_BACKOFF_BASE', 2.0))  # seconds
+ENRICHMENT_BACKOFF_MAX = float(os.environ.get('YAMOVIE_ENRICHMENT_BACKOFF_MAX', 3600))
+ENRICHMENT_POLL_INTERVAL = float(os.environ.get('YAMOVIE_ENRICHMENT_POLL_INTERVAL', 5.0))
+
+# 'file' shares rendered HTML pages (and their invalidations) between the
+# server processes of one host; 'lru' keeps them per process and serves
+# stale pages when there is more than one gunicorn worker
+PAGE_CACHE_BACKEND = os.environ.get('YAMOVIE_PAGE_CACHE_BACKEND', 'file')
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('YAMOVIE_PAGE_CACHE_MAX_ENTRIES', 512))
+PAGE_CACHE_DIRECTORY = os.environ.get('YAMOVIE_PAGE_CACHE_DIRECTORY',
+                                      os.path.join(basedir, 'data/page_cache'))
+
+# 'orjson' falls back to the stdlib encoder when orjson is not installed
+JSON_PROVIDER = os.environ.get('YAMOVIE_JSON_PROVIDER', 'orjson')
+
+# a request above the budget, or repeating one statement shape more than
+# QUERY_MAX_REPEATS times (an N+1 loop), is logged as a warning
+QUERY_BUDGET = int(os.environ.get('YAMOVIE_QUERY_BUDGET', 20))
+QUERY_MAX_REPEATS = int(os.environ.get('YAMOVIE_QUERY_MAX_REPEATS', 5))
+
+# every server process writes its metrics here, so /metrics answered by
+# any gunicorn worker covers them all; empty keeps them in process memory
+METRICS_DIRECTORY = os.environ.get('YAMOVIE_METRICS_DIRECTORY',
+                                   os.path.join(basedir, 'data/metrics')) or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('YAMOVIE_METRICS_FLUSH_INTERVAL', 1.0))
+
+# a request with an X-Profile header or profile query argument set to
+# 1, or to the token when one is set, is profiled with cProfile
+PROFILING_ENABLED = os.environ.get('YAMOVIE_PROFILING_ENABLED', '0') == '1'
+PROFILING_TOKEN = os.environ.get('YAMOVIE_PROFILING_TOKEN') or None
+PROFILING_DIRECTORY = os.environ.get('YAMOVIE_PROFILING_DIRECTORY',
+                                     os.path.join(basedir, 'data/profiles'))
+PROFILING_MAX_PROFILES = int(os.environ.get('YAMOVIE_PROFILING_MAX_PROFILES', 200))
+
+# item-item recommendations: the TOP_K most similar movies of every movie
+# are stored and refreshed from the movies whose favourites changed every
+# REFRESH_INTERVAL seconds (0 leaves it to flask refresh-recommendations);
+# more changed movies than REBUILD_FRACTION of the liked ones rebuild all
+RECOMMENDATIONS_TOP_K = int(os.environ.get('YAMOVIE_RECOMMENDATIONS_TOP_K', 20))
+RECOMMENDATIONS_BATCH_SIZE = int(os.environ.get('YAMOVIE_RECOMMENDATIONS_BATCH_SIZE', 1000))
+RECOMMENDATIONS_REFRESH_INTERVAL = float(os.environ.get('YAMOVIE_RECOMMENDATIONS_REFRESH_INTERVAL',
+                                                        0 if ENGINE_PROFILE_NAME == 'testing' else 60))
+RECOMMENDATIONS_REBUILD_FRACTION = float(os.environ.get('YAMOVIE_RECOMMENDATIONS_REBUILD_FRACTION', 0.2))
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+import pytest
+
+# pytest puts this directory on sys.path, so every test imports the app
+# modules the way app.py does ('from data_manager.movies import Movies');
+# importing them through the yamovie package too would load data_models twice
+from query_stats import recorded_queries
+
+DEFAULT_MAX_REPEATS = 2
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert that the block runs at most max_queries statements and repeats
+    no statement shape more than max_repeats times:
+
+        with query_budget(3):
+            client.get('/api/movies')
+    """
+    @contextmanager
+    def check(max_queries: int, max_repeats: int = DEFAULT_MAX_REPEATS):
+        with recorded_queries() as stats:
+            yield stats
+        assert stats.count <= max_queries, f'over the budget of {max_queries}: {stats.describe()}'
+        repeated_shapes = stats.repeated_shapes(max_repeats)
+        assert not repeated_shapes, f'repeated more than {max_repeats} times: {repeated_shapes}'
+    return check
@@ -0,0 +1,22 @@
+def decode_cursor(after: str | int | None, order_by: tuple | None):
+    """
+    Cursors are the item id, or 'value,id' when sorted by a column
+    (an empty value stands for NULL); a malformed cursor restarts
+    from the first page
+    """
+    if after is None:
+        return None
+    try:
+        if order_by is None:
+            return int(after)
+        value, item_id = str(after).rsplit(',', 1)
+        return (float(value) if value else None), int(item_id)
+    except ValueError:
+        return None
+
+
+def encode_cursor(item: dict, order_by: tuple | None) -> str | int:
+    if order_by is None:
+        return item['id']
+    value = item[order_by[0]]
+    return f"{'' if value is None else value},{item['id']}"
@@ -3,30 +3,97 @@ from abc import ABC, abstractmethod
 
 class DataManagerInterface(ABC):
     @abstractmethod
-    def get_all_data(self):
+    def get_all_data(self, loading_plan: dict | None = None):
         """
         Return all the data from db
+        :param loading_plan: dict of relationship path -> strategy
+            ('selectin' | 'joined'), e.g. {'movies.movie': 'joined'}
         :return:
             Query object representing all the data
         """
 
     @abstractmethod
-    def get_item_by_id(self, item_id):
+    def get_item_by_id(self, item_id, loading_plan: dict | None = None):
         """
         Return the specific item
         given item_id
+        :param loading_plan: dict of relationship path -> strategy
         :return:
             item (Query) |
             None
         """
 
     @abstractmethod
-    def add_item(self, new_item: dict) -> bool:
+    def get_page(self, limit: int, after=None,
+                 filters: list | None = None,
+                 loading_plan: dict | None = None,
+                 order_by: tuple | None = None):
+        """
+        Return the next page of items ordered by id (keyset pagination)
+        :param limit: maximum number of items (int)
+        :param after: id of the last item of the previous page, or
+            (column value, id) of that item when order_by is given | None
+        :param filters: list of (column, operator, value) tuples with
+            operator one of '==', '>=', '<=', 'prefix', 'in', or 'none'
+            for a relationship with no item matching a dict of criteria,
+            e.g. [('user_id', '==', 1)], [('users', 'none', {'user_id': 1})]
+        :param loading_plan: dict of relationship path -> strategy
+        :param order_by: (column, descending) to order by before id | None
+        :return:
+            items that come after the cursor (list) |
+            None
+        """
+
+    @abstractmethod
+    def get_rows(self, columns: list, limit: int | None = None, after=None,
+                 filters: list | None = None,
+                 order_by: tuple | None = None):
+        """
+        Read-only projection of items to flat rows, without building
+        model instances; a related item's column is addressed by its
+        relationship path and every item is repeated once per related
+        row (outer join), the rows of one item being consecutive
+        :param columns: column paths, e.g. ['id', 'movie_reviews.rating',
+            'movie_reviews.user.user_name']
+        :param limit: maximum number of items, not rows | None
+        :param after, filters, order_by: as for get_page
+        :return:
+            rows, mappings of column path -> value (list) |
+            None
+        """
+
+    @abstractmethod
+    def search_rows(self, columns: list, terms: list, limit: int, offset: int = 0,
+                    fields: list | None = None,
+                    prefix_all: bool = False,
+                    max_candidates: int | None = None):
+        """
+        Flat rows of the items matching every search term in one of the
+        full-text fields, the most relevant first, then by id
+        :param columns: column paths of the items, as for get_rows
+        :param terms: lowercased words, see search.search_terms
+        :param limit: maximum number of items (int)
+        :param offset: number of matching items to skip (int)
+        :param fields: full-text fields the terms match in, all of the
+            entity's __search_columns__ when None
+        :param prefix_all: every term matches word prefixes, not only
+            the last one, e.g. for autocomplete
+        :param max_candidates: only the first matching items in id order
+            are ranked, which bounds the cost of very common terms | None
+        :return:
+            rows, mappings of column path -> value (list) |
+            None
+        """
+
+    @abstractmethod
+    def add_item(self, new_item: dict) -> bool | None:
         """
         Add new item to file
         :param new_item: (dict)
         :return:
-            Successfully add item, True (bool)
+            Successfully add item, True (bool) |
+            False when the item violates a unique constraint (bool) |
+            None
         """
 
     @abstractmethod
@@ -48,3 +115,37 @@ class DataManagerInterface(ABC):
             True for success delete item (bool) |
             None
         """
+
+    @abstractmethod
+    def add_items(self, new_items: list, chunk_size: int = 1000) -> dict | None:
+        """
+        Add many items, committed in chunks of chunk_size
+        :param new_items: list of dicts with column values
+        :param chunk_size: int
+        :return:
+            {'succeeded': count (int),
+             'failed': [{'index': position in new_items, 'error': str}]} |
+            None
+        """
+
+    @abstractmethod
+    def update_items(self, updated_items: list, chunk_size: int = 1000) -> dict | None:
+        """
+        Update many items, each dict must contain the id key
+        :param updated_items: list of dicts
+        :param chunk_size: int
+        :return:
+            report like add_items (dict) |
+            None
+        """
+
+    @abstractmethod
+    def delete_items(self, item_ids: list, chunk_size: int = 1000) -> dict | None:
+        """
+        Delete many items based on their ids
+        :param item_ids: list of int
+        :param chunk_size: int
+        :return:
+            report like add_items (dict) |
+            None
+        """
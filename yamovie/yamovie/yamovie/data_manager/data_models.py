@@ -1,4 +1,12 @@
+from itertools import chain
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, case, column, func, inspect, select, table, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import object_mapper
+
+from .search import fold_sql
 
 db = SQLAlchemy()
 
@@ -23,13 +31,23 @@ class User(db.Model):
 
 class Movie(db.Model):
     __tablename__ = 'movies'
+    # full-text indexed columns and their bm25 weights, see create_search_index
+    __search_columns__ = {'movie_name': 10.0, 'director': 1.0}
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     movie_name = db.Column(db.String(50), unique=True)
-    director = db.Column(db.String(50))
-    year = db.Column(db.Integer)
-    rating = db.Column(db.Float, default=0.0)
+    director = db.Column(db.String(50), index=True)
+    year = db.Column(db.Integer, index=True)
+    rating = db.Column(db.Float, default=0.0, index=True)
     poster = db.Column(db.String)
     website = db.Column(db.String)
+    # maintained by the MovieReview insert/delete listeners below
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    avg_user_rating = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    # 'pending' until the enrichment worker has filled in the OMDb fields,
+    # then 'done', 'not_found' or 'failed'; rows added before it are 'done'
+    enrichment_status = db.Column(db.String(10), nullable=False, default='done', server_default=text("'done'"))
+    enrichment_job = db.relationship('EnrichmentJob', back_populates='movie',
+                                     uselist=False, cascade='all, delete-orphan')
     users = db.relationship('UserMovie', back_populates='movie')
     movie_reviews = db.relationship('MovieReview', back_populates='movie')  # New relationship
 
@@ -49,9 +67,11 @@ class Movie(db.Model):
 
 class UserMovie(db.Model):
     __tablename__ = "users_movies"
+    # the unique index also serves lookups by user_id alone
+    __table_args__ = (db.Index('ix_users_movies_user_id_movie_id', 'user_id', 'movie_id', unique=True),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False, index=True)
 
     user = db.relationship('User', back_populates='movies')
     movie = db.relationship('Movie', back_populates='users')
@@ -59,13 +79,321 @@ class UserMovie(db.Model):
 
 class MovieReview(db.Model):
     __tablename__ = "movies_reviews"
+    __table_args__ = (db.Index('ix_movies_reviews_user_id_movie_id', 'user_id', 'movie_id', unique=True),
+                      # a movie's reviews sorted by rating without a sort step
+                      db.Index('ix_movies_reviews_movie_id_rating', 'movie_id', 'rating'),)
     id = db.Column(db.Integer,
                    primary_key=True,
                    autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'))
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), index=True)
     review_text = db.Column(db.String)
     rating = db.Column(db.Float, default=0.0)
 
     user = db.relationship('User', back_populates='movie_reviews')
     movie = db.relationship('Movie', back_populates='movie_reviews')
+
+
+class EnrichmentJob(db.Model):
+    __tablename__ = 'enrichment_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False, unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # unix timestamps; a claimed job is pushed into the future, so it is
+    # picked up again if the worker dies before finishing it
+    created_at = db.Column(db.Float, nullable=False)
+    next_attempt_at = db.Column(db.Float, nullable=False, index=True)
+    last_error = db.Column(db.String)
+
+    movie = db.relationship('Movie', back_populates='enrichment_job')
+
+
+class MovieNeighbour(db.Model):
+    """
+    The most similar movies of a movie by who added both to favourites,
+    written by recommendations.RecommendationEngine
+    """
+    __tablename__ = 'movie_neighbours'
+    # movies listing a changed movie are found without a scan
+    __table_args__ = (db.Index('ix_movie_neighbours_neighbour_id', 'neighbour_id'),)
+    movie_id = db.Column(db.Integer, primary_key=True)
+    neighbour_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+class StaleMovieNeighbours(db.Model):
+    """
+    Movies whose favourites or reviews changed since their neighbours
+    were computed, queued by the triggers of create_stale_neighbour_triggers;
+    a new change moves the movie to a new, higher id
+    """
+    __tablename__ = 'stale_movie_neighbours'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    movie_id = db.Column(db.Integer, nullable=False, unique=True)
+    marked_at = db.Column(db.Float, nullable=False)  # unix timestamp
+
+
+class TableVersion(db.Model):
+    """Change counter per table, the source of the API ETags"""
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def bump_table_versions(connection, table_names):
+    """
+    Increment the change version of the tables inside the caller's
+    transaction, so readers never see new rows with an old version
+    """
+    table_names = sorted(set(table_names) - {TableVersion.__tablename__})
+    if not table_names:
+        return
+    versions = TableVersion.__table__
+    connection.execute(sqlite_insert(versions).
+                       on_conflict_do_update(index_elements=[versions.c.table_name],
+                                             set_={'version': versions.c.version + 1}),
+                       [{'table_name': table_name, 'version': 1} for table_name in table_names])
+
+
+def get_table_versions(table_names) -> dict | None:
+    versions = TableVersion.__table__
+    try:
+        rows = db.session.execute(select(versions.c.table_name, versions.c.version).
+                                  where(versions.c.table_name.in_(table_names))).all()
+    except SQLAlchemyError as err:
+        print(err)
+        db.session.rollback()
+        return None
+    return {table_name: dict(rows).get(table_name, 0) for table_name in table_names}
+
+
+@event.listens_for(db.session, 'after_flush')
+def bump_flushed_table_versions(session, _flush_context):
+    bump_table_versions(session.connection(),
+                        {object_mapper(item).local_table.name
+                         for item in chain(session.new, session.dirty, session.deleted)})
+
+
+def create_missing_indexes():
+    """
+    db.create_all() only creates indexes together with new tables,
+    so indexes declared later are added to existing tables here
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except SQLAlchemyError as err:
+                # e.g. existing duplicates block a unique index
+                print(err)
+
+
+def create_missing_columns():
+    """
+    db.create_all() does not alter existing tables,
+    so columns declared later are added here
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            default = f" NOT NULL DEFAULT {column.server_default.arg}" if column.server_default else ''
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table.name} '
+                                        f'ADD COLUMN {column.name} {column_type}{default}'))
+
+
+def search_table(model):
+    """
+    The FTS5 table of the model's __search_columns__, outside the
+    metadata so db.create_all() does not create it as a plain table
+    """
+    return table(f'{model.__tablename__}_fts', column('rowid'),
+                 *(column(name) for name in model.__search_columns__))
+
+
+def search_index_triggers(model) -> dict:
+    """
+    trigger name -> CREATE TRIGGER statement of the triggers keeping the
+    model's FTS5 table in sync with every write, ORM or not; the indexed
+    values go through fold_sql
+    """
+    fts = search_table(model).name
+    content = model.__tablename__
+    id_column = model.__table__.primary_key.columns[0].name
+    columns = ', '.join(model.__search_columns__)
+    new_values = ', '.join(fold_sql(f'new.{name}') for name in model.__search_columns__)
+    old_values = ', '.join(fold_sql(f'old.{name}') for name in model.__search_columns__)
+    delete_old = (f"INSERT INTO {fts}({fts}, rowid, {columns}) "
+                  f"VALUES ('delete', old.{id_column}, {old_values});")
+    insert_new = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.{id_column}, {new_values});"
+    return {f'{fts}_insert': f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {content} BEGIN {insert_new} END",
+            f'{fts}_delete': f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {content} BEGIN {delete_old} END",
+            f'{fts}_update': f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {columns} ON {content} "
+                             f"BEGIN {delete_old} {insert_new} END"}
+
+
+def create_search_index(model, connection, rebuild: bool = False):
+    """
+    Create the model's FTS5 table, an external content index over
+    its table, and its search_index_triggers; rebuild (re)indexes the
+    rows already in the table
+    """
+    fts = search_table(model).name
+    content = model.__tablename__
+    id_column = model.__table__.primary_key.columns[0].name
+    columns = ', '.join(model.__search_columns__)
+    # remove_diacritics matches 'amelie' to 'Amélie'; the prefix indexes
+    # keep the two and three letter prefixes of autocomplete fast
+    connection.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                            f"{columns}, content='{content}', content_rowid='{id_column}', "
+                            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    for name, statement in search_index_triggers(model).items():
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+        connection.execute(text(statement))
+    if rebuild:
+        # the 'rebuild' command would index the content table unfolded
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+        connection.execute(text(f"INSERT INTO {fts}(rowid, {columns}) "
+                                f"SELECT {id_column}, "
+                                f"{', '.join(fold_sql(name) for name in model.__search_columns__)} "
+                                f"FROM {content}"))
+
+
+def searchable_models() -> list:
+    return [mapper.class_ for mapper in db.Model.registry.mappers
+            if hasattr(mapper.class_, '__search_columns__')]
+
+
+def search_index_is_current(model, connection) -> bool:
+    """The FTS5 table exists and was filled by the current search_index_triggers"""
+    if not inspect(connection).has_table(search_table(model).name):
+        return False
+    triggers = dict(connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all())
+    return all(triggers.get(name) == statement for name, statement in search_index_triggers(model).items())
+
+
+def create_missing_search_indexes():
+    """
+    db.create_all() only creates search indexes together with new
+    tables, so existing tables are indexed here; an index filled by
+    older triggers is reindexed
+    """
+    for model in searchable_models():
+        with db.engine.begin() as connection:
+            if not inspect(connection).has_table(model.__tablename__):
+                continue
+            if not search_index_is_current(model, connection):
+                create_search_index(model, connection, rebuild=True)
+
+
+def rebuild_search_indexes():
+    """Reindex every row, e.g. after the FTS5 tables were restored from a backup"""
+    with db.engine.begin() as connection:
+        for model in searchable_models():
+            create_search_index(model, connection, rebuild=True)
+
+
+@event.listens_for(Movie.__table__, 'after_create')
+def create_movie_search_index(_table, connection, **_kwargs):
+    create_search_index(Movie, connection)
+
+
+@event.listens_for(Movie.__table__, 'before_drop')
+def drop_movie_search_index(_table, connection, **_kwargs):
+    # the sync triggers are dropped with the movies table
+    connection.execute(text(f'DROP TABLE IF EXISTS {search_table(Movie).name}'))
+
+
+def create_stale_neighbour_triggers(connection):
+    """
+    Queue the movies of every favourite and review write in
+    stale_movie_neighbours, ORM or not; REPLACE gives a queued movie a
+    new id, so a refresh that read the queue up to an id never drops
+    a change made while it ran
+    """
+    stale = StaleMovieNeighbours.__tablename__
+    now = "(julianday('now') - 2440587.5) * 86400.0"
+    writes = {UserMovie.__tablename__: 'user_id, movie_id',
+              MovieReview.__tablename__: 'user_id, movie_id, rating',
+              Movie.__tablename__: None}
+    for table_name, updated_columns in writes.items():
+        movie_id = 'id' if table_name == Movie.__tablename__ else 'movie_id'
+        mark_old = f"REPLACE INTO {stale}(movie_id, marked_at) VALUES (old.{movie_id}, {now});"
+        mark_new = f"REPLACE INTO {stale}(movie_id, marked_at) VALUES (new.{movie_id}, {now});"
+        # a deleted movie has to leave the neighbour lists it is in
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table_name}_neighbours_delete "
+                                f"AFTER DELETE ON {table_name} BEGIN {mark_old} END"))
+        if updated_columns is None:
+            continue
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table_name}_neighbours_insert "
+                                f"AFTER INSERT ON {table_name} BEGIN {mark_new} END"))
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table_name}_neighbours_update "
+                                f"AFTER UPDATE OF {updated_columns} ON {table_name} BEGIN {mark_old} {mark_new} END"))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_metadata_triggers(_metadata, connection, **_kwargs):
+    # after every table, the triggers span several of them; create_all
+    # dispatches this on existing databases too
+    create_stale_neighbour_triggers(connection)
+
+
+def review_rating(review) -> float:
+    try:
+        return float(review.rating or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@event.listens_for(MovieReview, 'after_insert')
+def add_review_to_movie_aggregates(_mapper, connection, review):
+    movies = Movie.__table__
+    connection.execute(
+        update(movies).
+        where(movies.c.id == review.movie_id).
+        values(avg_user_rating=(movies.c.avg_user_rating * movies.c.review_count + review_rating(review))
+               / (movies.c.review_count + 1),
+               review_count=movies.c.review_count + 1))
+    bump_table_versions(connection, [movies.name])
+
+
+@event.listens_for(MovieReview, 'after_delete')
+def remove_review_from_movie_aggregates(_mapper, connection, review):
+    movies = Movie.__table__
+    connection.execute(
+        update(movies).
+        where(movies.c.id == review.movie_id).
+        values(avg_user_rating=case((movies.c.review_count <= 1, 0.0),
+                                    else_=(movies.c.avg_user_rating * movies.c.review_count
+                                           - review_rating(review))
+                                    / (movies.c.review_count - 1)),
+               review_count=case((movies.c.review_count <= 1, 0),
+                                 else_=movies.c.review_count - 1)))
+    bump_table_versions(connection, [movies.name])
+
+
+def recompute_movie_review_aggregates() -> int:
+    """
+    Rebuild review_count and avg_user_rating of every movie from
+    movies_reviews, e.g. after reviews were written around the ORM
+    """
+    movies = Movie.__table__
+    reviews = MovieReview.__table__
+    result = db.session.execute(
+        update(movies).values(
+            review_count=select(func.count(reviews.c.id)).
+            where(reviews.c.movie_id == movies.c.id).
+            scalar_subquery(),
+            # a NULL rating counts as 0, as in review_rating
+            avg_user_rating=select(func.coalesce(func.avg(func.coalesce(reviews.c.rating, 0.0)), 0.0)).
+            where(reviews.c.movie_id == movies.c.id).
+            scalar_subquery()))
+    bump_table_versions(db.session.connection(), [movies.name])
+    db.session.commit()
+    return result.rowcount
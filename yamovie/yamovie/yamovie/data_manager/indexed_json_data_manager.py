@@ -0,0 +1,228 @@
+import atexit
+import json
+import os
+import threading
+import weakref
+from typing import List
+
+from .json_data_manager import JSONDataManager
+
+# the data managers with changes in their log, compacted at interpreter
+# shutdown; the set does not keep them alive
+_uncompacted = weakref.WeakSet()
+
+
+@atexit.register
+def _compact_at_shutdown():
+    for data_manager in list(_uncompacted):
+        data_manager.compact()
+
+
+class IndexedJSONDataManager(JSONDataManager):
+    """
+    JSONDataManager that loads the file once and serves reads from a
+    dict index by id_key. Every change is appended to '<file_name>.log'
+    and the log is folded back into the JSON file after compact_every
+    changes, on close() and at interpreter shutdown. Log appends are
+    fsynced, so a change is durable once the write returns. Returned
+    items are the stored dicts and must be treated as read-only.
+
+        with IndexedJSONDataManager('data/movies.json', 'id') as data_manager:
+            data_manager.add_item({'movie_name': 'Up'})
+    """
+
+    def __init__(self, file_name, id_key, compact_every: int = 1000, search_weights: dict | None = None):
+        super().__init__(file_name, id_key, search_weights)
+        self._log_file_name = f'{file_name}.log'
+        self._compact_every = compact_every
+        self._lock = threading.RLock()
+        self._items = None
+        self._max_id = 0
+        self._logged_changes = 0
+        self._loaded = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def close(self) -> bool | None:
+        """Compact the log; the data manager stays usable"""
+        return self.compact()
+
+    def _load(self) -> dict | None:
+        with self._lock:
+            if self._loaded:
+                return self._items
+
+            items = super()._read_file()
+            if items is not None:
+                self._items = {item[self._id_key]: item for item in items}
+            self._replay_log()
+            if self._items is not None:
+                self._max_id = max(self._items, default=0)
+            self._loaded = True
+            return self._items
+
+    def _replay_log(self):
+        replayed_size = 0
+        try:
+            with open(self._log_file_name, 'rb') as log_file:
+                for line in log_file:
+                    try:
+                        # a line without its newline was cut short too
+                        change = json.loads(line) if line.endswith(b'\n') else None
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        change = None
+                    if change is None:
+                        # a crash during an append leaves a partial last line
+                        break
+                    replayed_size += len(line)
+                    if self._items is None:
+                        self._items = {}
+                    if change['op'] == 'put':
+                        self._items[change['item'][self._id_key]] = change['item']
+                    else:
+                        self._items.pop(change['id'], None)
+                    self._logged_changes += 1
+            if os.path.getsize(self._log_file_name) > replayed_size:
+                # later changes are appended after the last complete line
+                os.truncate(self._log_file_name, replayed_size)
+        except FileNotFoundError:
+            pass
+        if self._logged_changes:
+            _uncompacted.add(self)
+
+    def _log_changes(self, changes: List[dict]):
+        if not changes:
+            return
+        with open(self._log_file_name, 'a', encoding='utf-8') as log_file:
+            log_file.write(''.join(json.dumps(change) + '\n' for change in changes))
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        self._logged_changes += len(changes)
+        _uncompacted.add(self)
+        if self._logged_changes >= self._compact_every:
+            self.compact()
+
+    def compact(self) -> bool | None:
+        """
+        Write the index to the JSON file and empty the change log;
+        replaying the log again after a crash in between is harmless
+        """
+        with self._lock:
+            if not self._loaded or self._items is None or not self._logged_changes:
+                return None
+            if not os.path.exists(self._log_file_name):
+                # the files were removed, e.g. by a test; do not write them again
+                _uncompacted.discard(self)
+                return None
+            if self._write_file(list(self._items.values())) is None:
+                return None
+            open(self._log_file_name, 'w', encoding='utf-8').close()
+            self._logged_changes = 0
+            _uncompacted.discard(self)
+            return True
+
+    def _read_file(self) -> List[dict] | None:
+        items = self._load()
+        return None if items is None else list(items.values())
+
+    def get_all_data(self, loading_plan: dict | None = None) -> List[dict] | None:
+        return self._read_file()
+
+    def get_item_by_id(self, item_id, loading_plan: dict | None = None) -> dict | None:
+        items = self._load()
+        return items.get(item_id) if items else None
+
+    def generate_new_id(self, items=None, key=None) -> int:
+        return self._max_id + 1
+
+    def _put(self, items: dict, item: dict, changes: list):
+        items[item[self._id_key]] = item
+        self._max_id = max(self._max_id, item[self._id_key])
+        changes.append({'op': 'put', 'item': item})
+
+    def add_item(self, new_item: dict) -> bool | None:
+        with self._lock:
+            items = self._load()
+            if items is None:
+                return None
+            new_item.update({self._id_key: self.generate_new_id()})
+            changes = []
+            self._put(items, new_item, changes)
+            self._log_changes(changes)
+            return True
+
+    def update_item(self, updated_item: dict) -> bool | None:
+        with self._lock:
+            items = self._load()
+            item = items.get(updated_item[self._id_key]) if items else None
+            if item is None:
+                return None
+            changes = []
+            self._put(items, {**item, **updated_item}, changes)
+            self._log_changes(changes)
+            return True
+
+    def delete_item(self, item_id: int) -> bool | None:
+        with self._lock:
+            items = self._load()
+            if not items or item_id not in items:
+                return None
+            del items[item_id]
+            self._log_changes([{'op': 'delete', 'id': item_id}])
+            return True
+
+    def add_items(self, new_items: list, chunk_size: int = 1000) -> dict | None:
+        with self._lock:
+            items = self._load()
+            if items is None:
+                return None
+
+            report = {'succeeded': 0, 'failed': []}
+            changes = []
+            for index, new_item in enumerate(new_items):
+                if not isinstance(new_item, dict):
+                    report['failed'].append({'index': index, 'error': 'Item must be an object'})
+                    continue
+                self._put(items, {**new_item, self._id_key: self.generate_new_id()}, changes)
+                report['succeeded'] += 1
+            self._log_changes(changes)
+            return report
+
+    def update_items(self, updated_items: list, chunk_size: int = 1000) -> dict | None:
+        with self._lock:
+            items = self._load()
+            if items is None:
+                return None
+
+            report = {'succeeded': 0, 'failed': []}
+            changes = []
+            for index, updated_item in enumerate(updated_items):
+                item = items.get(updated_item.get(self._id_key))
+                if item is None:
+                    report['failed'].append({'index': index, 'error': 'Item not found'})
+                    continue
+                self._put(items, {**item, **updated_item}, changes)
+                report['succeeded'] += 1
+            self._log_changes(changes)
+            return report
+
+    def delete_items(self, item_ids: list, chunk_size: int = 1000) -> dict | None:
+        with self._lock:
+            items = self._load()
+            if items is None:
+                return None
+
+            report = {'succeeded': 0, 'failed': []}
+            changes = []
+            for index, item_id in enumerate(item_ids):
+                if items.pop(item_id, None) is None:
+                    report['failed'].append({'index': index, 'error': 'Item not found'})
+                    continue
+                changes.append({'op': 'delete', 'id': item_id})
+                report['succeeded'] += 1
+            self._log_changes(changes)
+            return report
@@ -1,17 +1,82 @@
+import heapq
 import json
+import operator
+import os
+import sys
+import tempfile
 from abc import ABC
-from typing import List
+from typing import Iterable, Iterator, List
 
 from .data_manager_interface import DataManagerInterface
+from .search import match_score
+
+FILTER_OPERATORS = {'==': operator.eq,
+                    '>=': lambda value, bound: value is not None and value >= bound,
+                    '<=': lambda value, bound: value is not None and value <= bound,
+                    'prefix': lambda value, prefix: isinstance(value, str) and value.startswith(prefix),
+                    'in': lambda value, values: value in values,
+                    'none': lambda related_items, criteria: not any(
+                        all(related_item.get(key) == value for key, value in criteria.items())
+                        for related_item in related_items or [])}
+
+
+def truncate_partial_line(file_name: str, block_size: int = 4096):
+    """
+    Cut a line-per-record file back to its last newline; a crash during
+    an append leaves a partial last line, and the next append must not
+    be written onto it
+    """
+    with open(file_name, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            file.truncate(position)
 
 
 class JSONDataManager(DataManagerInterface, ABC):
-    def __init__(self, file_name, id_key):
+    """
+    Files ending in .ndjson or .jsonl hold one item per line and are
+    read lazily; any other file holds a single JSON array. Rewrites go
+    to a temporary file that replaces the original only once it is
+    fully written and synced, so a crash never truncates the data.
+    """
+    NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+    def __init__(self, file_name, id_key, search_weights: dict | None = None):
         self._file_name = file_name
         self._id_key = id_key
+        # field -> relevance weight for search_rows, 1.0 when not given
+        self._search_weights = search_weights or {}
+        self._ndjson = str(file_name).endswith(self.NDJSON_EXTENSIONS)
+
+    def _iter_ndjson(self) -> Iterator[dict]:
+        with open(self._file_name, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # a partial line left by a crash during an append
+                    continue
+
+    def _iter_items(self) -> Iterator[dict] | None:
+        if self._ndjson:
+            return self._iter_ndjson() if os.path.exists(self._file_name) else None
+        return self._read_file()
 
     def _read_file(self) -> List[dict] | None:
         try:
+            if self._ndjson:
+                return list(self._iter_ndjson())
             with open(self._file_name, 'r', encoding='utf-8') as file:
                 return json.load(file)
         except FileNotFoundError:
@@ -19,54 +84,298 @@ class JSONDataManager(DataManagerInterface, ABC):
         except FileExistsError:
             return None
 
-    def _write_file(self, items: List[dict]) -> bool | None:
+    def _dump(self, items: Iterable[dict], file):
+        if self._ndjson:
+            for item in items:
+                file.write(json.dumps(item) + '\n')
+            return
+
+        file.write('[')
+        for position, item in enumerate(items):
+            file.write(', ' if position else '')
+            file.write(json.dumps(item))
+        file.write(']')
+
+    def _write_file(self, items: Iterable[dict]) -> bool | None:
+        directory = os.path.dirname(os.path.abspath(self._file_name))
+        temp_name = None
         try:
-            with open(self._file_name, 'w', encoding='utf-8') as file:
-                json.dump(items, file)
-                return True
-        except FileNotFoundError:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory,
+                                             prefix=f'.{os.path.basename(self._file_name)}.',
+                                             suffix='.tmp', delete=False) as file:
+                temp_name = file.name
+                self._dump(items, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_name, self._file_name)
+            self._fsync_directory(directory)
+            return True
+        except OSError:
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
             return None
-        except FileExistsError:
+
+    @staticmethod
+    def _fsync_directory(directory: str):
+        # makes the rename itself durable; not supported on every platform
+        try:
+            directory_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(directory_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_fd)
+
+    def _append_items(self, new_items: List[dict]) -> bool | None:
+        try:
+            truncate_partial_line(self._file_name)
+            with open(self._file_name, 'a', encoding='utf-8') as file:
+                self._dump(new_items, file)
+                file.flush()
+                os.fsync(file.fileno())
+            return True
+        except OSError:
             return None
 
-    def get_all_data(self) -> List[dict] | None:
-        return self._read_file()
+    def get_all_data(self, loading_plan: dict | None = None) -> Iterable[dict] | None:
+        """
+        A list for JSON files, a lazy iterator for NDJSON files
+        """
+        return self._iter_items()
 
-    def get_item_by_id(self, item_id) -> dict | None:
-        items = self._read_file()
+    def get_item_by_id(self, item_id, loading_plan: dict | None = None) -> dict | None:
+        items = self._iter_items()
         if items:
             for item in items:
                 if item[self._id_key] == item_id:
                     return item
         return None
 
-    def generate_new_id(self, items: list, key=None) -> int:
-        if items:
-            return max(item[key or self._id_key] for item in items) + 1
-        return 1
+    @staticmethod
+    def _matches(item: dict, filters: list | None) -> bool:
+        return all(FILTER_OPERATORS[operation](item.get(column), value)
+                   for column, operation, value in filters or [])
+
+    @staticmethod
+    def _sort_key(value, item_id) -> tuple:
+        # None sorts first, like NULL in SQLite
+        return value is not None, value if value is not None else 0, item_id
+
+    def get_page(self, limit: int, after=None,
+                 filters: list | None = None,
+                 loading_plan: dict | None = None,
+                 order_by: tuple | None = None) -> List[dict] | None:
+        items = self.get_all_data()
+        if items is None:
+            return None
+
+        if order_by is None:
+            return heapq.nsmallest(limit,
+                                   (item for item in items
+                                    if (after is None or item[self._id_key] > after)
+                                    and self._matches(item, filters)),
+                                   key=lambda item: item[self._id_key])
+
+        column, descending = order_by
 
-    def add_item(self, new_item: dict) -> bool:
-        items = self._read_file()
+        def item_key(item):
+            return self._sort_key(item.get(column), item[self._id_key])
+
+        after_key = self._sort_key(*after) if after is not None else None
+        if descending:
+            return heapq.nlargest(limit,
+                                  (item for item in items
+                                   if (after_key is None or item_key(item) < after_key)
+                                   and self._matches(item, filters)),
+                                  key=item_key)
+        return heapq.nsmallest(limit,
+                               (item for item in items
+                                if (after_key is None or item_key(item) > after_key)
+                                and self._matches(item, filters)),
+                               key=item_key)
+
+    @classmethod
+    def _flatten(cls, item: dict | None, columns: list) -> List[dict]:
+        """
+        Rows of the item for the column paths; an embedded list yields
+        one row per element, or one row of None values when empty
+        """
+        row = {}
+        related_columns = {}
+        for path in columns:
+            key, _, rest = path.partition('.')
+            if rest:
+                related_columns.setdefault(key, []).append(rest)
+            else:
+                row[path] = item.get(key) if isinstance(item, dict) else None
+
+        rows = [row]
+        for key, paths in related_columns.items():
+            related = item.get(key) if isinstance(item, dict) else None
+            related_items = related if isinstance(related, list) else [related]
+            related_rows = [{f'{key}.{path}': value for path, value in related_row.items()}
+                            for related_item in related_items or [None]
+                            for related_row in cls._flatten(related_item, paths)]
+            rows = [{**row, **related_row} for row in rows for related_row in related_rows]
+        return rows
+
+    def get_rows(self, columns: list, limit: int | None = None, after=None,
+                 filters: list | None = None,
+                 order_by: tuple | None = None) -> List[dict] | None:
+        items = self.get_page(sys.maxsize if limit is None else limit, after, filters, order_by=order_by)
+        if items is None:
+            return None
+        return [row for item in items for row in self._flatten(item, columns)]
+
+    def search_rows(self, columns: list, terms: list, limit: int, offset: int = 0,
+                    fields: list | None = None,
+                    prefix_all: bool = False,
+                    max_candidates: int | None = None) -> List[dict] | None:
+        """
+        A scan of every item scored by match_score with the
+        search_weights given to the constructor
+        """
+        items = self.get_all_data()
+        if items is None:
+            return None
+        weights = {field: self._search_weights.get(field, 1.0)
+                   for field in fields or self._search_weights}
+        matches = ((score, item) for item in items
+                   if (score := match_score(item, terms, weights, prefix_all)))
+        if max_candidates is not None:
+            matches = heapq.nsmallest(max_candidates, matches, key=lambda match: match[1][self._id_key])
+        ranked = heapq.nsmallest(offset + limit, matches,
+                                 key=lambda match: (-match[0], match[1][self._id_key]))
+        return [row for _, item in ranked[offset:] for row in self._flatten(item, columns)]
+
+    def generate_new_id(self, items: Iterable[dict], key=None) -> int:
+        return max((item[key or self._id_key] for item in items or []), default=0) + 1
+
+    def _rewrite(self, transform) -> int | None:
+        """
+        Stream every item through transform, which returns the item to
+        keep or None to drop it, into a new file; the file is replaced
+        only if transform reported a change
+        :return:
+            number of changed items (int) |
+            None
+        """
+        items = self._iter_items()
+        if items is None:
+            return None
+
+        changed = 0
+
+        def transformed_items():
+            nonlocal changed
+            for item in items:
+                result = transform(item)
+                if result is not item:
+                    changed += 1
+                if result is not None:
+                    yield result
+
+        if self._ndjson:
+            kept = transformed_items()
+        else:
+            kept = list(transformed_items())
+            if not changed:
+                return 0
+        if self._write_file(kept) is None:
+            return None
+        return changed
+
+    def add_item(self, new_item: dict) -> bool | None:
+        items = self._iter_items()
+        if items is None:
+            return None
         new_item.update({self._id_key: self.generate_new_id(items)})
+        if self._ndjson:
+            return self._append_items([new_item])
         items.append(new_item)
-        self._write_file(items)
-        return True
+        return self._write_file(items)
 
     def update_item(self, updated_item: dict) -> bool | None:
-        items = self._read_file()
-        for item in items:
+        def update(item):
             if item[self._id_key] == updated_item[self._id_key]:
-                item.update(updated_item)
-                self._write_file(items)
-                return True
-        return None
+                return {**item, **updated_item}
+            return item
+
+        return True if self._rewrite(update) else None
 
     def delete_item(self, item_id: int) -> bool | None:
-        items = self._read_file()
-        if items:
-            for item in items:
-                if item[self._id_key] == item_id:
-                    items.remove(item)
-                    self._write_file(items)
-                    return True
-        return None
+        return True if self._rewrite(lambda item: None if item[self._id_key] == item_id else item) else None
+
+    def add_items(self, new_items: list, chunk_size: int = 1000) -> dict | None:
+        items = self._iter_items()
+        if items is None:
+            return None
+
+        report = {'succeeded': 0, 'failed': []}
+        added_items = []
+        next_id = self.generate_new_id(items)
+        for index, new_item in enumerate(new_items):
+            if not isinstance(new_item, dict):
+                report['failed'].append({'index': index, 'error': 'Item must be an object'})
+                continue
+            added_items.append({**new_item, self._id_key: next_id})
+            next_id += 1
+            report['succeeded'] += 1
+
+        if not added_items:
+            return report
+        if self._ndjson:
+            written = self._append_items(added_items)
+        else:
+            written = self._write_file(items + added_items)
+        return report if written else None
+
+    def update_items(self, updated_items: list, chunk_size: int = 1000) -> dict | None:
+        # only the updates are held in memory, not the file
+        updates = {}
+        for updated_item in updated_items:
+            updates.setdefault(updated_item.get(self._id_key), {}).update(updated_item)
+        found_ids = set()
+
+        def update(item):
+            if item[self._id_key] not in updates:
+                return item
+            found_ids.add(item[self._id_key])
+            return {**item, **updates[item[self._id_key]]}
+
+        if self._rewrite(update) is None:
+            return None
+
+        report = {'succeeded': 0, 'failed': []}
+        for index, updated_item in enumerate(updated_items):
+            if updated_item.get(self._id_key) in found_ids:
+                report['succeeded'] += 1
+            else:
+                report['failed'].append({'index': index, 'error': 'Item not found'})
+        return report
+
+    def delete_items(self, item_ids: list, chunk_size: int = 1000) -> dict | None:
+        requested_ids = set(item_ids)
+        deleted_ids = set()
+
+        def delete(item):
+            if item[self._id_key] in requested_ids:
+                deleted_ids.add(item[self._id_key])
+                return None
+            return item
+
+        if self._rewrite(delete) is None:
+            return None
+
+        reported_ids = set()
+        report = {'succeeded': 0, 'failed': []}
+        for index, item_id in enumerate(item_ids):
+            if item_id in deleted_ids and item_id not in reported_ids:
+                reported_ids.add(item_id)
+                report['succeeded'] += 1
+            else:
+                report['failed'].append({'index': index, 'error': 'Item not found'})
+        return report
@@ -1,71 +1,217 @@
+import time
+from itertools import groupby
+from operator import itemgetter
 from typing import List
 
+from .cursors import decode_cursor, encode_cursor
 from .data_manager_interface import DataManagerInterface
-from .data_models import Movie
+from .data_models import Movie, EnrichmentJob
+from .search import search_terms
+from .sqlite_data_manager import ID_CHUNK_SIZE, chunked
+from .write_listeners import WriteListenersMixin, notifies_write
 
 
-class Movies:
+class Movies(WriteListenersMixin):
+    MOVIE_COLUMNS = ('id', 'movie_name', 'director', 'year', 'rating', 'poster', 'website',
+                     'review_count', 'avg_user_rating', 'enrichment_status')
+    REVIEW_COLUMNS = ('movie_reviews.id', 'movie_reviews.user_id', 'movie_reviews.movie_id',
+                      'movie_reviews.review_text', 'movie_reviews.rating', 'movie_reviews.user.user_name')
+    FILTERS = {'year_from': ('year', '>='),
+               'year_to': ('year', '<='),
+               'director': ('director', '=='),
+               'min_rating': ('rating', '>='),
+               'name_prefix': ('movie_name', 'prefix')}
+    SORT_OPTIONS = {'rating': ('rating', False),
+                    '-rating': ('rating', True),
+                    'year': ('year', False),
+                    '-year': ('year', True)}
+    CANDIDATE_COLUMNS = ('movie_name', 'director', 'year', 'rating', 'poster', 'website')
+    SEARCH_FIELDS = ('movie_name', 'director')
+    AUTOCOMPLETE_FIELDS = ('movie_name',)
+    AUTOCOMPLETE_COLUMNS = ('id', 'movie_name', 'year')
+    # ranking every match of a one or two letter prefix in a large
+    # catalog takes hundreds of milliseconds, the first ones take a few
+    SEARCH_MAX_CANDIDATES = 2000
 
     def __init__(self, data_manager: DataManagerInterface):
         self._data_manager = data_manager
 
-    @staticmethod
-    def __movie_to_dict(movie) -> dict:
-        movie_reviews = []
-        if movie.movie_reviews:
-            for review in movie.movie_reviews:
-                movie_reviews.append({
-                    "id": review.id,
-                    "user_id": review.user_id,
-                    "movie_id": review.movie_id,
-                    "review_text": review.review_text,
-                    "rating": review.rating,
-                    "user": {"user_id": review.user.id,
-                             "user_name": review.user.user_name }
-                })
-
-        return {"id": movie.id,
-                "movie_name": movie.movie_name,
-                "director": movie.director,
-                "year": movie.year,
-                "rating": movie.rating,
-                "poster": movie.poster,
-                "website": movie.website,
-                "movie_reviews": movie_reviews
-                }
+    @classmethod
+    def __rows_to_movies(cls, rows, include_reviews: bool = True) -> List[dict]:
+        """
+        One pass over the flat rows, the rows of a movie being
+        consecutive; a movie without reviews has one row of None reviews
+        """
+        movies = []
+        for _, movie_rows in groupby(rows, key=itemgetter('id')):
+            movie_rows = list(movie_rows)
+            movie_dict = {column: movie_rows[0][column] for column in cls.MOVIE_COLUMNS}
+            if include_reviews:
+                movie_dict["movie_reviews"] = [{"id": row['movie_reviews.id'],
+                                                "user_id": row['movie_reviews.user_id'],
+                                                "movie_id": row['movie_reviews.movie_id'],
+                                                "review_text": row['movie_reviews.review_text'],
+                                                "rating": row['movie_reviews.rating'],
+                                                "user": {"user_id": row['movie_reviews.user_id'],
+                                                         "user_name": row['movie_reviews.user.user_name']}}
+                                               for row in movie_rows if row['movie_reviews.id'] is not None]
+            movies.append(movie_dict)
+        return movies
+
+    @classmethod
+    def __columns(cls, include_reviews: bool = True) -> list:
+        return [*cls.MOVIE_COLUMNS, *cls.REVIEW_COLUMNS] if include_reviews else list(cls.MOVIE_COLUMNS)
 
     def get_movies(self) -> List[dict] | None:
-        movies_query = self._data_manager.get_all_data()
-        if movies_query is None:
+        rows = self._data_manager.get_rows(self.__columns())
+        if rows is None:
             return None
+        return self.__rows_to_movies(rows)
 
-        movies = []
-        for movie in movies_query:
-            movies.append(self.__movie_to_dict(movie))
-        return movies
+    @classmethod
+    def __filter_clauses(cls, filters: dict | None) -> list:
+        return [(*cls.FILTERS[name], value)
+                for name, value in (filters or {}).items()
+                if name in cls.FILTERS and value not in (None, '')]
+
+    def get_movies_page(self, limit: int, after: str | int | None = None,
+                        filters: dict | None = None,
+                        sort: str | None = None,
+                        include_reviews: bool = True) -> tuple[List[dict], str | int | None] | None:
+        """
+        Without reviews only the movies table is read,
+        review_count and avg_user_rating are still returned
+        """
+        order_by = self.SORT_OPTIONS.get(sort)
+        rows = self._data_manager.get_rows(self.__columns(include_reviews), limit + 1,
+                                           decode_cursor(after, order_by),
+                                           filters=self.__filter_clauses(filters),
+                                           order_by=order_by)
+        if rows is None:
+            return None
+
+        movies = self.__rows_to_movies(rows, include_reviews)
+        next_cursor = encode_cursor(movies[limit - 1], order_by) if len(movies) > limit else None
+        return movies[:limit], next_cursor
+
+    def get_candidate_movies_page(self, user_id: int, limit: int,
+                                  after: int | None = None) -> tuple[List[dict], int | None] | None:
+        """
+        Movies the user has not added to favourites yet, with the
+        CANDIDATE_COLUMNS only; one NOT EXISTS query on the
+        (user_id, movie_id) index of users_movies
+        """
+        rows = self._data_manager.get_rows(['id', *self.CANDIDATE_COLUMNS], limit + 1, after,
+                                           filters=[('users', 'none', {'user_id': user_id})])
+        if rows is None:
+            return None
+
+        movies = [dict(row) for row in rows[:limit]]
+        next_cursor = movies[-1]['id'] if len(rows) > limit else None
+        return movies, next_cursor
 
-    def get_movie(self, movie_id: int) -> dict | None:
-        movie = self._data_manager.get_item_by_id(movie_id)
-        if not movie:
+    def search_movies(self, query: str, limit: int,
+                      after: int | None = None) -> tuple[List[dict], int | None] | None:
+        """
+        Movies whose name or director contain every word of the query,
+        the last word as a prefix, best matches first; the cursor is the
+        number of movies already returned
+        """
+        terms = search_terms(query)
+        if not terms:
+            return [], None
+        offset = after or 0
+        rows = self._data_manager.search_rows(self.__columns(include_reviews=False), terms, limit + 1, offset,
+                                              fields=list(self.SEARCH_FIELDS),
+                                              max_candidates=self.SEARCH_MAX_CANDIDATES)
+        if rows is None:
             return None
-        return self.__movie_to_dict(movie)
+
+        movies = self.__rows_to_movies(rows, include_reviews=False)
+        next_cursor = offset + limit if len(movies) > limit else None
+        return movies[:limit], next_cursor
+
+    def autocomplete_movies(self, query: str, limit: int) -> List[dict] | None:
+        """Movies whose name has words starting with every word of the query"""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        rows = self._data_manager.search_rows(list(self.AUTOCOMPLETE_COLUMNS), terms, limit,
+                                              fields=list(self.AUTOCOMPLETE_FIELDS),
+                                              prefix_all=True,
+                                              max_candidates=self.SEARCH_MAX_CANDIDATES)
+        if rows is None:
+            return None
+        return [dict(row) for row in rows]
+
+    def has_movie(self, movie_id: int) -> bool:
+        return self._data_manager.get_item_by_id(movie_id) is not None
+
+    def get_existing_movie_ids(self, movie_ids: List[int]) -> set | None:
+        existing_movie_ids = set()
+        for _, chunk in chunked(sorted(movie_ids), ID_CHUNK_SIZE):
+            rows = self._data_manager.get_rows(['id'], filters=[('id', 'in', chunk)])
+            if rows is None:
+                return None
+            existing_movie_ids.update(row['id'] for row in rows)
+        return existing_movie_ids
+
+    def get_movie(self, movie_id: int, include_reviews: bool = True) -> dict | None:
+        rows = self._data_manager.get_rows(self.__columns(include_reviews), filters=[('id', '==', movie_id)])
+        if not rows:
+            return None
+        return self.__rows_to_movies(rows, include_reviews)[0]
 
     @staticmethod
-    def __instantiate_new_movie(new_movie_info):
-        return Movie(
-            movie_name=new_movie_info['movie_name'],
-            director=new_movie_info['director'],
-            year=new_movie_info['year'],
-            rating=new_movie_info['rating'],
-            poster=new_movie_info['poster'],
-            website=new_movie_info['website']
-        )
+    def __new_movie_values(new_movie_info) -> dict:
+        return {'movie_name': new_movie_info['movie_name'],
+                'director': new_movie_info['director'],
+                'year': new_movie_info['year'],
+                'rating': new_movie_info['rating'],
+                'poster': new_movie_info['poster'],
+                'website': new_movie_info['website']
+                }
+
+    @classmethod
+    def __instantiate_new_movie(cls, new_movie_info):
+        return Movie(**cls.__new_movie_values(new_movie_info))
 
+    @notifies_write('movies')
     def add_new_movie(self, new_movie_info: dict) -> bool | None:
         return self._data_manager.add_item(self.__instantiate_new_movie(new_movie_info))
 
+    @notifies_write('movies')
+    def add_movie_for_enrichment(self, movie_name: str) -> bool | None:
+        """Add the movie with empty OMDb fields and queue it for enrichment"""
+        now = time.time()
+        return self._data_manager.add_item(Movie(movie_name=movie_name,
+                                                 director='',
+                                                 year=0,
+                                                 rating=0.0,
+                                                 poster='',
+                                                 website='',
+                                                 enrichment_status='pending',
+                                                 enrichment_job=EnrichmentJob(created_at=now,
+                                                                              next_attempt_at=now)))
+
+    @notifies_write('movies')
+    def add_new_movies(self, new_movies_info: List[dict], chunk_size: int = 1000) -> dict | None:
+        return self._data_manager.add_items([self.__new_movie_values(new_movie_info)
+                                             for new_movie_info in new_movies_info],
+                                            chunk_size)
+
+    @notifies_write('movies')
     def update_movie(self, updated_movie: dict):
         return self._data_manager.update_item(updated_movie)
 
+    @notifies_write('movies')
+    def update_movies(self, updated_movies: List[dict], chunk_size: int = 1000) -> dict | None:
+        return self._data_manager.update_items(updated_movies, chunk_size)
+
+    @notifies_write('movies', 'users_movies', 'movies_reviews')
     def delete_movie(self, movie_id: int) -> bool | None:
         return self._data_manager.delete_item(movie_id)
+
+    @notifies_write('movies', 'users_movies', 'movies_reviews')
+    def delete_movies(self, movie_ids: List[int], chunk_size: int = 1000) -> dict | None:
+        return self._data_manager.delete_items(movie_ids, chunk_size)
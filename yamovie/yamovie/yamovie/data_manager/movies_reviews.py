@@ -1,33 +1,67 @@
+from .cursors import decode_cursor, encode_cursor
 from .data_manager_interface import DataManagerInterface
 from .data_models import MovieReview
+from .write_listeners import WriteListenersMixin, notifies_write
 
 
-class MoviesReviews:
+class MoviesReviews(WriteListenersMixin):
+    COLUMNS = ('id', 'user_id', 'movie_id', 'rating', 'review_text', 'user.user_name')
+    # ids grow with every review, so they order reviews by recency
+    SORT_OPTIONS = {'rating': ('rating', False),
+                    '-rating': ('rating', True),
+                    'newest': ('id', True)}
 
     def __init__(self, data_manager: DataManagerInterface):
         self._data_manager = data_manager
 
     @staticmethod
-    def __review_to_dict(review) -> dict:
+    def __row_to_review(row) -> dict:
         return {
-            "id": review.id,
-            "user_id": review.user_id,
-            "movie_id": review.movie_id,
-            "rating": review.rating,
-            "review_text": review.review_text,
-            "user_name": review.user.user_name,
+            "id": row['id'],
+            "user_id": row['user_id'],
+            "movie_id": row['movie_id'],
+            "rating": row['rating'],
+            "review_text": row['review_text'],
+            "user_name": row['user.user_name'],
+            "user": {"user_id": row['user_id'],
+                     "user_name": row['user.user_name']},
         }
 
     def get_movie_reviews(self) -> list[dict] | None:
-        movie_reviews_query = self._data_manager.get_all_data()
+        rows = self._data_manager.get_rows(list(self.COLUMNS))
+        if rows is None:
+            return None
+        return [self.__row_to_review(row) for row in rows]
 
-        if movie_reviews_query is None:
+    def __get_reviews_page(self, filters: list, limit: int, after: str | int | None,
+                           sort: str | None) -> tuple[list[dict], str | int | None] | None:
+        order_by = self.SORT_OPTIONS.get(sort)
+        rows = self._data_manager.get_rows(list(self.COLUMNS), limit + 1,
+                                           decode_cursor(after, order_by),
+                                           filters=filters,
+                                           order_by=order_by)
+        if rows is None:
             return None
 
-        reviews = []
-        for review in movie_reviews_query:
-            reviews.append(self.__review_to_dict(review))
-        return reviews
+        reviews = [self.__row_to_review(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(reviews[-1], order_by) if len(rows) > limit else None
+        return reviews, next_cursor
+
+    def get_movie_reviews_page(self, movie_id: int, limit: int, after: str | int | None = None,
+                               sort: str | None = None) -> tuple[list[dict], str | int | None] | None:
+        """
+        Reviews of one movie, read through the (movie_id, rating)
+        and movie_id indexes of movies_reviews
+        """
+        return self.__get_reviews_page([('movie_id', '==', movie_id)], limit, after, sort)
+
+    def get_user_reviews_page(self, user_id: int, limit: int, after: str | int | None = None,
+                              sort: str | None = None) -> tuple[list[dict], str | int | None] | None:
+        return self.__get_reviews_page([('user_id', '==', user_id)], limit, after, sort)
+
+    def has_movie_review(self, user_id: int, movie_id: int) -> bool:
+        return bool(self._data_manager.get_rows(['id'], 1, filters=[('user_id', '==', user_id),
+                                                                     ('movie_id', '==', movie_id)]))
 
     @staticmethod
     def __instantiate_new_movie(new_movie_review):
@@ -38,5 +72,10 @@ class MoviesReviews:
             review_text=new_movie_review['review_text']
         )
 
+    @notifies_write('movies_reviews', 'movies')
     def add_movie_review(self, new_movie_review: dict) -> bool | None:
         return self._data_manager.add_item(self.__instantiate_new_movie(new_movie_review))
+
+    @notifies_write('movies_reviews', 'movies')
+    def delete_movie_review(self, movie_review_id: int) -> bool | None:
+        return self._data_manager.delete_item(movie_review_id)
@@ -0,0 +1,74 @@
+import re
+import unicodedata
+
+WORD = re.compile(r'\w+')
+# more terms than this only narrow down results that are already few
+MAX_TERMS = 8
+
+
+# Russian is mostly written with е for ё, so the index (see fold_sql)
+# and the queries both use е
+FOLDED_LETTERS = {'ё': 'е', 'Ё': 'Е'}
+
+
+def fold(text: str) -> str:
+    """
+    Lowercase, without the diacritics of Latin letters, like the FTS5
+    unicode61 tokenizer with remove_diacritics 2, which keeps й and ё
+    """
+    folded = []
+    for character in unicodedata.normalize('NFC', text.lower()):
+        character = FOLDED_LETTERS.get(character, character)
+        decomposed = unicodedata.normalize('NFD', character)
+        if len(decomposed) > 1 and decomposed[0].isascii():
+            character = ''.join(part for part in decomposed if not unicodedata.combining(part))
+        folded.append(character)
+    return ''.join(folded)
+
+
+def fold_sql(expression: str) -> str:
+    """SQL expression folding the FOLDED_LETTERS of a column before the tokenizer"""
+    for letter, replacement in FOLDED_LETTERS.items():
+        expression = f"replace({expression}, '{letter}', '{replacement}')"
+    return expression
+
+
+def search_terms(query: str | None) -> list:
+    """The folded words of a search box input, at most MAX_TERMS"""
+    return WORD.findall(fold(query or ''))[:MAX_TERMS]
+
+
+def is_prefix_term(position: int, terms: list, prefix_all: bool) -> bool:
+    """The last term is still being typed, so it matches as a prefix"""
+    return prefix_all or position == len(terms) - 1
+
+
+def fts_match_expression(terms: list, fields: list, prefix_all: bool = False) -> str:
+    """
+    FTS5 MATCH expression requiring every term in one of the fields;
+    the terms are quoted strings, so no input is read as FTS5 syntax
+    (search_terms only keeps word characters, which never include '"')
+    """
+    column_filter = '{' + ' '.join(fields) + '}'
+    return ' AND '.join(f'{column_filter} : "{term}"' + ('*' if is_prefix_term(position, terms, prefix_all) else '')
+                        for position, term in enumerate(terms))
+
+
+def match_score(item: dict, terms: list, weights: dict, prefix_all: bool = False) -> float:
+    """
+    Relevance of the item for the JSON data managers: the weight of the
+    best field each term is a word (or word prefix) of, 0 if a term
+    matches no field
+    """
+    field_words = {field: WORD.findall(fold(str(item.get(field) or ''))) for field in weights}
+    score = 0.0
+    for position, term in enumerate(terms):
+        prefix = is_prefix_term(position, terms, prefix_all)
+        term_score = max((weight for field, weight in weights.items()
+                          if any(word.startswith(term) if prefix else word == term
+                                 for word in field_words[field])),
+                         default=0.0)
+        if not term_score:
+            return 0.0
+        score += term_score
+    return score
@@ -1,8 +1,37 @@
+import operator
 from abc import ABC
 
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import and_, or_, func, inspect, insert, literal_column, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import aliased, joinedload, selectinload
 
 from .data_manager_interface import DataManagerInterface
+from .data_models import bump_table_versions, search_table
+from .search import fts_match_expression
+
+LOADING_STRATEGIES = {'selectin': selectinload,
+                      'joined': joinedload}
+
+# U+10FFFF sorts after every other character, which turns a prefix match
+# into a range scan that can use the column index (LIKE 'x%' cannot)
+FILTER_OPERATORS = {'==': operator.eq,
+                    '>=': operator.ge,
+                    '<=': operator.le,
+                    'prefix': lambda column, value: and_(column >= value,
+                                                         column < value + '\U0010ffff'),
+                    'in': lambda column, values: column.in_(values),
+                    # NOT EXISTS over the relationship's table
+                    'none': lambda relationship, criteria: ~relationship.any(**criteria)}
+
+
+# SQLite before 3.32 allows 999 variables per statement, the size of
+# the chunks of ids in IN lists
+ID_CHUNK_SIZE = 900
+
+
+def chunked(items: list, chunk_size: int):
+    for start in range(0, len(items), chunk_size):
+        yield start, items[start:start + chunk_size]
 
 
 class SQLiteDataManager(DataManagerInterface, ABC):
@@ -12,28 +41,190 @@ class SQLiteDataManager(DataManagerInterface, ABC):
         self._id_key = id_key
         self._entity = entity
 
-    def get_all_data(self):
+    def _loader_options(self, loading_plan: dict | None) -> list:
+        """
+        Turn a loading plan such as
+        {'movie_reviews': 'selectin', 'movie_reviews.user': 'joined'}
+        into loader options; every segment of a nested path uses the
+        strategy declared for its own prefix (selectin if not declared)
+        """
+        options = []
+        for path, strategy in (loading_plan or {}).items():
+            entity = self._entity
+            option = None
+            segments = path.split('.')
+            for depth, attribute_name in enumerate(segments):
+                prefix = '.'.join(segments[:depth + 1])
+                strategy_name = loading_plan.get(prefix, strategy)
+                attribute = getattr(entity, attribute_name)
+                if option is None:
+                    option = LOADING_STRATEGIES[strategy_name](attribute)
+                else:
+                    option = getattr(option, f'{strategy_name}load')(attribute)
+                entity = attribute.property.mapper.class_
+            options.append(option)
+        return options
+
+    def _query(self, loading_plan: dict | None = None):
+        return self._entity.query.options(*self._loader_options(loading_plan))
+
+    def _filter_clauses(self, filters: list | None) -> list:
+        return [FILTER_OPERATORS[operation](getattr(self._entity, column), value)
+                for column, operation, value in filters or []]
+
+    def get_all_data(self, loading_plan: dict | None = None):
         try:
-            return self._entity.query.all()
+            return self._query(loading_plan).all()
         except SQLAlchemyError as err:
             print(err)
             self.db.session.rollback()
             return None
 
-    def get_item_by_id(self, item_id):
+    def get_item_by_id(self, item_id, loading_plan: dict | None = None):
         try:
-            return self._entity.query. \
+            return self._query(loading_plan). \
                 filter(getattr(self._entity, self._id_key) == item_id). \
                 one()
         except SQLAlchemyError:
             self.db.session.rollback()
             return None
 
+    @staticmethod
+    def _keyset_clause(column, id_column, after: tuple, descending: bool):
+        """
+        Rows after (value, id) for ORDER BY column, id in the given
+        direction; SQLite sorts NULLs first ascending and last descending
+        """
+        value, item_id = after
+        if not descending:
+            if value is None:
+                return or_(and_(column.is_(None), id_column > item_id), column.is_not(None))
+            return or_(column > value, and_(column == value, id_column > item_id))
+        if value is None:
+            return and_(column.is_(None), id_column < item_id)
+        return or_(column < value, and_(column == value, id_column < item_id), column.is_(None))
+
+    def _page_clauses(self, after, filters: list | None, order_by: tuple | None) -> tuple[list, list]:
+        """WHERE and ORDER BY clauses of the keyset page after the cursor"""
+        id_column = getattr(self._entity, self._id_key)
+        where_clauses = self._filter_clauses(filters)
+        if order_by is None:
+            if after is not None:
+                where_clauses.append(id_column > after)
+            return where_clauses, [id_column]
+
+        column_name, descending = order_by
+        column = getattr(self._entity, column_name)
+        if after is not None:
+            where_clauses.append(self._keyset_clause(column, id_column, after, descending))
+        if descending:
+            return where_clauses, [column.desc(), id_column.desc()]
+        return where_clauses, [column, id_column]
+
+    def get_page(self, limit: int, after=None,
+                 filters: list | None = None,
+                 loading_plan: dict | None = None,
+                 order_by: tuple | None = None):
+        try:
+            where_clauses, order_clauses = self._page_clauses(after, filters, order_by)
+            return self._query(loading_plan).filter(*where_clauses).order_by(*order_clauses).limit(limit).all()
+        except SQLAlchemyError as err:
+            print(err)
+            self.db.session.rollback()
+            return None
+
+    def _projection(self, columns: list) -> tuple[list, list, list]:
+        """
+        Labelled columns for paths such as 'movie_reviews.user.user_name',
+        with one aliased LEFT OUTER JOIN per relationship path, and the
+        primary keys of the joined collections to order the related rows
+        by; many-to-one joins add no rows and need no order
+        """
+        aliases = {'': self._entity}
+        joins, selected, related_keys = [], [], []
+        for path in columns:
+            *relationship_names, column_name = path.split('.')
+            prefix = ''
+            for relationship_name in relationship_names:
+                parent = aliases[prefix]
+                prefix = f'{prefix}.{relationship_name}' if prefix else relationship_name
+                if prefix in aliases:
+                    continue
+                relationship = getattr(parent, relationship_name)
+                alias = aliased(relationship.property.mapper.class_)
+                aliases[prefix] = alias
+                joins.append(relationship.of_type(alias))
+                if relationship.property.uselist:
+                    mapper = inspect(alias).mapper
+                    related_keys.extend(getattr(alias, mapper.get_property_by_column(key).key)
+                                        for key in mapper.primary_key)
+            selected.append(getattr(aliases[prefix], column_name).label(path))
+        return selected, joins, related_keys
+
+    def get_rows(self, columns: list, limit: int | None = None, after=None,
+                 filters: list | None = None,
+                 order_by: tuple | None = None) -> list | None:
+        id_column = getattr(self._entity, self._id_key)
+        try:
+            selected, joins, related_keys = self._projection(columns)
+            statement = select(*selected).select_from(self._entity)
+            for join in joins:
+                statement = statement.outerjoin(join)
+
+            where_clauses, order_clauses = self._page_clauses(after, filters, order_by)
+            if related_keys and (where_clauses or limit is not None):
+                # page the root items, not the joined collection rows
+                page = select(id_column).where(*where_clauses).order_by(*order_clauses).limit(limit)
+                statement = statement.where(id_column.in_(page))
+            else:
+                statement = statement.where(*where_clauses).limit(limit)
+            return self.db.session.execute(statement.order_by(*order_clauses, *related_keys)).mappings().all()
+        except SQLAlchemyError as err:
+            print(err)
+            self.db.session.rollback()
+            return None
+
+    def search_rows(self, columns: list, terms: list, limit: int, offset: int = 0,
+                    fields: list | None = None,
+                    prefix_all: bool = False,
+                    max_candidates: int | None = None) -> list | None:
+        """
+        Ranked with bm25 in the FTS5 index of the entity (see
+        create_search_index); the index is paged on its own and only the
+        page is joined to the columns. A match scan with a limit stops
+        early, ranking every match of a common prefix does not
+        """
+        id_column = getattr(self._entity, self._id_key)
+        weights = self._entity.__search_columns__
+        fts = search_table(self._entity)
+        try:
+            selected, joins, related_keys = self._projection(columns)
+            matches = (select(fts.c.rowid, func.bm25(literal_column(fts.name), *weights.values()).label('rank')).
+                       where(literal_column(fts.name).op('MATCH')(fts_match_expression(terms, fields or list(weights),
+                                                                                       prefix_all))))
+            if max_candidates is not None:
+                matches = matches.order_by(fts.c.rowid).limit(max_candidates)
+            matches = matches.subquery()
+            page = (select(matches.c.rowid, matches.c.rank).
+                    order_by(matches.c.rank, matches.c.rowid).
+                    limit(limit).offset(offset).subquery())
+            statement = select(*selected).select_from(page).join(self._entity, id_column == page.c.rowid)
+            for join in joins:
+                statement = statement.outerjoin(join)
+            return self.db.session.execute(statement.order_by(page.c.rank, id_column, *related_keys)).mappings().all()
+        except SQLAlchemyError as err:
+            print(err)
+            self.db.session.rollback()
+            return None
+
     def add_item(self, new_item) -> bool | None:
         try:
             self.db.session.add(new_item)
             self.db.session.commit()
             return True
+        except IntegrityError:
+            self.db.session.rollback()
+            return False
         except SQLAlchemyError:
             self.db.session.rollback()
             return None
@@ -61,3 +252,78 @@ class SQLiteDataManager(DataManagerInterface, ABC):
         except SQLAlchemyError:
             self.db.session.rollback()
             return None
+
+    def _bump_version(self):
+        # Core statements bypass the session's after_flush version hook
+        bump_table_versions(self.db.session.connection(), [self._entity.__table__.name])
+
+    def _write_chunks(self, items: list, chunk_size: int, write_chunk, write_row) -> dict:
+        """
+        Write every chunk in one transaction; when a chunk fails it is
+        replayed row by row so the report can name the failing rows
+        """
+        report = {'succeeded': 0, 'failed': []}
+        for start, chunk in chunked(items, chunk_size):
+            try:
+                write_chunk(chunk)
+                self._bump_version()
+                self.db.session.commit()
+                report['succeeded'] += len(chunk)
+                continue
+            except (SQLAlchemyError, LookupError):
+                self.db.session.rollback()
+
+            for index, item in enumerate(chunk, start):
+                try:
+                    write_row(item)
+                    self._bump_version()
+                    self.db.session.commit()
+                    report['succeeded'] += 1
+                except (SQLAlchemyError, LookupError) as err:
+                    self.db.session.rollback()
+                    # DBAPI errors carry the statement; report only the cause
+                    report['failed'].append({'index': index, 'error': str(getattr(err, 'orig', err))})
+        return report
+
+    def add_items(self, new_items: list, chunk_size: int = 1000) -> dict:
+        statement = insert(self._entity)
+        return self._write_chunks(new_items, chunk_size,
+                                  lambda chunk: self.db.session.execute(statement, chunk),
+                                  lambda item: self.db.session.execute(statement, [item]))
+
+    def update_items(self, updated_items: list, chunk_size: int = 1000) -> dict:
+        id_column = getattr(self._entity, self._id_key)
+
+        def update_row(item):
+            if self._id_key not in item:
+                raise LookupError(f'Item has no {self._id_key}')
+            values = {key: value for key, value in item.items() if key != self._id_key}
+            result = self.db.session.execute(update(self._entity).
+                                             where(id_column == item[self._id_key]).
+                                             values(values))
+            if result.rowcount == 0:
+                raise LookupError(f'No item with {self._id_key} {item[self._id_key]}')
+
+        return self._write_chunks(updated_items, chunk_size,
+                                  lambda chunk: self.db.session.execute(update(self._entity), chunk),
+                                  update_row)
+
+    def delete_items(self, item_ids: list, chunk_size: int = 1000) -> dict:
+        # ORM deletes so that relationship cascades still apply
+        id_column = getattr(self._entity, self._id_key)
+
+        def delete_chunk(chunk):
+            items = self._entity.query.filter(id_column.in_(chunk)).all()
+            # a repeated id is reported as not found, like a deleted one
+            if len(items) != len(chunk):
+                raise LookupError('Some items do not exist')
+            for item in items:
+                self.db.session.delete(item)
+
+        def delete_row(item_id):
+            item = self._entity.query.get(item_id)
+            if item is None:
+                raise LookupError(f'No item with {self._id_key} {item_id}')
+            self.db.session.delete(item)
+
+        return self._write_chunks(item_ids, chunk_size, delete_chunk, delete_row)
@@ -0,0 +1,19 @@
+from sqlalchemy import event, text
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict):
+    """
+    Run the PRAGMA statements on every new DBAPI connection of the engine
+    """
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def get_effective_pragmas(engine, names) -> dict:
+    with engine.connect() as connection:
+        return {name: connection.execute(text(f'PRAGMA {name}')).scalar()
+                for name in names}
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from data_manager.data_models import Movie, db
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager, ID_CHUNK_SIZE
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+    path = str(tmp_path / 'bulk_writes.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump([{"id": 1, "movie_name": "Titanic"},
+                   {"id": 2, "movie_name": "Tetris"}], file)
+    return path
+
+
+@pytest.fixture
+def json_data_manager(file_path) -> JSONDataManager:
+    return JSONDataManager(file_path, 'id')
+
+
+@pytest.fixture
+def sqlite_data_manager() -> SQLiteDataManager:
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Movie(id=1, movie_name='Titanic'), Movie(id=2, movie_name='Tetris')])
+        db.session.commit()
+        yield SQLiteDataManager('id', Movie, db)
+
+
+def read_test_file(file_path) -> list:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def stored_movies() -> dict:
+    db.session.expire_all()
+    return {movie.id: movie.movie_name for movie in Movie.query.order_by(Movie.id)}
+
+
+def test_add_items(json_data_manager, file_path):
+    report = json_data_manager.add_items([{"movie_name": "Inception"}, "invalid", {"movie_name": "Up"}])
+    assert report == {'succeeded': 2, 'failed': [{'index': 1, 'error': 'Item must be an object'}]}
+    assert [item['id'] for item in read_test_file(file_path)] == [1, 2, 3, 4]
+
+
+def test_update_items(json_data_manager, file_path):
+    report = json_data_manager.update_items([{"id": 2, "movie_name": "Up"}, {"id": 7, "movie_name": "Up"}])
+    assert report == {'succeeded': 1, 'failed': [{'index': 1, 'error': 'Item not found'}]}
+    assert read_test_file(file_path)[1]['movie_name'] == 'Up'
+
+
+def test_delete_items(json_data_manager, file_path):
+    report = json_data_manager.delete_items([1, 1, 5])
+    assert report['succeeded'] == 1
+    assert [failure['index'] for failure in report['failed']] == [1, 2]
+    assert read_test_file(file_path) == [{"id": 2, "movie_name": "Tetris"}]
+
+
+def test_fail_to_add_items_when_file_not_exist(json_data_manager, file_path):
+    os.remove(file_path)
+    assert json_data_manager.add_items([{"movie_name": "Up"}]) is None
+
+
+def test_sqlite_add_items_replays_a_failing_chunk(sqlite_data_manager):
+    report = sqlite_data_manager.add_items([{'movie_name': 'Up'}, {'movie_name': 'Cars'},
+                                            {'movie_name': 'Up'}, {'movie_name': 'Heat'}], chunk_size=3)
+    assert report == {'succeeded': 3,
+                      'failed': [{'index': 2, 'error': 'UNIQUE constraint failed: movies.movie_name'}]}
+    assert stored_movies() == {1: 'Titanic', 2: 'Tetris', 3: 'Up', 4: 'Cars', 5: 'Heat'}
+
+
+def test_sqlite_update_items_reports_unknown_and_missing_ids(sqlite_data_manager):
+    report = sqlite_data_manager.update_items([{'id': 2, 'movie_name': 'Up'}, {'id': 7, 'movie_name': 'Cars'},
+                                               {'movie_name': 'Heat'}])
+    assert report == {'succeeded': 1, 'failed': [{'index': 1, 'error': 'No item with id 7'},
+                                                 {'index': 2, 'error': 'Item has no id'}]}
+    assert stored_movies() == {1: 'Titanic', 2: 'Up'}
+
+
+def test_sqlite_delete_items_reports_unknown_and_repeated_ids(sqlite_data_manager):
+    report = sqlite_data_manager.delete_items([1, 1, 5])
+    assert report == {'succeeded': 1, 'failed': [{'index': 1, 'error': 'No item with id 1'},
+                                                 {'index': 2, 'error': 'No item with id 5'}]}
+    assert stored_movies() == {2: 'Tetris'}
+
+
+def test_existing_movie_ids_are_read_in_chunks(sqlite_data_manager):
+    movies = Movies(sqlite_data_manager)
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[3]))
+    assert movies.get_existing_movie_ids(set(range(2, 2 * ID_CHUNK_SIZE + 2))) == {2}
+    assert [len(parameters) for parameters in statements] == [ID_CHUNK_SIZE, ID_CHUNK_SIZE]
@@ -0,0 +1,62 @@
+from flask import Flask
+from sqlalchemy import event
+
+from data_manager.data_models import User, Movie, UserMovie, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+
+
+def create_test_data(movies: int, favourite_movie_ids):
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([User(id=1, user_name='User 1'), User(id=2, user_name='User 2')])
+    db.session.add_all(Movie(id=number, movie_name=f'Movie {number}') for number in range(1, movies + 1))
+    db.session.add_all(UserMovie(user_id=1, movie_id=movie_id) for movie_id in favourite_movie_ids)
+    db.session.add(UserMovie(user_id=2, movie_id=2))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_candidates_exclude_only_the_users_favourites():
+    with app.app_context():
+        create_test_data(6, [1, 3])
+        movies, next_cursor = movies_data_manager.get_candidate_movies_page(1, 10)
+    assert [movie['id'] for movie in movies] == [2, 4, 5, 6]
+    assert next_cursor is None
+    assert set(movies[0]) == {'id', 'movie_name', 'director', 'year', 'rating', 'poster', 'website'}
+
+
+def test_candidates_are_paginated():
+    with app.app_context():
+        create_test_data(6, [1, 3])
+        first_page, next_cursor = movies_data_manager.get_candidate_movies_page(1, 2)
+        second_page, last_cursor = movies_data_manager.get_candidate_movies_page(1, 2, next_cursor)
+    assert [movie['id'] for movie in first_page] == [2, 4]
+    assert [movie['id'] for movie in second_page] == [5, 6]
+    assert last_cursor is None
+
+
+def test_candidates_take_one_query_selecting_only_needed_columns():
+    statements = []
+
+    def before_cursor_execute(_connection, _cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    with app.app_context():
+        create_test_data(50, range(1, 40))
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            movies_data_manager.get_candidate_movies_page(1, 5)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        statement, parameters = statements[0]
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    assert len(statements) == 1
+    assert 'NOT (EXISTS' in statement and 'review_count' not in statement
+    assert any('ix_users_movies_user_id_movie_id' in row[-1] for row in plan)
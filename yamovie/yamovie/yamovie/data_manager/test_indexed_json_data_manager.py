@@ -0,0 +1,108 @@
+import gc
+import json
+import os
+import weakref
+
+import pytest
+
+from data_manager import indexed_json_data_manager
+from data_manager.indexed_json_data_manager import IndexedJSONDataManager
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+    path = str(tmp_path / 'indexed.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump([{"id": 1, "movie_name": "Titanic"},
+                   {"id": 2, "movie_name": "Tetris"}], file)
+    return path
+
+
+@pytest.fixture
+def data_manager(file_path):
+    with IndexedJSONDataManager(file_path, 'id', compact_every=3) as data_manager:
+        yield data_manager
+
+
+def read_test_file(file_path) -> list:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def test_get_item_by_id(data_manager):
+    assert data_manager.get_item_by_id(2)['movie_name'] == 'Tetris'
+    assert data_manager.get_item_by_id(5) is None
+
+
+def test_changes_go_to_the_log_not_the_file(data_manager, file_path):
+    assert data_manager.add_item({"movie_name": "Up"})
+    assert data_manager.delete_item(1)
+    assert len(read_test_file(file_path)) == 2
+    with open(f'{file_path}.log', 'r', encoding='utf-8') as log_file:
+        assert len(log_file.readlines()) == 2
+
+
+def test_log_is_replayed_on_load(data_manager, file_path):
+    data_manager.add_item({"movie_name": "Up"})
+    data_manager.update_item({"id": 2, "movie_name": "Tetris 2"})
+
+    reloaded_data_manager = IndexedJSONDataManager(file_path, 'id')
+    assert [item['movie_name'] for item in reloaded_data_manager.get_all_data()] == \
+           ['Titanic', 'Tetris 2', 'Up']
+    assert reloaded_data_manager.generate_new_id() == 4
+
+
+def test_log_is_compacted_into_the_file(data_manager, file_path):
+    data_manager.add_items([{"movie_name": "Up"}, {"movie_name": "Cars"}])
+    data_manager.delete_item(1)
+    assert [item['id'] for item in read_test_file(file_path)] == [2, 3, 4]
+    assert os.path.getsize(f'{file_path}.log') == 0
+
+
+def test_partial_last_log_line_is_ignored(data_manager, file_path):
+    data_manager.add_item({"movie_name": "Up"})
+    with open(f'{file_path}.log', 'a', encoding='utf-8') as log_file:
+        log_file.write('{"op": "put", "item": {"id"')
+
+    reloaded_data_manager = IndexedJSONDataManager(file_path, 'id')
+    assert len(reloaded_data_manager.get_all_data()) == 3
+
+
+def test_changes_after_a_partial_log_line_survive_a_reload(data_manager, file_path):
+    data_manager.add_item({"movie_name": "Up"})
+    with open(f'{file_path}.log', 'a', encoding='utf-8') as log_file:
+        log_file.write('{"op": "put", "item": {"id"')
+
+    reloaded_data_manager = IndexedJSONDataManager(file_path, 'id')
+    assert reloaded_data_manager.add_item({"movie_name": "Cars"})
+    assert reloaded_data_manager.delete_item(1)
+    assert [item['movie_name'] for item in IndexedJSONDataManager(file_path, 'id').get_all_data()] == \
+           ['Tetris', 'Up', 'Cars']
+
+
+def test_close_compacts_the_log(file_path):
+    with IndexedJSONDataManager(file_path, 'id') as data_manager:
+        data_manager.add_item({"movie_name": "Up"})
+        assert len(read_test_file(file_path)) == 2
+    assert len(read_test_file(file_path)) == 3
+    assert os.path.getsize(f'{file_path}.log') == 0
+
+
+def test_shutdown_compacts_only_live_data_managers_with_files(file_path):
+    data_manager = IndexedJSONDataManager(file_path, 'id')
+    data_manager.add_item({"movie_name": "Up"})
+    reference = weakref.ref(data_manager)
+    del data_manager
+    gc.collect()
+    assert reference() is None  # nothing else keeps it alive
+
+    data_manager = IndexedJSONDataManager(file_path, 'id')
+    data_manager.add_item({"movie_name": "Cars"})
+    indexed_json_data_manager._compact_at_shutdown()
+    assert [item['movie_name'] for item in read_test_file(file_path)] == ['Titanic', 'Tetris', 'Up', 'Cars']
+
+    data_manager.add_item({"movie_name": "Heat"})
+    os.remove(file_path)
+    os.remove(f'{file_path}.log')
+    indexed_json_data_manager._compact_at_shutdown()
+    assert not os.path.exists(file_path)
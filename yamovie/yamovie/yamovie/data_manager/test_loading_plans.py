@@ -0,0 +1,83 @@
+from flask import Flask
+from sqlalchemy import event
+
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from data_manager.movies import Movies
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+users_movies_data_manager = UsersMovies(SQLiteDataManager('id', UserMovie, db))
+
+
+def create_test_data(rows: int):
+    db.drop_all()
+    db.create_all()
+    for number in range(1, rows + 1):
+        db.session.add(User(id=number, user_name=f'User {number}'))
+        db.session.add(Movie(id=number, movie_name=f'Movie {number}'))
+    db.session.flush()
+    for number in range(1, rows + 1):
+        db.session.add(UserMovie(user_id=number, movie_id=number))
+        db.session.add(MovieReview(user_id=number, movie_id=number, rating=5.0))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def count_queries(function) -> int:
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        function()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    db.session.expunge_all()
+    return len(statements)
+
+
+def test_get_movies_query_count_does_not_grow_with_rows():
+    with app.app_context():
+        create_test_data(2)
+        few_rows = count_queries(movies_data_manager.get_movies)
+        create_test_data(20)
+        many_rows = count_queries(movies_data_manager.get_movies)
+    assert few_rows == many_rows
+
+
+def test_get_all_users_query_count_does_not_grow_with_rows():
+    with app.app_context():
+        create_test_data(2)
+        few_rows = count_queries(users_data_manager.get_all_users)
+        create_test_data(20)
+        many_rows = count_queries(users_data_manager.get_all_users)
+    assert few_rows == many_rows
+
+
+def test_get_movie_loads_reviews_with_users():
+    with app.app_context():
+        create_test_data(3)
+        movie = movies_data_manager.get_movie(2)
+    assert movie['movie_reviews'][0]['user']['user_name'] == 'User 2'
+
+
+def test_get_all_users_movies_groups_favourites_by_user():
+    with app.app_context():
+        create_test_data(2)
+        db.session.add(UserMovie(user_id=1, movie_id=2))
+        db.session.commit()
+        db.session.expunge_all()
+        users = users_movies_data_manager.get_all_users_movies()
+        queries = count_queries(users_movies_data_manager.get_all_users_movies)
+    assert [(user['name'], [movie['name'] for movie in user['movies']]) for user in users] == \
+           [('User 1', ['Movie 1', 'Movie 2']), ('User 2', ['Movie 2'])]
+    assert queries == 1
@@ -0,0 +1,90 @@
+import json
+import os
+from types import GeneratorType
+
+import pytest
+
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.users_movies import UsersMovies
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+    path = str(tmp_path / 'movies.ndjson')
+    with open(path, 'w', encoding='utf-8') as file:
+        for item_id, movie_name in ((1, "Titanic"), (2, "Tetris"), (3, "Up")):
+            file.write(json.dumps({"id": item_id, "movie_name": movie_name}) + '\n')
+    return path
+
+
+@pytest.fixture
+def ndjson_data_manager(file_path) -> JSONDataManager:
+    return JSONDataManager(file_path, 'id')
+
+
+def read_test_file(file_path) -> list:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_get_all_data_streams_records(ndjson_data_manager):
+    items = ndjson_data_manager.get_all_data()
+    assert isinstance(items, GeneratorType)
+    assert [item['id'] for item in items] == [1, 2, 3]
+
+
+def test_fail_to_get_all_data_when_file_not_exist(ndjson_data_manager, file_path):
+    os.remove(file_path)
+    assert ndjson_data_manager.get_all_data() is None
+
+
+def test_add_item_appends_a_line(ndjson_data_manager, file_path):
+    assert ndjson_data_manager.add_item({"movie_name": "Cars"})
+    assert read_test_file(file_path)[-1] == {"movie_name": "Cars", "id": 4}
+
+
+def test_update_and_delete_item(ndjson_data_manager, file_path):
+    assert ndjson_data_manager.update_item({"id": 2, "movie_name": "Tetris 2"})
+    assert ndjson_data_manager.delete_item(1)
+    assert read_test_file(file_path) == [{"id": 2, "movie_name": "Tetris 2"},
+                                         {"id": 3, "movie_name": "Up"}]
+    assert ndjson_data_manager.delete_item(1) is None
+
+
+def test_partial_last_line_is_ignored(ndjson_data_manager, file_path):
+    with open(file_path, 'a', encoding='utf-8') as file:
+        file.write('{"id": 4, "movie_na')
+    assert [item['id'] for item in ndjson_data_manager.get_all_data()] == [1, 2, 3]
+
+
+def test_rewrite_leaves_no_temporary_files(ndjson_data_manager, tmp_path):
+    ndjson_data_manager.delete_items([1, 3])
+    assert os.listdir(tmp_path) == ['movies.ndjson']
+
+
+def test_append_after_a_partial_line_keeps_every_record(ndjson_data_manager, file_path):
+    with open(file_path, 'a', encoding='utf-8') as file:
+        file.write('{"id": 4, "movie_na')
+    assert ndjson_data_manager.add_item({"movie_name": "Cars"})
+    assert ndjson_data_manager.add_item({"movie_name": "Heat"})
+    assert read_test_file(file_path) == [{"id": 1, "movie_name": "Titanic"}, {"id": 2, "movie_name": "Tetris"},
+                                         {"id": 3, "movie_name": "Up"}, {"movie_name": "Cars", "id": 4},
+                                         {"movie_name": "Heat", "id": 5}]
+
+
+def test_bad_line_in_the_middle_is_skipped(ndjson_data_manager, file_path):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write('{"id": 1}\n{"id": 2, "mov\n{"id": 3}\n')
+    assert [item['id'] for item in ndjson_data_manager.get_all_data()] == [1, 3]
+
+
+def test_all_users_movies_are_read_from_embedded_items(tmp_path):
+    path = str(tmp_path / 'users_movies.ndjson')
+    with open(path, 'w', encoding='utf-8') as file:
+        for item_id, user_id, movie_id, movie_name in ((1, 1, 2, "Tetris"), (2, 2, 1, "Titanic"), (3, 1, 3, "Up")):
+            file.write(json.dumps({"id": item_id, "user_id": user_id, "movie_id": movie_id,
+                                   "user": {"user_name": f"User {user_id}"},
+                                   "movie": {"id": movie_id, "movie_name": movie_name}}) + '\n')
+    users = UsersMovies(JSONDataManager(path, 'id')).get_all_users_movies()
+    assert [(user['name'], [movie['name'] for movie in user['movies']]) for user in users] == \
+           [('User 1', ['Tetris', 'Up']), ('User 2', ['Titanic'])]
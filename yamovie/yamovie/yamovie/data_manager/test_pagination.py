@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from data_manager.json_data_manager import JSONDataManager
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+    return str(tmp_path / 'pagination.json')
+
+
+@pytest.fixture
+def json_data_manager(file_path) -> JSONDataManager:
+    return JSONDataManager(file_path, 'id')
+
+
+def write_test_file(file_path, test_data: list):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(test_data, file)
+
+
+def create_test_file(file_path):
+    write_test_file(file_path, [{"id": item_id, "user_id": item_id % 2, "rating": rating}
+                                for item_id, rating in ((5, 7.0), (1, 8.0), (4, None), (2, 7.0), (3, 9.0))])
+
+
+def test_get_first_page(json_data_manager, file_path):
+    create_test_file(file_path)
+    assert [item['id'] for item in json_data_manager.get_page(2)] == [1, 2]
+
+
+def test_get_page_after_cursor(json_data_manager, file_path):
+    create_test_file(file_path)
+    assert [item['id'] for item in json_data_manager.get_page(2, after=2)] == [3, 4]
+
+
+def test_get_last_page_is_short(json_data_manager, file_path):
+    create_test_file(file_path)
+    assert [item['id'] for item in json_data_manager.get_page(2, after=4)] == [5]
+
+
+def test_get_page_with_filter(json_data_manager, file_path):
+    create_test_file(file_path)
+    page = json_data_manager.get_page(10, filters=[('user_id', '==', 1)])
+    assert [item['id'] for item in page] == [1, 3, 5]
+
+
+def test_get_page_with_range_filter(json_data_manager, file_path):
+    create_test_file(file_path)
+    page = json_data_manager.get_page(10, filters=[('rating', '>=', 8.0)])
+    assert [item['id'] for item in page] == [1, 3]
+
+
+def test_get_page_with_in_filter(json_data_manager, file_path):
+    create_test_file(file_path)
+    page = json_data_manager.get_page(10, filters=[('id', 'in', [5, 2, 9])])
+    assert [item['id'] for item in page] == [2, 5]
+
+
+def test_get_rows_with_none_filter(json_data_manager, file_path):
+    test_data = [{"id": 1, "name": "A", "users": [{"user_id": 1}]},
+                 {"id": 2, "name": "B", "users": [{"user_id": 2}]},
+                 {"id": 3, "name": "C"}]
+    write_test_file(file_path, test_data)
+    rows = json_data_manager.get_rows(['id', 'name'], 10, filters=[('users', 'none', {'user_id': 1})])
+    assert rows == [{"id": 2, "name": "B"}, {"id": 3, "name": "C"}]
+
+
+def test_get_rows_flattens_embedded_items(json_data_manager, file_path):
+    test_data = [{"id": 1, "name": "A", "users": [{"user_id": 1}, {"user_id": 2}]},
+                 {"id": 2, "name": "B", "users": []}]
+    write_test_file(file_path, test_data)
+    rows = json_data_manager.get_rows(['id', 'users.user_id'])
+    assert rows == [{"id": 1, "users.user_id": 1},
+                    {"id": 1, "users.user_id": 2},
+                    {"id": 2, "users.user_id": None}]
+
+
+def test_get_pages_sorted_by_column_descending(json_data_manager, file_path):
+    create_test_file(file_path)
+    first_page = json_data_manager.get_page(2, order_by=('rating', True))
+    assert [item['id'] for item in first_page] == [3, 1]
+    second_page = json_data_manager.get_page(2, after=(8.0, 1), order_by=('rating', True))
+    assert [item['id'] for item in second_page] == [5, 2]
+    last_page = json_data_manager.get_page(2, after=(7.0, 2), order_by=('rating', True))
+    assert [item['id'] for item in last_page] == [4]
+
+
+def test_fail_to_get_page_when_file_not_exist(json_data_manager):
+    assert json_data_manager.get_page(2) is None
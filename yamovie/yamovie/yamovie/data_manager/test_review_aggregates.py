@@ -0,0 +1,84 @@
+from flask import Flask
+
+from data_manager.data_models import User, Movie, MovieReview, db, \
+    recompute_movie_review_aggregates
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
+
+
+def create_test_data():
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([User(id=1, user_name='Alice'),
+                        User(id=2, user_name='Bob'),
+                        Movie(id=1, movie_name='Titanic')])
+    db.session.commit()
+
+
+def add_review(user_id: int, rating: float):
+    return movies_reviews_data_manager.add_movie_review({'user_id': user_id,
+                                                         'movie_id': 1,
+                                                         'rating': rating,
+                                                         'review_text': ''})
+
+
+def get_aggregates() -> tuple:
+    db.session.expire_all()
+    movie = db.session.get(Movie, 1)
+    return movie.review_count, movie.avg_user_rating
+
+
+def test_add_reviews_updates_aggregates():
+    with app.app_context():
+        create_test_data()
+        add_review(1, 8.0)
+        add_review(2, '5')
+        assert get_aggregates() == (2, 6.5)
+
+
+def test_duplicate_review_does_not_change_aggregates():
+    with app.app_context():
+        create_test_data()
+        add_review(1, 8.0)
+        assert add_review(1, 2.0) is False
+        assert get_aggregates() == (1, 8.0)
+
+
+def test_delete_reviews_updates_aggregates():
+    with app.app_context():
+        create_test_data()
+        add_review(1, 8.0)
+        add_review(2, 5.0)
+        movies_reviews_data_manager.delete_movie_review(1)
+        assert get_aggregates() == (1, 5.0)
+        movies_reviews_data_manager.delete_movie_review(2)
+        assert get_aggregates() == (0, 0.0)
+
+
+def test_recompute_aggregates():
+    with app.app_context():
+        create_test_data()
+        add_review(1, 8.0)
+        db.session.execute(MovieReview.__table__.insert().values(user_id=2, movie_id=1, rating=4.0))
+        db.session.commit()
+        assert get_aggregates() == (1, 8.0)
+        recompute_movie_review_aggregates()
+        assert get_aggregates() == (2, 6.0)
+
+
+def test_null_rating_counts_as_zero_in_recompute_and_listeners():
+    with app.app_context():
+        create_test_data()
+        add_review(1, 8.0)
+        db.session.execute(MovieReview.__table__.insert().values(user_id=2, movie_id=1, rating=None))
+        db.session.commit()
+        recompute_movie_review_aggregates()
+        assert get_aggregates() == (2, 4.0)
+        movies_reviews_data_manager.delete_movie_review(2)
+        assert get_aggregates() == (1, 8.0)
@@ -0,0 +1,82 @@
+from flask import Flask
+from sqlalchemy import event
+
+from data_manager.data_models import User, Movie, MovieReview, db
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
+
+
+def create_test_data():
+    db.drop_all()
+    db.create_all()
+    db.session.add_all(User(id=number, user_name=f'User {number}') for number in range(1, 6))
+    db.session.add_all([Movie(id=1, movie_name='Movie 1'), Movie(id=2, movie_name='Movie 2')])
+    db.session.flush()
+    ratings = [7.0, 9.0, 7.0, 3.0, 10.0]
+    db.session.add_all(MovieReview(id=number, user_id=number, movie_id=1, rating=rating, review_text='')
+                       for number, rating in enumerate(ratings, 1))
+    db.session.add(MovieReview(id=6, user_id=1, movie_id=2, rating=1.0, review_text=''))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def read_all_pages(get_page, limit: int) -> list:
+    reviews, next_cursor = get_page(limit, None)
+    while next_cursor is not None:
+        page, next_cursor = get_page(limit, next_cursor)
+        reviews.extend(page)
+    return reviews
+
+
+def test_movie_reviews_are_paginated_in_every_sort():
+    expected = {None: [1, 2, 3, 4, 5],
+                'rating': [4, 1, 3, 2, 5],
+                '-rating': [5, 2, 3, 1, 4],
+                'newest': [5, 4, 3, 2, 1]}
+    with app.app_context():
+        create_test_data()
+        for sort, review_ids in expected.items():
+            reviews = read_all_pages(lambda limit, after: movies_reviews_data_manager.get_movie_reviews_page(
+                1, limit, after, sort), 2)
+            assert [review['id'] for review in reviews] == review_ids
+
+
+def test_user_reviews_span_movies():
+    with app.app_context():
+        create_test_data()
+        reviews, next_cursor = movies_reviews_data_manager.get_user_reviews_page(1, 10, sort='newest')
+    assert [(review['movie_id'], review['rating']) for review in reviews] == [(2, 1.0), (1, 7.0)]
+    assert reviews[0]['user'] == {'user_id': 1, 'user_name': 'User 1'}
+    assert next_cursor is None
+
+
+def test_movie_reviews_page_reads_only_that_movie_through_an_index():
+    statements = []
+
+    def before_cursor_execute(_connection, _cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    with app.app_context():
+        create_test_data()
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            movies_reviews_data_manager.get_movie_reviews_page(2, 10, sort='-rating')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        statement, parameters = statements[0]
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    assert len(statements) == 1
+    assert any('ix_movies_reviews_movie_id_rating' in step[-1] for step in plan)
+
+
+def test_has_movie_review():
+    with app.app_context():
+        create_test_data()
+        assert movies_reviews_data_manager.has_movie_review(1, 2)
+        assert not movies_reviews_data_manager.has_movie_review(2, 2)
@@ -0,0 +1,75 @@
+from flask import Flask
+
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from data_manager.movies import Movies
+from data_manager.users import Users
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movie_data_manager = SQLiteDataManager('id', Movie, db)
+movies_data_manager = Movies(movie_data_manager)
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+
+
+def create_test_data():
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([User(id=1, user_name='User 1'), User(id=2, user_name='User 2')])
+    db.session.add_all(Movie(id=number, movie_name=f'Movie {number}', rating=float(number))
+                       for number in range(1, 5))
+    db.session.flush()
+    db.session.add_all([MovieReview(user_id=1, movie_id=1, rating=4.0, review_text='Good'),
+                        MovieReview(user_id=2, movie_id=1, rating=2.0, review_text='Bad'),
+                        MovieReview(user_id=2, movie_id=3, rating=5.0, review_text='Great'),
+                        UserMovie(user_id=1, movie_id=2),
+                        UserMovie(user_id=1, movie_id=4)])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_get_rows_joins_related_columns_by_path():
+    with app.app_context():
+        create_test_data()
+        rows = movie_data_manager.get_rows(['id', 'movie_reviews.rating', 'movie_reviews.user.user_name'])
+    assert [dict(row) for row in rows] == [
+        {'id': 1, 'movie_reviews.rating': 4.0, 'movie_reviews.user.user_name': 'User 1'},
+        {'id': 1, 'movie_reviews.rating': 2.0, 'movie_reviews.user.user_name': 'User 2'},
+        {'id': 2, 'movie_reviews.rating': None, 'movie_reviews.user.user_name': None},
+        {'id': 3, 'movie_reviews.rating': 5.0, 'movie_reviews.user.user_name': 'User 2'},
+        {'id': 4, 'movie_reviews.rating': None, 'movie_reviews.user.user_name': None}]
+
+
+def test_get_rows_limits_items_not_joined_rows():
+    with app.app_context():
+        create_test_data()
+        rows = movie_data_manager.get_rows(['id', 'movie_reviews.id'], limit=2, order_by=('rating', True))
+        next_rows = movie_data_manager.get_rows(['id', 'movie_reviews.id'], limit=2, after=(3.0, 3),
+                                                order_by=('rating', True))
+    assert [row['id'] for row in rows] == [4, 3]
+    assert [row['id'] for row in next_rows] == [2, 1, 1]
+
+
+def test_movies_page_assembles_reviews_from_rows():
+    with app.app_context():
+        create_test_data()
+        movies, next_cursor = movies_data_manager.get_movies_page(1)
+    assert next_cursor == 1
+    assert [(review['rating'], review['user']) for review in movies[0]['movie_reviews']] == [
+        (4.0, {'user_id': 1, 'user_name': 'User 1'}),
+        (2.0, {'user_id': 2, 'user_name': 'User 2'})]
+    assert movies[0]['review_count'] == 2
+
+
+def test_user_assembles_movies_from_rows():
+    with app.app_context():
+        create_test_data()
+        user = users_data_manager.get_user(1)
+        user_without_movies = users_data_manager.get_user(2)
+    assert [movie['id'] for movie in user['movies']] == [2, 4]
+    assert user['movies'][0]['movie_name'] == 'Movie 2'
+    assert user_without_movies == {'id': 2, 'user_name': 'User 2', 'movies': []}
+    with app.app_context():
+        assert users_data_manager.get_user(3) is None
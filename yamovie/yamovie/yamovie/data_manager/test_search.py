@@ -0,0 +1,150 @@
+from flask import Flask
+from sqlalchemy import text
+
+from data_manager.data_models import Movie, db, rebuild_search_indexes, create_missing_search_indexes
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.movies import Movies
+from data_manager.search import search_terms, fts_match_expression
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+
+MOVIES = [{'id': 1, 'movie_name': 'The Dark Knight', 'director': 'Christopher Nolan'},
+          {'id': 2, 'movie_name': 'Dark City', 'director': 'Alex Proyas'},
+          {'id': 3, 'movie_name': 'Darkman', 'director': 'Sam Raimi'},
+          {'id': 4, 'movie_name': 'Knight and Day', 'director': 'James Mangold'},
+          {'id': 5, 'movie_name': 'Amélie', 'director': 'Jean-Pierre Jeunet'},
+          {'id': 6, 'movie_name': 'Following', 'director': 'Christopher Dark'},
+          {'id': 11, 'movie_name': 'Война и мир', 'director': 'Сергей Бондарчук'},
+          {'id': 12, 'movie_name': 'Ёжик в тумане', 'director': 'Юрий Норштейн'}]
+
+# й is a letter of its own, ё is searched as е
+CYRILLIC_QUERIES = [('Война', [11]), ('вой', [11]), ('воина', []), ('Юрий', [12]),
+                    ('Ёжик', [12]), ('ежик', [12]), ('ЕЖИК В', [12])]
+
+
+def create_test_data():
+    db.drop_all()
+    db.create_all()
+    db.session.add_all(Movie(**movie, year=2000, rating=7.0) for movie in MOVIES)
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def search_ids(query: str, limit: int = 10, after: int | None = None) -> list:
+    movies, _ = movies_data_manager.search_movies(query, limit, after)
+    return [movie['id'] for movie in movies]
+
+
+def test_query_terms_are_quoted_words():
+    assert search_terms('  The "Dark" Knight* OR -x ') == ['the', 'dark', 'knight', 'or', 'x']
+    assert search_terms('Amélie Ёжик Йорк ß') == ['amelie', 'ежик', 'йорк', 'ß']
+    assert fts_match_expression(['dark', 'kn'], ['movie_name']) == \
+        '{movie_name} : "dark" AND {movie_name} : "kn"*'
+
+
+def test_search_ranks_name_matches_before_director_matches():
+    with app.app_context():
+        create_test_data()
+        # the last word is a prefix, 'dark' also finds 'Darkman'
+        movie_ids = search_ids('dark')
+        assert set(movie_ids[:3]) == {1, 2, 3} and movie_ids[3:] == [6]
+        assert search_ids('dark kni') == [1]
+        assert search_ids('amelie') == [5]
+        assert search_ids('nolan') == [1]
+        assert search_ids('"Dark" (CITY') == [2]
+        assert movies_data_manager.search_movies('  *  ', 10) == ([], None)
+
+
+def test_search_matches_cyrillic_words():
+    with app.app_context():
+        create_test_data()
+        for query, movie_ids in CYRILLIC_QUERIES:
+            assert search_ids(query) == movie_ids, query
+        assert [movie['id'] for movie in movies_data_manager.autocomplete_movies('вой и', 5)] == [11]
+        assert [movie['id'] for movie in movies_data_manager.autocomplete_movies('ёж', 5)] == [12]
+
+
+def test_search_is_paginated():
+    with app.app_context():
+        create_test_data()
+        movies, next_cursor = movies_data_manager.search_movies('dar', 3)
+        assert {movie['id'] for movie in movies} == {1, 2, 3} and next_cursor == 3
+        assert movies_data_manager.search_movies('dar', 3, next_cursor) == (
+            [movies_data_manager.get_movie(6, include_reviews=False)], None)
+
+
+def test_search_index_follows_inserts_updates_and_deletes():
+    with app.app_context():
+        create_test_data()
+        db.session.add(Movie(id=7, movie_name='Inception', director='Christopher Nolan'))
+        db.session.commit()
+        assert sorted(search_ids('nolan')) == [1, 7]
+
+        movies_data_manager.update_movie({'id': 1, 'movie_name': 'Batman Begins'})
+        assert 1 not in search_ids('dark')
+        assert search_ids('batman') == [1]
+
+        movies_data_manager.delete_movie(7)
+        assert search_ids('inception') == []
+
+        # writes around the ORM are indexed by the triggers as well
+        db.session.execute(text("UPDATE movies SET director = 'Darko' WHERE id = 4"))
+        db.session.commit()
+        assert search_ids('darko') == [4]
+
+
+def test_rebuild_reindexes_every_movie():
+    with app.app_context():
+        create_test_data()
+        db.session.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('delete-all')"))
+        db.session.commit()
+        assert search_ids('dark') == []
+        rebuild_search_indexes()
+        assert sorted(search_ids('dark')) == [1, 2, 3, 6]
+        assert search_ids('ежик') == [12]
+
+
+def test_index_of_older_triggers_is_rebuilt():
+    with app.app_context():
+        create_test_data()
+        db.session.execute(text('DROP TRIGGER movies_fts_insert'))
+        db.session.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')"))
+        db.session.commit()
+        assert search_ids('ежик') == []
+        create_missing_search_indexes()
+        assert search_ids('ежик') == [12]
+        db.session.add(Movie(id=13, movie_name='Ёлки'))
+        db.session.commit()
+        assert search_ids('елки') == [13]
+
+
+def test_autocomplete_matches_name_prefixes_only():
+    with app.app_context():
+        create_test_data()
+        movies = movies_data_manager.autocomplete_movies('kn', 5)
+        assert sorted(movies, key=lambda movie: movie['id']) == [
+            {'id': 1, 'movie_name': 'The Dark Knight', 'year': 2000},
+            {'id': 4, 'movie_name': 'Knight and Day', 'year': 2000}]
+        # every word is a prefix, 'da' finds 'Dark' and 'Day'
+        assert sorted(movie['id'] for movie in movies_data_manager.autocomplete_movies('da kn', 5)) == [1, 4]
+        assert movies_data_manager.autocomplete_movies('kn', 1) == movies[:1]
+        assert movies_data_manager.autocomplete_movies('chris', 5) == []
+
+
+def test_json_search_matches_the_same_movies(tmp_path):
+    path = tmp_path / 'movies.ndjson'
+    path.write_text(''.join(f'{{"id": {movie["id"]}, "movie_name": "{movie["movie_name"]}", '
+                            f'"director": "{movie["director"]}"}}\n' for movie in MOVIES), encoding='utf-8')
+    json_movies = Movies(JSONDataManager(str(path), 'id', Movie.__search_columns__))
+    movies, _ = json_movies.search_movies('dar', 10)
+    assert [movie['id'] for movie in movies] == [1, 2, 3, 6]
+    assert [movie['id'] for movie in json_movies.autocomplete_movies('da kn', 5)] == [1, 4]
+    assert [movie['id'] for movie in json_movies.search_movies('amelie', 10)[0]] == [5]
+    for query, movie_ids in CYRILLIC_QUERIES:
+        assert [movie['id'] for movie in json_movies.search_movies(query, 10)[0]] == movie_ids, query
+    assert [movie['id'] for movie in json_movies.autocomplete_movies('вой и', 5)] == [11]
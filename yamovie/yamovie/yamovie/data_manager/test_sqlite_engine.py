@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from config import get_engine_profile
+from data_manager.sqlite_engine import apply_sqlite_pragmas
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what PRAGMA <name> reads back for the values of the production profile
+PRODUCTION_PRAGMAS = {'journal_mode': 'wal',
+                      'synchronous': 1,  # NORMAL
+                      'busy_timeout': 5000,
+                      'temp_store': 2,  # MEMORY
+                      'cache_size': -64000,
+                      'mmap_size': 256 * 1024 * 1024}
+
+
+def engine_profile_name(environment: dict) -> str:
+    return subprocess.run([sys.executable, '-c', 'import config; print(config.ENGINE_PROFILE_NAME)'],
+                          cwd=APP_DIRECTORY, env=environment, capture_output=True, text=True,
+                          check=True).stdout.strip()
+
+
+def test_profile_is_picked_from_the_environment():
+    environment = {name: value for name, value in os.environ.items() if name != 'YAMOVIE_ENV'}
+    assert engine_profile_name(environment) == 'development'
+    assert engine_profile_name({**environment, 'YAMOVIE_ENV': 'production'}) == 'production'
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown engine profile 'staging'"):
+        get_engine_profile('staging')
+
+
+def test_pragmas_are_applied_on_every_pooled_connection(tmp_path):
+    profile = get_engine_profile('production')
+    engine = create_engine(f'sqlite:///{tmp_path / "pragmas.sqlite"}', **profile['engine_options'])
+    apply_sqlite_pragmas(engine, profile['pragmas'])
+    try:
+        with engine.connect() as first_connection, engine.connect() as second_connection:
+            assert first_connection.connection.dbapi_connection is not \
+                   second_connection.connection.dbapi_connection
+            for connection in (first_connection, second_connection):
+                assert {name: connection.execute(text(f'PRAGMA {name}')).scalar()
+                        for name in PRODUCTION_PRAGMAS} == PRODUCTION_PRAGMAS
+    finally:
+        engine.dispose()
@@ -1,10 +1,10 @@
 import json
 import os
 
-from yamovie.data_manager.json_data_manager import JSONDataManager
-from yamovie.data_manager.users import Users
+from data_manager.json_data_manager import JSONDataManager
+from data_manager.users import Users
 
-TEST_FILE_PATH = 'data/test_movies.json'
+TEST_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'test_movies.json')
 
 users_data_manager = Users(JSONDataManager(TEST_FILE_PATH, 'user_id'))
 
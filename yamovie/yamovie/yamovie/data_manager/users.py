@@ -1,50 +1,59 @@
+from itertools import groupby
+from operator import itemgetter
 from typing import List
 
 from .data_manager_interface import DataManagerInterface
 from .data_models import User
+from .write_listeners import WriteListenersMixin, notifies_write
 
 
-class Users:
+class Users(WriteListenersMixin):
+    COLUMNS = ('id', 'user_name', 'movies.id', 'movies.movie.id', 'movies.movie.movie_name',
+               'movies.movie.director', 'movies.movie.year', 'movies.movie.rating',
+               'movies.movie.poster', 'movies.movie.website')
+    MOVIE_COLUMNS = ('movie_name', 'director', 'year', 'rating', 'poster', 'website')
 
     def __init__(self, data_manager: DataManagerInterface):
         self._data_manager = data_manager
 
-    @staticmethod
-    def __user_to_dict(user) -> dict:
-        movies = []
-        if user.movies:
-            for user_movie in user.movies:
-                movies.append(
-                    {
-                        "user_movie_id": user_movie.id,
-                        "id": user_movie.movie.id,
-                        "movie_name": user_movie.movie.movie_name,
-                        "director": user_movie.movie.director,
-                        "year": user_movie.movie.year,
-                        "rating": user_movie.movie.rating,
-                        "poster": user_movie.movie.poster,
-                        "website": user_movie.movie.website
-                    }
-                )
-        return {"id": user.id,
-                "user_name": user.user_name,
-                "movies": movies}
+    @classmethod
+    def __rows_to_users(cls, rows) -> List[dict]:
+        """One pass over the flat rows, the rows of a user being consecutive"""
+        users = []
+        for _, user_rows in groupby(rows, key=itemgetter('id')):
+            user_rows = list(user_rows)
+            movies = [{"user_movie_id": row['movies.id'],
+                       "id": row['movies.movie.id'],
+                       **{column: row[f'movies.movie.{column}'] for column in cls.MOVIE_COLUMNS}}
+                      for row in user_rows if row['movies.id'] is not None]
+            users.append({"id": user_rows[0]['id'],
+                          "user_name": user_rows[0]['user_name'],
+                          "movies": movies})
+        return users
 
     def get_all_users(self) -> List[dict] | None:
-        users_query = self._data_manager.get_all_data()
-        if users_query is None:
+        rows = self._data_manager.get_rows(list(self.COLUMNS))
+        if rows is None:
             return None
+        return self.__rows_to_users(rows)
 
-        users = []
-        for user in users_query:
-            users.append(self.__user_to_dict(user))
-        return users
+    def get_users_page(self, limit: int, after: int | None = None) -> tuple[List[dict], int | None] | None:
+        rows = self._data_manager.get_rows(list(self.COLUMNS), limit + 1, after)
+        if rows is None:
+            return None
+
+        users = self.__rows_to_users(rows)
+        next_cursor = users[limit - 1]['id'] if len(users) > limit else None
+        return users[:limit], next_cursor
+
+    def has_user(self, user_id: int) -> bool:
+        return self._data_manager.get_item_by_id(user_id) is not None
 
     def get_user(self, user_id: int) -> dict | None:
-        user = self._data_manager.get_item_by_id(user_id)
-        if user is None:
+        rows = self._data_manager.get_rows(list(self.COLUMNS), filters=[('id', '==', user_id)])
+        if not rows:
             return None
-        return self.__user_to_dict(user)
+        return self.__rows_to_users(rows)[0]
 
     @staticmethod
     def __validate_user_data(new_user: dict) -> bool:
@@ -56,14 +65,17 @@ class Users:
             user_name=name
         )
 
+    @notifies_write('users')
     def add_user(self, new_user: dict) -> bool | None:
         if self.__validate_user_data(new_user):
             return self._data_manager.\
                     add_item(self.__instantiate_new_user(new_user['user_name']))
         return None
 
+    @notifies_write('users')
     def update_user(self, updated_user: dict):
         return self._data_manager.update_item(updated_user)
 
+    @notifies_write('users', 'users_movies', 'movies_reviews', 'movies')
     def delete_user(self, user_id: int) -> bool | None:
         return self._data_manager.delete_item(user_id)
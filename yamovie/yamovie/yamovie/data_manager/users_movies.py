@@ -2,41 +2,65 @@ from typing import List
 
 from .data_manager_interface import DataManagerInterface
 from .data_models import UserMovie
+from .write_listeners import WriteListenersMixin, notifies_write
 
 
-class UsersMovies:
+class UsersMovies(WriteListenersMixin):
+    ALL_USERS_MOVIES_COLUMNS = ('user_id', 'user.user_name', 'movie.id', 'movie.movie_name', 'movie.director',
+                                'movie.year', 'movie.rating', 'movie.poster', 'movie.website')
+    USER_MOVIE_COLUMNS = ('id', 'movie.id', 'movie.movie_name', 'movie.director', 'movie.year',
+                          'movie.rating', 'movie.poster', 'movie.website')
 
     def __init__(self, data_manager: DataManagerInterface):
         self._data_manager = data_manager
 
     @staticmethod
-    def __user_to_dict(user) -> dict:
-        movies = []
-        for movie in user.movies:
-            movies.append(
-                {
-                    "id": movie.id,
-                    "name": movie.movie_name,
-                    "director": movie.director,
-                    "year": movie.year,
-                    "rating": movie.rating,
-                    "poster": movie.poster,
-                    "website": movie.website
+    def __row_to_user_movie(row) -> dict:
+        return {"user_movie_id": row['id'],
+                "id": row['movie.id'],
+                "movie_name": row['movie.movie_name'],
+                "director": row['movie.director'],
+                "year": row['movie.year'],
+                "rating": row['movie.rating'],
+                "poster": row['movie.poster'],
+                "website": row['movie.website']
                 }
-            )
-        return {"id": user.id,
-                "name": user.user_name,
-                "movies": movies}
 
     def get_all_users_movies(self) -> List[dict] | None:
-        users_query = self._data_manager.get_all_data()
-        if users_query is None:
+        rows = self._data_manager.get_rows(list(self.ALL_USERS_MOVIES_COLUMNS))
+        if rows is None:
             return None
 
-        users = []
-        for user in users_query:
-            users.append(self.__user_to_dict(user))
-        return users
+        # the rows are favourites, so they are grouped back into users
+        users = {}
+        for row in rows:
+            user = users.setdefault(row['user_id'], {"id": row['user_id'],
+                                                     "name": row['user.user_name'],
+                                                     "movies": []})
+            user["movies"].append({"id": row['movie.id'],
+                                   "name": row['movie.movie_name'],
+                                   "director": row['movie.director'],
+                                   "year": row['movie.year'],
+                                   "rating": row['movie.rating'],
+                                   "poster": row['movie.poster'],
+                                   "website": row['movie.website']
+                                   })
+        return list(users.values())
+
+    def get_user_movies_page(self, user_id: int, limit: int,
+                             after: int | None = None) -> tuple[List[dict], int | None] | None:
+        rows = self._data_manager.get_rows(list(self.USER_MOVIE_COLUMNS), limit + 1, after,
+                                           filters=[('user_id', '==', user_id)])
+        if rows is None:
+            return None
+
+        movies = [self.__row_to_user_movie(row) for row in rows[:limit]]
+        next_cursor = movies[-1]['user_movie_id'] if len(rows) > limit else None
+        return movies, next_cursor
+
+    def has_user_movie(self, user_id: int, movie_id: int) -> bool:
+        return bool(self._data_manager.get_page(1, filters=[('user_id', '==', user_id),
+                                                            ('movie_id', '==', movie_id)]))
 
     def get_user_movie(self, user_movie_id: int):
         return self._data_manager.get_item_by_id(user_movie_id)
@@ -48,8 +72,16 @@ class UsersMovies:
             movie_id=fav_movie_info['movie_id']
         )
 
+    @notifies_write('users_movies')
     def add_user_movie(self, fav_movie_info: dict) -> bool | None:
         return self._data_manager.add_item(self.__instantiate_user_movie(fav_movie_info))
 
+    @notifies_write('users_movies')
+    def add_user_movies(self, user_id: int, movie_ids: List[int], chunk_size: int = 1000) -> dict | None:
+        return self._data_manager.add_items([{'user_id': user_id, 'movie_id': movie_id}
+                                             for movie_id in movie_ids],
+                                            chunk_size)
+
+    @notifies_write('users_movies')
     def delete_user_movie(self, user_movie_id: int) -> bool | None:
         return self._data_manager.delete_item(user_movie_id)
@@ -0,0 +1,31 @@
+from functools import wraps
+
+
+class WriteListenersMixin:
+    """Lets other components react to the successful writes of a facade"""
+
+    def add_write_listener(self, listener):
+        """
+        :param listener: called with the tags (table names) a write changed
+        """
+        self.__dict__.setdefault('_write_listeners', []).append(listener)
+
+    def _notify_write(self, tags):
+        for listener in self.__dict__.get('_write_listeners', ()):
+            listener(tags)
+
+
+def notifies_write(*tags):
+    """
+    Notify the facade's write listeners with tags once the wrapped method
+    has changed something (True, or a bulk report with successes)
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            if result is True or (isinstance(result, dict) and result.get('succeeded')):
+                self._notify_write(tags)
+            return result
+        return wrapper
+    return decorator
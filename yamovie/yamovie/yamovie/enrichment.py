@@ -0,0 +1,205 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from sqlalchemy import delete, func, insert, select, update
+
+from data_manager.data_models import Movie, EnrichmentJob, db, bump_table_versions
+from data_manager.write_listeners import WriteListenersMixin
+from omdb_client import OMDbClient, movie_info_from_response
+
+ENRICHED_FIELDS = ('director', 'year', 'rating', 'poster', 'website')
+
+
+class EnrichmentQueue(WriteListenersMixin):
+    """
+    Fills in the OMDb fields of movies added with enrichment_status
+    'pending'. Jobs live in the enrichment_jobs table, so they survive
+    restarts and can be shared by several processes: a worker claims a
+    job by moving its next_attempt_at past the lease, and failed lookups
+    are retried with exponential backoff until max_attempts.
+    """
+
+    def __init__(self, app, omdb_client: OMDbClient, workers: int = 2, max_attempts: int = 8,
+                 backoff_base: float = 2.0, backoff_max: float = 3600, poll_interval: float = 5.0,
+                 lease: float = 60):
+        self._app = app
+        self._omdb_client = omdb_client
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._poll_interval = poll_interval
+        self._lease = lease
+        self._wake = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)  # seconds from adding to enriched, this process only
+
+    def start(self):
+        """
+        Start the worker threads once per process; called lazily so that
+        threads are started in the server workers, not before a fork
+        """
+        if self._threads or self._workers <= 0:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for number in range(self._workers):
+                thread = threading.Thread(target=self._run, name=f'enrichment-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        with self._app.app_context():
+            while True:
+                try:
+                    processed = self.process_next()
+                except Exception as err:
+                    # a worker that exits is not restarted, so no error may end the loop
+                    db.session.rollback()
+                    print(err)
+                    processed = False
+                finally:
+                    db.session.remove()
+                if not processed:
+                    self._wake.wait(self._poll_interval)
+                    self._wake.clear()
+
+    def run_pending(self) -> int:
+        """Process the due jobs in the calling thread; needs an app context"""
+        processed = 0
+        while self.process_next():
+            processed += 1
+        return processed
+
+    def _claim(self, now: float):
+        jobs = EnrichmentJob.__table__
+        for _ in range(3):
+            job_id = db.session.execute(select(jobs.c.id).
+                                        where(jobs.c.next_attempt_at <= now).
+                                        order_by(jobs.c.next_attempt_at).
+                                        limit(1)).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(update(jobs).
+                                         where(jobs.c.id == job_id, jobs.c.next_attempt_at <= now).
+                                         values(next_attempt_at=now + self._lease)).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.execute(select(jobs.c.id, jobs.c.movie_id, jobs.c.attempts,
+                                                 jobs.c.created_at, Movie.__table__.c.movie_name).
+                                          join_from(jobs, Movie.__table__, isouter=True).
+                                          where(jobs.c.id == job_id)).one()
+            # another worker claimed it first
+        return None
+
+    def process_next(self) -> bool:
+        """
+        Enrich the next due movie
+        :return: False if no job was due
+        """
+        job = self._claim(time.time())
+        db.session.commit()  # no transaction stays open during the lookup
+        if job is None:
+            return False
+
+        jobs = EnrichmentJob.__table__
+        movies = Movie.__table__
+        if job.movie_name is None:
+            # the movie was deleted around the ORM cascade
+            db.session.execute(delete(jobs).where(jobs.c.id == job.id))
+            db.session.commit()
+            return True
+
+        try:
+            response = self._omdb_client.fetch_movie(job.movie_name)
+        except (requests.exceptions.RequestException, ValueError) as err:
+            self._retry(job, str(err) or type(err).__name__)
+            return True
+
+        if response.get('Response') == 'False':
+            values = {'enrichment_status': 'not_found'}
+        else:
+            movie_info = movie_info_from_response(response, job.movie_name)
+            values = {field: movie_info[field] for field in ENRICHED_FIELDS}
+            values['enrichment_status'] = 'done'
+        db.session.execute(update(movies).where(movies.c.id == job.movie_id).values(values))
+        db.session.execute(delete(jobs).where(jobs.c.id == job.id))
+        bump_table_versions(db.session.connection(), [movies.name])
+        db.session.commit()
+        self._notify_write(('movies',))
+        self._latencies.append(time.time() - job.created_at)
+        return True
+
+    def _retry(self, job, error: str):
+        jobs = EnrichmentJob.__table__
+        attempts = job.attempts + 1
+        if attempts >= self._max_attempts:
+            movies = Movie.__table__
+            db.session.execute(update(movies).where(movies.c.id == job.movie_id).
+                               values(enrichment_status='failed'))
+            db.session.execute(delete(jobs).where(jobs.c.id == job.id))
+            bump_table_versions(db.session.connection(), [movies.name])
+        else:
+            # full jitter keeps retries of many movies from hitting OMDb together
+            backoff = min(self._backoff_max, self._backoff_base ** attempts) * random.uniform(0.5, 1.0)
+            db.session.execute(update(jobs).where(jobs.c.id == job.id).
+                               values(attempts=attempts,
+                                      last_error=error,
+                                      next_attempt_at=time.time() + backoff))
+        db.session.commit()
+        if attempts >= self._max_attempts:
+            self._notify_write(('movies',))
+
+    def requeue_failed(self) -> int:
+        """Queue the movies whose enrichment gave up again; needs an app context"""
+        movies = Movie.__table__
+        now = time.time()
+        failed_movie_ids = db.session.execute(select(movies.c.id).
+                                              where(movies.c.enrichment_status == 'failed')).scalars().all()
+        if failed_movie_ids:
+            db.session.execute(insert(EnrichmentJob.__table__),
+                               [{'movie_id': movie_id, 'attempts': 0, 'created_at': now, 'next_attempt_at': now}
+                                for movie_id in failed_movie_ids])
+            db.session.execute(update(movies).where(movies.c.id.in_(failed_movie_ids)).
+                               values(enrichment_status='pending'))
+            bump_table_versions(db.session.connection(), [movies.name])
+        db.session.commit()
+        if failed_movie_ids:
+            self._notify_write(('movies',))
+        self.notify()
+        return len(failed_movie_ids)
+
+    def status(self) -> dict:
+        """Queue depth from the database and latency of this process; needs an app context"""
+        jobs = EnrichmentJob.__table__
+        movies = Movie.__table__
+        now = time.time()
+        depth, due, retrying, oldest_created_at = db.session.execute(
+            select(func.count(jobs.c.id),
+                   func.count(jobs.c.id).filter(jobs.c.next_attempt_at <= now),
+                   func.count(jobs.c.id).filter(jobs.c.attempts > 0),
+                   func.min(jobs.c.created_at))).one()
+        failed = db.session.execute(select(func.count(movies.c.id)).
+                                    where(movies.c.enrichment_status == 'failed')).scalar()
+        db.session.commit()
+
+        latencies = sorted(self._latencies)
+        return {'queue_depth': depth,
+                'due': due,
+                'retrying': retrying,
+                'failed': failed,
+                'oldest_job_age': now - oldest_created_at if oldest_created_at is not None else 0.0,
+                'workers': sum(thread.is_alive() for thread in self._threads),
+                'latency': {'count': len(latencies),
+                            'avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                            'p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                            'max': latencies[-1] if latencies else 0.0}}
@@ -0,0 +1,72 @@
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    orjson in place of the stdlib json module, with the same output
+    apart from non-ASCII characters, which are written as UTF-8 instead
+    of escape sequences. Types orjson does not know go through the
+    Flask default handler, keyword arguments meant for json.dumps fall
+    back to the stdlib encoder.
+    """
+
+    def _option(self, indent: bool = False) -> int:
+        # dates go to the Flask handler, which writes them as HTTP dates
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._option(indent))
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {'orjson': OrjsonProvider if orjson is not None else DefaultJSONProvider,
+                  'stdlib': DefaultJSONProvider}
+
+
+def get_json_provider_class(name: str):
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f'Unknown JSON provider {name!r}, '
+                         f'expected one of {", ".join(JSON_PROVIDERS)}')
+    return JSON_PROVIDERS[name]
+
+
+def stream_json_array(pages):
+    """
+    The items of the pages as one compact JSON array, a chunk per page,
+    so only one page is held in memory and the first is sent while the
+    next is read
+    """
+    dumps = getattr(current_app.json, 'dumps_bytes', None) or (
+        lambda obj: current_app.json.dumps(obj, separators=(',', ':')).encode())
+    yield b'['
+    separator = b''
+    for page in pages:
+        if page:
+            yield separator + b','.join(dumps(item) for item in page)
+            separator = b','
+    yield b']\n'
@@ -0,0 +1,132 @@
+"""
+A local stand-in for the OMDb API with configurable latency, error
+rate and 'movie not found' rate, so load tests never reach the real
+service. Answers are derived from the title, the same for every run.
+
+Run from the application directory:
+    python -m loadtest.fake_omdb --port 8765 --latency-ms 120 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def movie_response(title: str) -> dict:
+    digest = int(hashlib.sha256(title.encode()).hexdigest(), 16)
+    return {'Title': title,
+            'Year': str(1930 + digest % 95),
+            'Director': f'Director {digest % 500}',
+            'imdbRating': f'{1 + digest % 90 / 10:.1f}',
+            'Poster': f'https://posters.example.com/{digest % 100000}.jpg',
+            'imdbID': f'tt{digest % 10 ** 7:07d}',
+            'Response': 'True'}
+
+
+class FakeOMDbServer:
+    """
+    Threaded HTTP server answering GET /?apikey=...&t=<title> after
+    latency_ms (plus or minus jitter_ms); error_rate of the requests get
+    a 503 and not_found_rate an OMDb 'Movie not found!' answer
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 100, jitter_ms: float = 0,
+                 error_rate: float = 0.0, not_found_rate: float = 0.0, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'errors': 0, 'not_found': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _handler_class(self):
+        fake_omdb = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake_omdb._answer(self)
+
+            def log_message(self, _format, *_args):
+                pass  # one line per lookup would drown the load test output
+
+        return Handler
+
+    def _draw(self) -> tuple[float, float]:
+        with self._lock:
+            self.counts['requests'] += 1
+            return self._random.uniform(-self.jitter_ms, self.jitter_ms), self._random.random()
+
+    def _answer(self, handler: BaseHTTPRequestHandler):
+        jitter, outcome = self._draw()
+        time.sleep(max(self.latency_ms + jitter, 0) / 1000)
+        title = parse_qs(urlparse(handler.path).query).get('t', [''])[0]
+
+        if outcome < self.error_rate:
+            with self._lock:
+                self.counts['errors'] += 1
+            status, body = 503, {'Error': 'Service unavailable'}
+        elif outcome < self.error_rate + self.not_found_rate or not title:
+            with self._lock:
+                self.counts['not_found'] += 1
+            status, body = 200, {'Response': 'False', 'Error': 'Movie not found!'}
+        else:
+            status, body = 200, movie_response(title)
+
+        content = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-omdb', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def add_omdb_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--omdb-latency-ms', type=float, default=100)
+    parser.add_argument('--omdb-jitter-ms', type=float, default=30)
+    parser.add_argument('--omdb-error-rate', type=float, default=0.01, help='fraction answered with a 503')
+    parser.add_argument('--omdb-not-found-rate', type=float, default=0.05,
+                        help="fraction answered with 'Movie not found!'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_omdb_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOMDbServer(args.host, args.port, args.omdb_latency_ms, args.omdb_jitter_ms,
+                            args.omdb_error_rate, args.omdb_not_found_rate)
+    print(f'Fake OMDb at {server.url}, set YAMOVIE_OMDB_BASE_URL to it')
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        print(server.counts)
+
+
+if __name__ == '__main__':
+    main()
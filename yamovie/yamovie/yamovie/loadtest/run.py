@@ -0,0 +1,333 @@
+"""
+Load test of the full app under gunicorn: builds a synthetic catalog
+database, starts the fake OMDb server and gunicorn with N workers on
+them, replays the scenario file with concurrent virtual users and
+reports the throughput, the latency percentiles per route and the
+errors.
+
+Run from the application directory:
+    python -m loadtest.run --workers 4 --concurrency 32 --duration 60
+    python -m loadtest.run --base-url http://staging:8000 --size medium --duration 120
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from flask import Flask
+
+from benchmarks.synthetic_data import SyntheticCatalog, load_sqlite, add_size_arguments, catalog_from_arguments
+from data_manager.data_models import db
+from loadtest.fake_omdb import FakeOMDbServer, add_omdb_arguments
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCENARIO = os.path.join(APP_DIRECTORY, 'loadtest', 'scenario.json')
+RESULTS_DIRECTORY = os.path.join(APP_DIRECTORY, 'loadtest', 'results')
+READY_PATH = '/api/enrichment/status'
+PERCENTILES = (50, 90, 95, 99)
+PLACEHOLDER = re.compile(r'^\{(\w+)\}$')
+
+
+def load_scenario(path: str) -> dict:
+    """
+    The scenario file: weighted actions, each a list of requests whose
+    path and body may use {user_id}, {movie_id}, {n} (unique per
+    action run) and the scenario's variables, drawn once per action run
+    """
+    with open(path, 'r', encoding='utf-8') as scenario_file:
+        scenario = json.load(scenario_file)
+    if not scenario.get('actions'):
+        raise ValueError(f'{path} has no actions')
+    for name, action in scenario['actions'].items():
+        if action.get('weight', 0) <= 0 or not action.get('requests'):
+            raise ValueError(f'Action {name!r} needs a positive weight and requests')
+    return scenario
+
+
+def render(template, variables: dict):
+    """The template with the variables filled in; a string that is only a placeholder keeps the value's type"""
+    if isinstance(template, str):
+        match = PLACEHOLDER.match(template)
+        return variables[match[1]] if match else template.format(**variables)
+    if isinstance(template, dict):
+        return {key: render(value, variables) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, variables) for value in template]
+    return template
+
+
+def percentile(ordered: list, percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)] if ordered else 0.0
+
+
+class LoadGenerator:
+    """
+    concurrency virtual users, each a thread with its own keep-alive
+    session, run weighted actions back to back for duration seconds.
+    Samples of the first warmup seconds are left out of the report.
+    A request fails on a connection error or a status its scenario
+    entry does not expect (2xx and 3xx by default).
+    """
+
+    def __init__(self, base_url: str, scenario: dict, catalog: SyntheticCatalog, concurrency: int,
+                 duration: float, warmup: float = 5.0, timeout: float = 30.0, seed: int = 0):
+        self.base_url = base_url.rstrip('/')
+        self.scenario = scenario
+        self.catalog = catalog
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.timeout = timeout
+        self.seed = seed
+        self._counter = itertools.count(1)
+        self._action_names = list(scenario['actions'])
+        self._weights = [scenario['actions'][name]['weight'] for name in self._action_names]
+
+    def _variables(self, rng: random.Random, virtual_user: int) -> dict:
+        variables = {name: rng.choice(values) for name, values in self.scenario.get('variables', {}).items()}
+        variables.update(user_id=rng.randint(1, self.catalog.users),
+                         movie_id=rng.randint(1, self.catalog.movies),
+                         n=f'{self.seed}-{next(self._counter)}',
+                         virtual_user=virtual_user)
+        return variables
+
+    def _send(self, session: requests.Session, entry: dict, variables: dict) -> tuple:
+        """:return: (route, status or error name, seconds, failed)"""
+        route = entry.get('name') or f'{entry["method"]} {entry["path"].split("?")[0]}'
+        started = time.perf_counter()
+        try:
+            response = session.request(entry['method'], self.base_url + render(entry['path'], variables),
+                                       json=render(entry.get('json'), variables),
+                                       data=render(entry.get('form'), variables),
+                                       allow_redirects=False, timeout=self.timeout)
+            response.content  # the whole body, a streamed one included
+        except requests.exceptions.RequestException as err:
+            return route, type(err).__name__, time.perf_counter() - started, True
+        seconds = time.perf_counter() - started
+        expected = entry.get('expect')
+        failed = response.status_code not in expected if expected else response.status_code >= 400
+        return route, response.status_code, seconds, failed
+
+    def _virtual_user(self, index: int, started_at: float, samples: list):
+        rng = random.Random(f'{self.seed}:{index}')
+        think_time_ms = self.scenario.get('think_time_ms', [0, 0])
+        deadline = started_at + self.warmup + self.duration
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                action = rng.choices(self._action_names, self._weights)[0]
+                variables = self._variables(rng, index)
+                for entry in self.scenario['actions'][action]['requests']:
+                    route, status, seconds, failed = self._send(session, entry, variables)
+                    finished_at = time.monotonic()
+                    if finished_at - started_at >= self.warmup:
+                        samples.append((route, status, seconds, failed, finished_at))
+                    if failed:
+                        break  # the rest of the action depends on this request
+                time.sleep(rng.uniform(*think_time_ms) / 1000)
+
+    def run(self) -> list:
+        """:return: [(route, status, seconds, failed, finished_at)] after the warmup"""
+        samples = []  # list.append is atomic, the threads share it
+        started_at = time.monotonic()
+        threads = [threading.Thread(target=self._virtual_user, args=(index, started_at, samples), daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+
+def summarize_latencies(seconds: list) -> dict:
+    ordered = sorted(seconds)
+    return {**{f'p{percent}_ms': percentile(ordered, percent) * 1000 for percent in PERCENTILES},
+            'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+            'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0.0}
+
+
+def build_report(samples: list, duration: float) -> dict:
+    """Throughput, latency percentiles and errors, in total and per route"""
+    by_route = {}
+    for route, status, seconds, failed, _ in samples:
+        by_route.setdefault(route, []).append((status, seconds, failed))
+
+    def describe(route_samples: list) -> dict:
+        errors = {}
+        for status, _, failed in route_samples:
+            if failed:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        return {'requests': len(route_samples),
+                'throughput_rps': len(route_samples) / duration,
+                'errors': sum(errors.values()),
+                'errors_by_status': errors,
+                **summarize_latencies([seconds for _, seconds, _ in route_samples])}
+
+    return {'total': describe([(status, seconds, failed) for _, status, seconds, failed, _ in samples]),
+            'routes': {route: describe(route_samples) for route, route_samples in sorted(by_route.items())}}
+
+
+def print_report(report: dict):
+    header = f'{"route":<58} {"requests":>9} {"rps":>8} {"errors":>7}' + \
+             ''.join(f' {f"p{percent}":>8}' for percent in PERCENTILES) + f' {"max":>8}'
+    print(header)
+    for route, summary in [*report['routes'].items(), ('total', report['total'])]:
+        print(f'{route:<58} {summary["requests"]:>9} {summary["throughput_rps"]:>8.1f} {summary["errors"]:>7}' +
+              ''.join(f' {summary[f"p{percent}_ms"]:>8.1f}' for percent in PERCENTILES) +
+              f' {summary["max_ms"]:>8.1f}')
+    print('latencies in ms')
+
+
+def build_database(catalog: SyntheticCatalog, path: str):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        load_sqlite(catalog)
+        db.engine.dispose()
+
+
+class GunicornServer:
+    """The app under gunicorn on a free local port, with its data in directory"""
+
+    def __init__(self, workers: int, directory: str, database_path: str, omdb_url: str, port: int = 0,
+                 engine_profile: str = 'production', extra_environment: dict | None = None):
+        self.workers = workers
+        self.port = port or self._free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self._log_path = os.path.join(directory, 'gunicorn.log')
+        self._environment = {**os.environ,
+                             'YAMOVIE_ENV': engine_profile,
+                             'YAMOVIE_DATABASE_URI': f'sqlite:///{database_path}',
+                             'YAMOVIE_OMDB_BASE_URL': omdb_url,
+                             'YAMOVIE_OMDB_API_KEY': 'loadtest',
+                             'YAMOVIE_OMDB_CACHE_PATH': os.path.join(directory, 'omdb_cache.sqlite'),
+                             'YAMOVIE_PAGE_CACHE_BACKEND': 'file',
+                             'YAMOVIE_PAGE_CACHE_DIRECTORY': os.path.join(directory, 'page_cache'),
+                             'YAMOVIE_METRICS_DIRECTORY': os.path.join(directory, 'metrics'),
+                             'YAMOVIE_PROFILING_DIRECTORY': os.path.join(directory, 'profiles'),
+                             **(extra_environment or {})}
+        self._process = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            return probe.getsockname()[1]
+
+    def start(self, timeout: float = 60.0):
+        with open(self._log_path, 'w', encoding='utf-8') as log_file:
+            self._process = subprocess.Popen([sys.executable, '-m', 'gunicorn',
+                                              '--workers', str(self.workers),
+                                              '--bind', f'127.0.0.1:{self.port}',
+                                              '--log-level', 'warning',
+                                              'app:app'],
+                                             cwd=APP_DIRECTORY, env=self._environment,
+                                             stdout=log_file, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {self._process.returncode}, '
+                                   f'is it installed? Log: {self.log()}')
+            try:
+                if requests.get(self.base_url + READY_PATH, timeout=1).status_code == 200:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'gunicorn did not answer {READY_PATH} within {timeout}s. Log: {self.log()}')
+
+    def log(self) -> str:
+        with open(self._log_path, 'r', encoding='utf-8') as log_file:
+            return log_file.read()[-4000:]
+
+    def stop(self):
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenario', default=DEFAULT_SCENARIO)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=16, help='virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds, after the warmup')
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--engine-profile', default='production')
+    parser.add_argument('--base-url', help='load an already running server instead, whose catalog is of --size')
+    parser.add_argument('--output', help=f'report file, by default a new file in {RESULTS_DIRECTORY}')
+    add_size_arguments(parser)
+    add_omdb_arguments(parser)
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    catalog = catalog_from_arguments(args)
+    omdb_server = server = None
+    with tempfile.TemporaryDirectory(prefix='yamovie-loadtest-') as directory:
+        try:
+            base_url = args.base_url
+            if base_url is None:
+                print(f'Building a catalog of {catalog.describe()}', file=sys.stderr)
+                database_path = os.path.join(directory, 'loadtest.sqlite')
+                build_database(catalog, database_path)
+                omdb_server = FakeOMDbServer(latency_ms=args.omdb_latency_ms, jitter_ms=args.omdb_jitter_ms,
+                                             error_rate=args.omdb_error_rate,
+                                             not_found_rate=args.omdb_not_found_rate, seed=args.seed)
+                omdb_server.start()
+                server = GunicornServer(args.workers, directory, database_path, omdb_server.url,
+                                        engine_profile=args.engine_profile)
+                server.start()
+                base_url = server.base_url
+
+            print(f'Loading {base_url} with {args.concurrency} virtual users for '
+                  f'{args.warmup:g}s + {args.duration:g}s', file=sys.stderr)
+            samples = LoadGenerator(base_url, scenario, catalog, args.concurrency, args.duration,
+                                    args.warmup, seed=args.seed).run()
+        finally:
+            if server is not None:
+                server.stop()
+            if omdb_server is not None:
+                omdb_server.stop()
+
+    report = {'created_at': datetime.now().isoformat(timespec='seconds'),
+              'scenario': args.scenario,
+              'settings': {'workers': None if args.base_url else args.workers,
+                           'base_url': args.base_url,
+                           'concurrency': args.concurrency,
+                           'duration': args.duration,
+                           'warmup': args.warmup,
+                           'engine_profile': args.engine_profile,
+                           'catalog': catalog.describe(),
+                           'omdb': {'latency_ms': args.omdb_latency_ms, 'jitter_ms': args.omdb_jitter_ms,
+                                    'error_rate': args.omdb_error_rate,
+                                    'not_found_rate': args.omdb_not_found_rate}},
+              'omdb_requests': omdb_server.counts if omdb_server is not None else None,
+              **build_report(samples, args.duration)}
+    print_report(report)
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f'{datetime.now().strftime("%Y%m%dT%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f'Report saved to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from flask import Flask, abort, request
+from werkzeug.serving import make_server
+
+from benchmarks.synthetic_data import SyntheticCatalog
+from loadtest.fake_omdb import FakeOMDbServer
+from loadtest.run import LoadGenerator, build_report, percentile, render
+from omdb_client import OMDbClient
+
+app = Flask(__name__)
+requests_seen = []
+
+
+@app.route('/movies/<int:movie_id>', methods=['GET', 'POST'])
+def movie(movie_id: int):
+    requests_seen.append((request.method, movie_id, request.get_json(silent=True)))
+    if request.method == 'POST':
+        abort(500)
+    return {'id': movie_id}
+
+
+@pytest.fixture
+def base_url():
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_render_keeps_the_type_of_whole_placeholders():
+    variables = {'movie_id': 7, 'rating': 4, 'n': '0-1'}
+    assert render({'path': '/movies/{movie_id}', 'rating': '{rating}', 'titles': ['Movie {n}']}, variables) == \
+        {'path': '/movies/7', 'rating': 4, 'titles': ['Movie 0-1']}
+
+
+def test_percentile_is_nearest_rank():
+    ordered = list(range(1, 101))
+    assert [percentile(ordered, percent) for percent in (50, 99, 100)] == [50, 99, 100]
+    assert percentile([], 99) == 0.0
+
+
+def test_load_generator_reports_routes_and_stops_an_action_at_a_failure(base_url):
+    scenario = {'variables': {'rating': [5]},
+                'actions': {'browse': {'weight': 3, 'requests': [{'method': 'GET', 'path': '/movies/{movie_id}'}]},
+                            'review': {'weight': 1, 'requests': [
+                                {'method': 'POST', 'path': '/movies/{movie_id}', 'json': {'rating': '{rating}'}},
+                                {'method': 'GET', 'path': '/movies/{movie_id}', 'name': 'after failure'}]}}}
+    catalog = SyntheticCatalog(users=5, movies=10, favourites=0, reviews=0)
+    samples = LoadGenerator(base_url, scenario, catalog, concurrency=2, duration=0.5, warmup=0).run()
+    report = build_report(samples, 0.5)
+
+    assert set(report['routes']) == {'GET /movies/{movie_id}', 'POST /movies/{movie_id}'}
+    browse, review = report['routes']['GET /movies/{movie_id}'], report['routes']['POST /movies/{movie_id}']
+    assert browse['errors'] == 0 and browse['requests'] > 0
+    assert review['errors'] == review['requests'] > 0 and review['errors_by_status'] == {'500': review['requests']}
+    assert report['total']['requests'] == browse['requests'] + review['requests']
+    assert browse['p50_ms'] <= browse['p99_ms'] <= browse['max_ms']
+    assert all(body == {'rating': 5} for method, _, body in requests_seen if method == 'POST')
+    assert all(1 <= movie_id <= 10 for _, movie_id, _ in requests_seen)
+
+
+def test_fake_omdb_answers_errors_and_movies():
+    failing = FakeOMDbServer(latency_ms=0, error_rate=1.0)
+    answering = FakeOMDbServer(latency_ms=0, not_found_rate=0.0)
+    failing.start()
+    answering.start()
+    try:
+        report = OMDbClient(failing.url, 'key').fetch_movies(['Heat'])
+        assert report['movies'] == [] and '503' in report['failed'][0]['error']
+        movie = OMDbClient(answering.url, 'key').fetch_movie('Heat')
+        assert movie['Title'] == 'Heat' and movie['Response'] == 'True'
+        assert movie == OMDbClient(answering.url, 'key').fetch_movie('Heat')
+        assert answering.counts == {'requests': 2, 'errors': 0, 'not_found': 0}
+    finally:
+        failing.stop()
+        answering.stop()
@@ -0,0 +1,282 @@
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import g, request, Response
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms of this process. Recording is one
+    dict update under a lock held for nothing else. With a directory,
+    every process writes its samples to <directory>/<pid>.json at most
+    every flush_interval seconds and render() sums the files of all
+    processes, so any gunicorn worker answers /metrics for all of them.
+    Only the files of this server run are read, told apart by the
+    parent pid gunicorn workers share; the gauges of workers that have
+    exited are left out, their counters and histograms stay.
+    """
+
+    def __init__(self, directory: str | None = None, flush_interval: float = 1.0):
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._definitions = {}
+        self._samples = {}
+        self._collectors = []
+        self._flushed_at = 0.0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _define(self, kind: str, name: str, documentation: str, buckets=None):
+        self._definitions[name] = {'type': kind, 'help': documentation, 'buckets': buckets}
+
+    def counter(self, name: str, documentation: str):
+        self._define('counter', name, documentation)
+
+    def gauge(self, name: str, documentation: str):
+        self._define('gauge', name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self._define('histogram', name, documentation, list(buckets))
+
+    def derived_gauge(self, name: str, documentation: str, compute):
+        """A gauge computed by compute(merged) from the samples of all processes"""
+        self._define('gauge', name, documentation)
+        self._definitions[name]['compute'] = compute
+
+    def add_collector(self, collector):
+        """collector() returns (name, labels, value) samples read when the metrics are rendered or flushed"""
+        self._collectors.append(collector)
+
+    @staticmethod
+    def _key(name: str, labels: dict | None) -> tuple:
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, labels: dict | None = None, amount: float = 1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def set(self, name: str, value: float, labels: dict | None = None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._samples[key] = value
+
+    def observe(self, name: str, value: float, labels: dict | None = None):
+        key = self._key(name, labels)
+        buckets = self._definitions[name]['buckets']
+        position = bisect.bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._samples.get(key)
+            if histogram is None:
+                # a count per bucket (the last one is +Inf), then the sum
+                histogram = self._samples[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[position] += 1
+            histogram[-1] += value
+
+    def snapshot(self) -> list:
+        """The samples of this process as JSON-able [name, labels, value] items"""
+        with self._lock:
+            samples = [[name, [list(label) for label in labels], value if not isinstance(value, list) else value[:]]
+                       for (name, labels), value in self._samples.items()]
+        for collector in self._collectors:
+            samples.extend([name, sorted([key, value] for key, value in (labels or {}).items()), value]
+                           for name, labels, value in collector())
+        return samples
+
+    def flush(self, force: bool = False):
+        if self._directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self._flush_interval:
+            return
+        self._flushed_at = now
+        content = json.dumps({'pid': os.getpid(), 'ppid': os.getppid(), 'samples': self.snapshot()})
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self._directory,
+                                         suffix='.tmp', delete=False) as temp_file:
+            temp_file.write(content)
+        os.replace(temp_file.name, os.path.join(self._directory, f'{os.getpid()}.json'))
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _process_snapshots(self):
+        yield self.snapshot(), True
+        if self._directory is None:
+            return
+        for file_name in os.listdir(self._directory):
+            if not file_name.endswith('.json') or file_name == f'{os.getpid()}.json':
+                continue
+            path = os.path.join(self._directory, file_name)
+            try:
+                with open(path, 'r', encoding='utf-8') as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue  # being replaced
+            alive = self._is_alive(snapshot['pid'])
+            if snapshot['ppid'] == os.getppid():
+                yield snapshot['samples'], alive
+            elif not alive:
+                try:
+                    os.remove(path)  # left by an earlier server run
+                except OSError:
+                    pass
+
+    def merged(self) -> dict:
+        """{(name, labels): value} summed over the processes"""
+        merged = {}
+        for samples, alive in self._process_snapshots():
+            for name, labels, value in samples:
+                definition = self._definitions.get(name)
+                if definition is None or 'compute' in definition or (definition['type'] == 'gauge' and not alive):
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                if isinstance(value, list):
+                    previous = merged.get(key)
+                    merged[key] = value if previous is None else [a + b for a, b in zip(previous, value)]
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """All processes' samples in the Prometheus text exposition format"""
+        merged = self.merged()
+        lines = []
+        for name, definition in self._definitions.items():
+            if 'compute' in definition:
+                merged[(name, ())] = definition['compute'](merged)
+            samples = sorted((labels, value) for (sample_name, labels), value in merged.items()
+                             if sample_name == name)
+            lines.append(f'# HELP {name} {definition["help"]}')
+            lines.append(f'# TYPE {name} {definition["type"]}')
+            for labels, value in samples:
+                if definition['type'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip([*definition['buckets'], float('inf')], value[:-1]):
+                    cumulative += count
+                    bucket_labels = (*labels, ('le', _format_value(bound)))
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """
+    Request latency, status and in-flight counts per blueprint and
+    route, the DB time QueryMonitor measured for the request, OMDb
+    lookups, and the OMDb and page cache counters, served at /metrics
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        registry.counter('yamovie_http_requests_total', 'HTTP requests by route, method and status')
+        registry.histogram('yamovie_http_request_duration_seconds', 'Time to the response headers by route')
+        registry.gauge('yamovie_http_requests_in_flight', 'Requests being handled')
+        registry.histogram('yamovie_db_duration_seconds', 'DB time of a request by route')
+        registry.counter('yamovie_db_queries_total', 'SQL statements run by requests, by route')
+        registry.histogram('yamovie_omdb_request_duration_seconds', 'OMDb lookups that went to the network')
+        registry.counter('yamovie_omdb_errors_total', 'Failed OMDb lookups by error')
+        registry.counter('yamovie_omdb_cache_hits_total', 'OMDb lookups answered by the cache')
+        registry.counter('yamovie_omdb_cache_misses_total', 'OMDb lookups not in the cache')
+        registry.counter('yamovie_page_cache_hits_total', 'Rendered pages served from the page cache')
+        registry.counter('yamovie_page_cache_misses_total', 'Pages rendered on a page cache miss')
+        for cache_name in ('omdb', 'page'):
+            registry.derived_gauge(f'yamovie_{cache_name}_cache_hit_ratio',
+                                   f'Hits over lookups of the {cache_name} cache in all processes',
+                                   self._hit_ratio(cache_name))
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def init_app(self, app, omdb_client=None, page_cache=None):
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self._render)
+        if omdb_client is not None:
+            omdb_client.add_call_listener(self._record_omdb_call)
+            if omdb_client.cache is not None:
+                self.registry.add_collector(lambda: self._cache_samples('omdb', omdb_client.cache))
+        if page_cache is not None:
+            self.registry.add_collector(lambda: self._cache_samples('page', page_cache))
+
+    @staticmethod
+    def _hit_ratio(cache_name: str):
+        def compute(merged: dict) -> float:
+            hits = merged.get((f'yamovie_{cache_name}_cache_hits_total', ()), 0)
+            misses = merged.get((f'yamovie_{cache_name}_cache_misses_total', ()), 0)
+            return hits / (hits + misses) if hits + misses else 0.0
+        return compute
+
+    @staticmethod
+    def _cache_samples(name: str, cache) -> list:
+        hits, misses = cache.hits, cache.misses
+        return [(f'yamovie_{name}_cache_hits_total', None, hits),
+                (f'yamovie_{name}_cache_misses_total', None, misses)]
+
+    def _add_in_flight(self, amount: int):
+        with self._in_flight_lock:
+            self._in_flight += amount
+            self.registry.set('yamovie_http_requests_in_flight', self._in_flight)
+
+    def _start(self):
+        g.metrics_started_at = time.perf_counter()
+        self._add_in_flight(1)
+
+    def _record(self, response):
+        started_at = g.get('metrics_started_at')
+        if started_at is None:
+            return response
+        labels = {'blueprint': request.blueprint or 'app',
+                  'route': request.url_rule.rule if request.url_rule is not None else 'unmatched'}
+        self.registry.observe('yamovie_http_request_duration_seconds', time.perf_counter() - started_at, labels)
+        self.registry.inc('yamovie_http_requests_total',
+                          {**labels, 'method': request.method, 'status': str(response.status_code)})
+        query_stats = g.get('query_stats')
+        if query_stats is not None:
+            self.registry.observe('yamovie_db_duration_seconds', query_stats.seconds, labels)
+            self.registry.inc('yamovie_db_queries_total', labels, query_stats.count)
+        return response
+
+    def _finish(self, _error):
+        if g.pop('metrics_started_at', None) is not None:
+            self._add_in_flight(-1)
+            self.registry.flush()
+
+    def _record_omdb_call(self, seconds: float, error: str | None):
+        self.registry.observe('yamovie_omdb_request_duration_seconds', seconds)
+        if error is not None:
+            self.registry.inc('yamovie_omdb_errors_total', {'error': error})
+
+    def _render(self):
+        self.registry.flush(force=True)
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,13 @@
+from flask import request
+
+
+def get_movie_filters() -> dict:
+    return {'year_from': request.args.get('year_from', type=int),
+            'year_to': request.args.get('year_to', type=int),
+            'director': request.args.get('director', type=str),
+            'min_rating': request.args.get('min_rating', type=float),
+            'name_prefix': request.args.get('name_prefix', type=str)}
+
+
+def get_movie_sort() -> str | None:
+    return request.args.get('sort')
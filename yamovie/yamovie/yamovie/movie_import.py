@@ -0,0 +1,31 @@
+from typing import List
+
+from data_manager.movies import Movies
+from omdb_client import OMDbClient, movie_info_from_response
+
+
+def import_movies(omdb_client: OMDbClient, movies_data_manager: Movies,
+                  titles: List[str], chunk_size: int = 1000) -> dict | None:
+    """
+    Resolve the titles on OMDb concurrently and add the movies found
+    :return: {'succeeded': n, 'failed': [{'index': i, 'error': str}]} by title index,
+             None if the movies could not be written
+    """
+    fetched = omdb_client.fetch_movies(titles)
+    failed = fetched['failed']
+    accepted_indexes, new_movies_info = [], []
+    for movie in fetched['movies']:
+        if movie['response'].get('Response') == 'False':
+            failed.append({'index': movie['index'],
+                           'error': movie['response'].get('Error', 'Movie not found!')})
+            continue
+        accepted_indexes.append(movie['index'])
+        new_movies_info.append(movie_info_from_response(movie['response'], titles[movie['index']]))
+
+    report = movies_data_manager.add_new_movies(new_movies_info, chunk_size)
+    if report is None:
+        return None
+    for failure in report['failed']:
+        failure['index'] = accepted_indexes[failure['index']]
+    report['failed'] = sorted(report['failed'] + failed, key=lambda failure: failure['index'])
+    return report
@@ -1,24 +1,27 @@
-import requests
 from flask import Blueprint, render_template, request, redirect, url_for, abort, g
 
-movies_bp = Blueprint('movies', __name__)
+from movie_filters import get_movie_filters, get_movie_sort
+from pagination import get_page_args, next_page_url
+from page_cache import cached_page
 
-API_KEY = 'ff742994'
-BASE_URL_KEY = f'http://www.omdbapi.com/?apikey={API_KEY}'
-IMDB_BASE_URL = 'https://www.imdb.com/title/'
+movies_bp = Blueprint('movies', __name__)
 
 
 @movies_bp.route('/movies', methods=['GET'])
+@cached_page('movies')
 def get_movies():
-    movies = g.movies_data_manager.get_movies()
-    return render_template('movies.html', movies=movies)
-
-
-def fetch_movie_api_response(title: str) -> dict:
-    response = requests.get(f'{BASE_URL_KEY}&t={title}', timeout=5)
-    response.raise_for_status()
-
-    return response.json()
+    query = request.args.get('q')
+    if query:
+        page = g.movies_data_manager.search_movies(query, *get_page_args())
+    else:
+        page = g.movies_data_manager.get_movies_page(*get_page_args(cursor_type=str),
+                                                     filters=get_movie_filters(),
+                                                     sort=get_movie_sort(),
+                                                     include_reviews=False)
+    movies, next_cursor = page or ([], None)
+    return render_template('movies.html',
+                           movies=movies,
+                           next_page_url=next_page_url(next_cursor))
 
 
 def get_error_messages(movie_info: dict) -> list:
@@ -53,59 +56,29 @@ def get_error_messages(movie_info: dict) -> list:
     return error_messages
 
 
-def format_movie_info(response: dict, movie_name: str) -> dict:
-    return {'movie_name': response.get('Название', movie_name),
-            'director': response.get('Режиссер', ''),
-            'year': int(response.get('Год', '0000')[:4]),
-            'rating': float(response.get('imdbРейтинг', 0.0)),
-            'poster': response.get('Постер', ''),
-            'website': IMDB_BASE_URL + response.get('imdbID', '')
-            }
-
-
-def get_empty_info(movie_name: str) -> dict:
-    return {'movie_name': movie_name,
-            'director': '',
-            'year': 0,
-            'rating': 0.0,
-            'poster': '',
-            'website': ''
-            }
-
-
-def get_new_movie_info() -> dict | list:
+def get_new_movie_name() -> str | list:
     movie_name = request.form.get('movie_name', '')
 
     error_messages = get_error_messages({'movie_name': movie_name})
     if error_messages:
         return error_messages
 
-    try:
-        response = fetch_movie_api_response(movie_name)
-        return format_movie_info(response, movie_name)
-
-    except (requests.exceptions.Timeout,
-            requests.exceptions.HTTPError,
-            requests.exceptions.ConnectionError,
-            requests.exceptions.RequestException):
-        print("Ошибка запроса. "
-              "Проверьте подключение к Интернету "
-              "и убедитесь, что веб-сайт доступен.")
-        return get_empty_info(movie_name)
+    return movie_name
 
 
 @movies_bp.route('/movies/add_movie', methods=['GET', 'POST'])
 def add_new_movie():
     if request.method == 'POST':
-        new_movie_info = get_new_movie_info()
-        if isinstance(new_movie_info, list):
+        movie_name = get_new_movie_name()
+        if isinstance(movie_name, list):
             return render_template('add_new_movie.html',
-                                   error_messages=new_movie_info)
+                                   error_messages=movie_name)
 
-        if g.movies_data_manager.add_new_movie(new_movie_info) is None:
+        if not g.movies_data_manager.add_movie_for_enrichment(movie_name):
             return render_template('add_new_movie.html',
                                    error_messages=['Нельзя добавить фильм '
                                                    'Фильм уже есть в базе данных.'])
+        g.enrichment_queue.notify()
 
         return redirect(url_for('movies.get_movies'))
 
@@ -175,9 +148,12 @@ def update_movie(movie_id: int):
 @movies_bp.route('/movies/delete_movie/<int:movie_id>')
 def delete_movie(movie_id: int):
     if g.movies_data_manager.delete_movie(movie_id) is None:
-        movies = g.movies_data_manager.get_movies()
+        movies, next_cursor = g.movies_data_manager.get_movies_page(*get_page_args(),
+                                                                    include_reviews=False) or ([], None)
         return render_template('movies.html',
                                movies=movies,
+                               next_page_url=url_for('movies.get_movies', after=next_cursor)
+                               if next_cursor is not None else None,
                                error_message='Невозможно удалить этот фильм, так как он добавлен в избранное.')
 
     return redirect(url_for('movies.get_movies'))
@@ -189,12 +165,18 @@ def get_movie_reviews(user_id: int, movie_id: int):
     if user is None:
         abort(404)
 
-    movie = g.movies_data_manager.get_movie(movie_id)
-    movie_reviews = g.movies_reviews_data_manager.get_movie_reviews()
+    movie = g.movies_data_manager.get_movie(movie_id, include_reviews=False)
+    if movie is None:
+        abort(404)
+
+    movie_reviews, next_cursor = g.movies_reviews_data_manager.get_movie_reviews_page(
+        movie_id, *get_page_args(cursor_type=str), sort=get_movie_sort()) or ([], None)
     return render_template('movie_reviews.html',
                            user=user,
                            movie_reviews=movie_reviews,
-                           movie=movie)
+                           user_reviewed=g.movies_reviews_data_manager.has_movie_review(user_id, movie_id),
+                           movie=movie,
+                           next_page_url=next_page_url(next_cursor))
 
 
 @movies_bp.route('/users/<int:user_id>/add_movie_review/<int:movie_id>', methods=['POST'])
@@ -206,6 +188,9 @@ def add_movie_review(user_id: int, movie_id: int):
         'review_text': request.form.get('review_text')
     }
 
-    if g.movies_reviews_data_manager.add_movie_review(reviewed_info) is None:
+    added = g.movies_reviews_data_manager.add_movie_review(reviewed_info)
+    if added is False:
+        abort(400, ['Невозможно добавить отзыв, так как он уже добавлен.'])
+    if added is None:
         abort(404, ['Невозможно оставить отзыв об этом фильме.'])
     return redirect(url_for('movies.get_movie_reviews', movie_id=movie_id, user_id=user_id))
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IMDB_BASE_URL = 'https://www.imdb.com/title/'
+
+
+def normalize_title(title: str) -> str:
+    return ' '.join(title.casefold().split())
+
+
+class OMDbCache:
+    """
+    OMDb responses in an SQLite table keyed by normalized title.
+    Entries expire after ttl seconds ('movie not found' answers after
+    negative_ttl). Once about max_entries titles are stored, the expired
+    and then the least recently used entries are evicted, a tenth of
+    max_entries more than needed, so a write rarely pays for an eviction.
+    The file may be shared by several processes.
+    """
+
+    def __init__(self, path: str, ttl: int, negative_ttl: int, max_entries: int):
+        self._path = path
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._max_entries = max_entries
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS omdb_cache ('
+                               'title_key TEXT PRIMARY KEY, '
+                               'response TEXT NOT NULL, '
+                               'negative INTEGER NOT NULL, '
+                               'expires_at REAL NOT NULL, '
+                               'accessed_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_omdb_cache_accessed_at '
+                               'ON omdb_cache (accessed_at)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_omdb_cache_expires_at '
+                               'ON omdb_cache (expires_at)')
+            # counts every write as a new title and misses the writes of other
+            # processes; it is only the trigger, the eviction counts the rows
+            self._estimated_entries = connection.execute('SELECT COUNT(*) FROM omdb_cache').fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        if getattr(self._local, 'connection', None) is None:
+            connection = sqlite3.connect(self._path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return self._local.connection
+
+    def _count(self, hit: bool):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, title: str) -> dict | None:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute('SELECT response FROM omdb_cache '
+                                     'WHERE title_key = ? AND expires_at > ?',
+                                     (normalize_title(title), now)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE omdb_cache SET accessed_at = ? WHERE title_key = ?',
+                                   (now, normalize_title(title)))
+        self._count(row is not None)
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, title: str, response: dict, negative: bool = False):
+        now = time.time()
+        ttl = self._negative_ttl if negative else self._ttl
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO omdb_cache '
+                               '(title_key, response, negative, expires_at, accessed_at) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                               (normalize_title(title), json.dumps(response), int(negative), now + ttl, now))
+        with self._counter_lock:
+            self._estimated_entries += 1
+            evict = self._estimated_entries > self._max_entries
+        if evict:
+            self._evict(now)
+
+    def _evict(self, now: float):
+        keep = self._max_entries - self._max_entries // 10
+        with self._connection() as connection:
+            connection.execute('DELETE FROM omdb_cache WHERE expires_at <= ?', (now,))
+            entries = connection.execute('SELECT COUNT(*) FROM omdb_cache').fetchone()[0]
+            if entries > keep:
+                connection.execute('DELETE FROM omdb_cache WHERE title_key IN '
+                                   '(SELECT title_key FROM omdb_cache ORDER BY accessed_at LIMIT ?)',
+                                   (entries - keep,))
+        with self._counter_lock:
+            self._estimated_entries = min(entries, keep)
+
+    def stats(self) -> dict:
+        with self._connection() as connection:
+            entries, negative_entries = connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(negative), 0) FROM omdb_cache').fetchone()
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'negative_entries': negative_entries}
+
+
+class OMDbClient:
+    """
+    OMDb lookups over one keep-alive requests.Session whose connection
+    pool is sized for max_workers concurrent lookups
+    """
+
+    def __init__(self, base_url: str, api_key: str, cache: OMDbCache | None = None,
+                 timeout: float = 5, max_workers: int = 8):
+        self._base_url = base_url
+        self._api_key = api_key
+        self._cache = cache
+        self._timeout = timeout
+        self._max_workers = max_workers
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._call_listeners = []
+
+    @property
+    def cache(self) -> OMDbCache | None:
+        return self._cache
+
+    def add_call_listener(self, listener):
+        """
+        listener(seconds, error) is called after every request sent to
+        OMDb, error being the exception class name or None
+        """
+        self._call_listeners.append(listener)
+
+    def _notify_call(self, seconds: float, error: str | None):
+        for listener in self._call_listeners:
+            listener(seconds, error)
+
+    def fetch_movie(self, title: str) -> dict:
+        """
+        Return the OMDb answer for the title, from the cache when possible;
+        request errors are raised and never cached
+        """
+        if self._cache is not None:
+            cached_response = self._cache.get(title)
+            if cached_response is not None:
+                return cached_response
+
+        started = time.perf_counter()
+        try:
+            response = self._session.get(self._base_url,
+                                         params={'apikey': self._api_key, 't': title},
+                                         timeout=self._timeout)
+            response.raise_for_status()
+            movie = response.json()
+        except (requests.exceptions.RequestException, ValueError) as err:
+            self._notify_call(time.perf_counter() - started, type(err).__name__)
+            raise
+        self._notify_call(time.perf_counter() - started, None)
+
+        if self._cache is not None:
+            self._cache.set(title, movie, negative=movie.get('Response') == 'False')
+        return movie
+
+    def fetch_movies(self, titles: List[str]) -> dict:
+        """
+        Look the titles up concurrently, each with its own timeout
+        :param titles: titles to look up
+        :return: {'movies': [{'index': i, 'response': dict}],
+                  'failed': [{'index': i, 'error': str}]}, by title index
+        """
+        def fetch(title: str) -> dict | str:
+            try:
+                return self.fetch_movie(title)
+            except (requests.exceptions.RequestException, ValueError) as err:
+                return str(err) or type(err).__name__
+
+        report = {'movies': [], 'failed': []}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            for index, result in enumerate(executor.map(fetch, titles)):
+                if isinstance(result, str):
+                    report['failed'].append({'index': index, 'error': result})
+                else:
+                    report['movies'].append({'index': index, 'response': result})
+        return report
+
+
+def movie_info_from_response(response: dict, title: str) -> dict:
+    """Map an OMDb answer to the movie fields stored by Movies"""
+    def value(key: str) -> str:
+        field = response.get(key) or ''
+        return '' if field == 'N/A' else field
+
+    year = value('Year')[:4]
+    try:
+        rating = float(value('imdbRating') or 0.0)
+    except ValueError:
+        rating = 0.0
+    return {'movie_name': value('Title') or title,
+            'director': value('Director'),
+            'year': int(year) if year.isdigit() else 0,
+            'rating': rating,
+            'poster': value('Poster'),
+            'website': IMDB_BASE_URL + value('imdbID') if value('imdbID') else ''
+            }
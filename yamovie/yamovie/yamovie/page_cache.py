@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, g
+
+
+class LRUPageCacheBackend:
+    """Pages in process memory; invalidations do not reach other processes"""
+
+    name = 'lru'
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._pages = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def set(self, key: str, page: dict):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self._max_entries:
+                self._pages.popitem(last=False)
+
+    def get_generations(self, tags) -> dict:
+        with self._lock:
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def bump_generations(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class FilePageCacheBackend:
+    """
+    Pages as files in a local directory, so every server process on the
+    host shares them and sees the others' invalidations; the file
+    modification time orders the LRU eviction
+    """
+
+    name = 'file'
+
+    def __init__(self, directory: str, max_entries: int):
+        self._pages_directory = os.path.join(directory, 'pages')
+        self._tags_directory = os.path.join(directory, 'tags')
+        self._max_entries = max_entries
+        os.makedirs(self._pages_directory, exist_ok=True)
+        os.makedirs(self._tags_directory, exist_ok=True)
+
+    def _page_path(self, key: str) -> str:
+        return os.path.join(self._pages_directory, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def _write(self, path: str, content: str):
+        # atomic replace, readers never see a partial file
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path),
+                                         delete=False) as temp_file:
+            temp_file.write(content)
+        os.replace(temp_file.name, path)
+
+    def get(self, key: str) -> dict | None:
+        path = self._page_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as page_file:
+                page = json.load(page_file)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return page
+
+    def set(self, key: str, page: dict):
+        self._write(self._page_path(key), json.dumps(page))
+        file_names = os.listdir(self._pages_directory)
+        if len(file_names) <= self._max_entries:
+            return
+        paths = [os.path.join(self._pages_directory, file_name) for file_name in file_names]
+        modified_times = {}
+        for path in paths:
+            try:
+                modified_times[path] = os.path.getmtime(path)
+            except OSError:
+                pass
+        for path in sorted(modified_times, key=modified_times.get)[:len(paths) - self._max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # evicted by another process
+
+    def _read_generation(self, tag: str) -> str:
+        try:
+            with open(os.path.join(self._tags_directory, tag), 'r', encoding='utf-8') as tag_file:
+                return tag_file.read()
+        except OSError:
+            return ''
+
+    def get_generations(self, tags) -> dict:
+        return {tag: self._read_generation(tag) for tag in tags}
+
+    def bump_generations(self, tags):
+        # a fresh token instead of a counter, so concurrent bumps from
+        # several processes cannot lose an invalidation
+        generation = f'{time.time_ns()}-{os.getpid()}-{threading.get_ident()}'
+        for tag in tags:
+            self._write(os.path.join(self._tags_directory, tag), generation)
+
+
+class PageCache:
+    """
+    Rendered pages keyed by route and arguments. Every page records the
+    generation of the tags it was rendered from, and invalidate() bumps
+    those generations, so stale pages are never served and are evicted
+    by the backend in time.
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.render_seconds_saved = 0.0
+
+    def invalidate(self, tags):
+        self._backend.bump_generations(tags)
+        with self._lock:
+            self.invalidations += 1
+
+    def get_page(self, key: str, tags) -> str | None:
+        page = self._backend.get(key)
+        fresh = page is not None and page['generations'] == self._backend.get_generations(tags)
+        with self._lock:
+            if fresh:
+                self.hits += 1
+                self.render_seconds_saved += page['render_seconds']
+            else:
+                self.misses += 1
+        return page['body'] if fresh else None
+
+    def render(self, key: str, tags, render_page) -> str:
+        body = self.get_page(key, tags)
+        if body is not None:
+            return body
+
+        # generations read before rendering, a write during it leaves the page stale-marked
+        generations = self._backend.get_generations(tags)
+        started = time.perf_counter()
+        body = render_page()
+        if isinstance(body, str):
+            self._backend.set(key, {'body': body,
+                                    'generations': generations,
+                                    'render_seconds': time.perf_counter() - started})
+        return body
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'backend': self._backend.name,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0,
+                    'invalidations': self.invalidations,
+                    'render_seconds_saved': self.render_seconds_saved}
+
+
+def cached_page(*tags):
+    """
+    Serve the view's rendered page from g.page_cache while no write
+    touched the tags; only plain rendered pages (str) are stored
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            page_cache = getattr(g, 'page_cache', None)
+            if page_cache is None:
+                return view(*args, **kwargs)
+            key = f'{request.path}?{sorted(request.args.items(multi=True))}'
+            return page_cache.render(key, tags, lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
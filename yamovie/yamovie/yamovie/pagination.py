@@ -0,0 +1,41 @@
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def get_page_args(cursor_type=int) -> tuple[int, int | str | None]:
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    after = request.args.get('after', type=cursor_type)
+    return min(max(limit, 1), MAX_PAGE_SIZE), after
+
+
+def next_page_url(next_cursor: int | str | None) -> str | None:
+    if next_cursor is None:
+        return None
+    args = request.args.to_dict()
+    args['after'] = next_cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def add_page_headers(response, next_cursor: int | str | None):
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{next_page_url(next_cursor)}>; rel="next"'
+    return response
+
+
+def iter_pages(get_page, limit: int, first_page: tuple[list, int | str | None]):
+    """
+    The items of first_page and of every page after it, a list per
+    page; get_page(limit, after) returns (items, next_cursor) or None
+    """
+    items, next_cursor = first_page
+    yield items
+    while next_cursor is not None:
+        page = get_page(limit, next_cursor)
+        if page is None:
+            # the status is already sent, a cut off body tells the client
+            raise RuntimeError(f'Page after {next_cursor!r} could not be read')
+        items, next_cursor = page
+        yield items
@@ -0,0 +1,134 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from datetime import datetime, timezone
+
+from flask import g, request
+
+PROFILE_NAME = re.compile(r'^(?P<created_at>\d{8}T\d{6}\.\d{6})_(?P<method>[A-Z]+)_(?P<route>.*)'
+                          r'_(?P<status>\d{3})_(?P<duration_ms>\d+)ms\.prof$')
+
+
+class RequestProfiler:
+    """
+    Runs cProfile for single requests that ask for it with an X-Profile
+    header or a profile query argument, when enabled. With a token only
+    that value triggers profiling. Each profile is saved to the directory
+    as <timestamp>_<method>_<route>_<status>_<ms>ms.prof, readable with
+    pstats or snakeviz; the oldest are removed past max_profiles.
+    Only the thread handling the request is profiled, and a streamed
+    body is produced after the profile is saved.
+    """
+
+    def __init__(self, directory: str, enabled: bool = False, token: str | None = None,
+                 max_profiles: int = 200):
+        self.directory = directory
+        self.enabled = enabled
+        self.token = token
+        self._max_profiles = max_profiles
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._save)
+        app.teardown_request(self._stop)
+
+    def is_authorized(self, value: str | None) -> bool:
+        if not self.enabled or not value:
+            return False
+        return value == self.token if self.token else value not in ('0', 'false')
+
+    def _start(self):
+        if not self.is_authorized(request.headers.get('X-Profile') or request.args.get('profile')):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return  # another profiler is already active in this thread
+        g.profile = profile
+        g.profile_started_at = time.perf_counter()
+
+    def _stop(self, _error=None):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+        return profile
+
+    def _save(self, response):
+        profile = self._stop()
+        if profile is None:
+            return response
+
+        duration_ms = round((time.perf_counter() - g.profile_started_at) * 1000)
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        route_slug = re.sub(r'[^A-Za-z0-9]+', '-', route).strip('-') or 'root'
+        created_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%f')
+        profile_id = f'{created_at}_{request.method}_{route_slug}_{response.status_code}_{duration_ms}ms'
+        profile.dump_stats(os.path.join(self.directory, f'{profile_id}.prof'))
+        self._remove_oldest()
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def _profile_names(self) -> list:
+        try:
+            return sorted(file_name for file_name in os.listdir(self.directory) if PROFILE_NAME.match(file_name))
+        except OSError:
+            return []
+
+    def _remove_oldest(self):
+        file_names = self._profile_names()
+        for file_name in file_names[:max(len(file_names) - self._max_profiles, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                pass  # removed by another process
+
+    def path(self, profile_id: str) -> str | None:
+        file_name = f'{profile_id}.prof'
+        if not PROFILE_NAME.match(file_name) or not os.path.exists(os.path.join(self.directory, file_name)):
+            return None
+        return os.path.join(self.directory, file_name)
+
+    def get_slowest_profiles(self, limit: int = 20, recent: int = 100) -> list[dict]:
+        """The limit slowest of the recent latest profiles, slowest first"""
+        profiles = []
+        for file_name in self._profile_names()[-recent:]:
+            match = PROFILE_NAME.match(file_name)
+            profiles.append({'id': file_name.removesuffix('.prof'),
+                             'created_at': datetime.strptime(match['created_at'], '%Y%m%dT%H%M%S.%f').
+                            replace(tzinfo=timezone.utc).isoformat(),
+                             'method': match['method'],
+                             'route': match['route'],
+                             'status': int(match['status']),
+                             'duration_ms': int(match['duration_ms'])})
+        return sorted(profiles, key=lambda profile: profile['duration_ms'], reverse=True)[:limit]
+
+    def get_hot_spots(self, profile_id: str, limit: int = 10, sort: str = 'cumulative') -> list[dict] | None:
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        stats = pstats.Stats(path)
+        stats.sort_stats(sort)
+        hot_spots = []
+        for function in stats.fcn_list[:limit]:
+            _, calls, total_time, cumulative_time, _ = stats.stats[function]
+            file_name, line, function_name = function
+            hot_spots.append({'function': f'{file_name}:{line}({function_name})',
+                              'calls': calls,
+                              'total_seconds': total_time,
+                              'cumulative_seconds': cumulative_time})
+        return hot_spots
+
+    def get_report(self, profile_id: str, limit: int = 40, sort: str = 'cumulative') -> str | None:
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
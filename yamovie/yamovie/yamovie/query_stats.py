@@ -0,0 +1,120 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with literals and expanded IN lists collapsed, so
+    the queries of one loop share a shape"""
+    shape = STRING_LITERAL.sub('?', statement)
+    shape = NUMBER_LITERAL.sub('?', shape)
+    return PARAMETER_LIST.sub('(?)', ' '.join(shape.split()))
+
+
+class QueryStats:
+    """Statements run, their total time and how often each shape repeats"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, max_repeats: int) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > max_repeats]
+
+    def describe(self) -> str:
+        return f'{self.count} queries in {self.seconds * 1000:.1f} ms: ' + \
+            '; '.join(f'{count}x {shape[:120]}' for shape, count in self.shapes.most_common(5))
+
+
+def _listen(target, record):
+    # the start time lives on the execution context, a failed statement
+    # never reaches after_cursor_execute
+    def before_cursor_execute(_connection, _cursor, _statement, _parameters, context, _executemany):
+        context.query_started_at = time.perf_counter()
+
+    def after_cursor_execute(_connection, _cursor, statement, _parameters, context, _executemany):
+        started_at = getattr(context, 'query_started_at', None)
+        record(statement, time.perf_counter() - started_at if started_at is not None else 0.0)
+
+    event.listen(target, 'before_cursor_execute', before_cursor_execute)
+    event.listen(target, 'after_cursor_execute', after_cursor_execute)
+    return before_cursor_execute, after_cursor_execute
+
+
+def _remove(target, listeners):
+    event.remove(target, 'before_cursor_execute', listeners[0])
+    event.remove(target, 'after_cursor_execute', listeners[1])
+
+
+@contextmanager
+def recorded_queries(target=Engine):
+    """Record the statements of every engine, or of one, inside the block"""
+    stats = QueryStats()
+    listeners = _listen(target, stats.add)
+    try:
+        yield stats
+    finally:
+        _remove(target, listeners)
+
+
+class QueryMonitor:
+    """
+    Counts the statements and DB time of each request on the app's
+    engine. A request above the query budget, or repeating one
+    statement shape more than max_repeats times (an N+1 loop), is
+    logged as a warning. The counts are sent as X-Query-Count and
+    X-Query-Time (ms) in debug mode, or as headers=True/False says.
+    Statements run while a streamed body is sent come after the
+    headers and are not counted.
+    """
+
+    def __init__(self, budget: int, max_repeats: int, headers: bool | None = None):
+        self.budget = budget
+        self.max_repeats = max_repeats
+        self.headers = headers
+
+    def init_app(self, app, engine):
+        _listen(engine, self._record)
+        app.before_request(self._start)
+        app.after_request(self._report)
+
+    @staticmethod
+    def _record(statement: str, seconds: float):
+        # background workers run outside requests and are not counted
+        if has_request_context() and 'query_stats' in g:
+            g.query_stats.add(statement, seconds)
+
+    @staticmethod
+    def _start():
+        g.query_stats = QueryStats()
+
+    def _report(self, response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        if stats.count > self.budget:
+            current_app.logger.warning('%s %s exceeded the query budget of %d: %s',
+                                       request.method, request.path, self.budget, stats.describe())
+        for shape, count in stats.repeated_shapes(self.max_repeats):
+            current_app.logger.warning('%s %s repeated a query %d times, possible N+1: %s',
+                                       request.method, request.path, count, shape)
+        if self.headers or (self.headers is None and current_app.debug):
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = f'{stats.seconds * 1000:.2f}'
+        return response
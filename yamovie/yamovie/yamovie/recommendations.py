@@ -0,0 +1,398 @@
+import heapq
+import math
+import threading
+import time
+from typing import Iterable, Iterator
+
+from sqlalchemy import and_, delete, desc, exists, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from data_manager.data_models import Movie, MovieNeighbour, MovieReview, StaleMovieNeighbours, TableVersion, \
+    UserMovie, db, get_table_versions
+from data_manager.sqlite_data_manager import ID_CHUNK_SIZE, chunked
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # optional, the similarities are computed in pure Python without them
+    numpy = sparse = None
+
+WRITE_CHUNK_SIZE = 10000
+RECOMMENDATION_COLUMNS = ('id', 'movie_name', 'director', 'year', 'rating', 'poster', 'website')
+# sums in another order differ in the last bits, rounded scores rank
+# the same in both backends and in refresh and rebuild
+SCORE_DECIMALS = 9
+
+
+def interaction_weight(reviews):
+    """
+    A favourite counts 1.0, or 0.6 to 1.5 by the rating of the user's
+    review of it, so loved movies weigh more than merely kept ones
+    """
+    return func.coalesce(0.5 + reviews.c.rating / 10.0, 1.0)
+
+
+def top_neighbours(scores: Iterable[tuple], k: int | None) -> list:
+    """(neighbour_id, score) pairs, best first then by id; all of them when k is None"""
+    if k is None:
+        return sorted(scores, key=lambda pair: (-pair[1], pair[0]))
+    return heapq.nsmallest(k, scores, key=lambda pair: (-pair[1], pair[0]))
+
+
+def python_cosine_rows(interactions: list, movie_ids: list, norms: dict, k: int | None,
+                       batch_size: int) -> Iterator[tuple[int, list]]:
+    """
+    The cosine similarities of movie_ids with every other movie,
+    accumulated over the users of each movie
+    :param interactions: (user_id, movie_id, weight) of every user of movie_ids
+    :param norms: movie_id -> norm of its column over all users
+    :return: (movie_id, top_neighbours) per movie of movie_ids
+    """
+    movies_by_user, users_by_movie = {}, {}
+    for user_id, movie_id, weight in interactions:
+        movies_by_user.setdefault(user_id, []).append((movie_id, weight))
+        users_by_movie.setdefault(movie_id, []).append((user_id, weight))
+    for movie_id in movie_ids:
+        products = {}
+        for user_id, weight in users_by_movie.get(movie_id, ()):
+            for other_id, other_weight in movies_by_user[user_id]:
+                if other_id != movie_id:
+                    products[other_id] = products.get(other_id, 0.0) + weight * other_weight
+        norm = norms.get(movie_id)
+        if not norm:
+            yield movie_id, []
+            continue
+        yield movie_id, top_neighbours(((other_id, round(product / (norm * norms[other_id]), SCORE_DECIMALS))
+                                        for other_id, product in products.items()
+                                        if product > 0 and norms.get(other_id)), k)
+
+
+def numpy_cosine_rows(interactions: list, movie_ids: list, norms: dict, k: int | None,
+                      batch_size: int) -> Iterator[tuple[int, list]]:
+    """
+    python_cosine_rows as sparse matrix products of batch_size movies
+    with the user x movie matrix, which bounds the memory of a batch
+    """
+    if not interactions:
+        for movie_id in movie_ids:
+            yield movie_id, []
+        return
+    user_ids, interaction_movie_ids, weights = (numpy.asarray(values) for values in zip(*interactions))
+    _, rows = numpy.unique(user_ids, return_inverse=True)
+    columns, column_indexes = numpy.unique(interaction_movie_ids, return_inverse=True)
+    matrix = sparse.csr_matrix((weights.astype(float), (rows, column_indexes)),
+                               shape=(rows.max() + 1, len(columns)))
+    by_movie = matrix.T.tocsr()
+    column_norms = numpy.array([norms.get(int(movie_id), 0.0) for movie_id in columns])
+    inverse_norms = numpy.divide(1.0, column_norms, out=numpy.zeros_like(column_norms), where=column_norms > 0)
+    positions = {int(movie_id): position for position, movie_id in enumerate(columns)}
+
+    for _, batch in chunked(list(movie_ids), batch_size):
+        batch_positions = [positions[movie_id] for movie_id in batch if movie_id in positions]
+        products = (by_movie[batch_positions] @ matrix).tocsr()
+        products.data *= (numpy.repeat(inverse_norms[batch_positions], numpy.diff(products.indptr))
+                          * inverse_norms[products.indices])
+        row = 0
+        for movie_id in batch:
+            if movie_id not in positions:
+                yield movie_id, []
+                continue
+            start, end = products.indptr[row], products.indptr[row + 1]
+            row += 1
+            neighbour_ids = columns[products.indices[start:end]]
+            scores = numpy.round(products.data[start:end], SCORE_DECIMALS)
+            keep = (neighbour_ids != movie_id) & (scores > 0)
+            neighbour_ids, scores = neighbour_ids[keep], scores[keep]
+            if k is not None and len(scores) > k:
+                # every score tied with the k-th is kept, the ids break the tie
+                kth_score = numpy.partition(scores, len(scores) - k)[len(scores) - k]
+                keep = scores >= kth_score
+                neighbour_ids, scores = neighbour_ids[keep], scores[keep]
+            order = numpy.lexsort((neighbour_ids, -scores))[:k]
+            yield movie_id, list(zip(neighbour_ids[order].tolist(), scores[order].tolist()))
+
+
+cosine_rows = python_cosine_rows if numpy is None else numpy_cosine_rows
+
+
+class RecommendationEngine:
+    """
+    Item-item recommendations: two movies are similar when the same
+    users added them to favourites, by the cosine of their columns in
+    the user x movie matrix of interaction_weight values. The top_k
+    neighbours of every movie are kept in movie_neighbours, so serving a
+    user is one query. refresh() recomputes the movies queued in
+    stale_movie_neighbours and patches the lists they are in; a
+    similarity only depends on the two movies' columns, so the result is
+    the same as a rebuild() of everything.
+    """
+
+    def __init__(self, app, top_k: int = 20, batch_size: int = 1000, refresh_interval: float = 60.0,
+                 rebuild_fraction: float = 0.2):
+        self._app = app
+        self._top_k = top_k
+        self._batch_size = batch_size
+        self._refresh_interval = refresh_interval
+        self._rebuild_fraction = rebuild_fraction
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._last_report = None  # of this process
+
+    @property
+    def backend(self) -> str:
+        return 'python' if numpy is None else 'numpy'
+
+    def start(self):
+        """Start the refresh thread once per process, lazily like the enrichment workers"""
+        if self._thread or self._refresh_interval <= 0:
+            return
+        with self._start_lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name='recommendations', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._app.app_context():
+            while True:
+                time.sleep(self._refresh_interval)
+                try:
+                    self.refresh()
+                except SQLAlchemyError as err:
+                    db.session.rollback()
+                    print(err)
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def _interactions_query():
+        favourites, reviews = UserMovie.__table__, MovieReview.__table__
+        return (select(favourites.c.user_id, favourites.c.movie_id, interaction_weight(reviews).label('weight')).
+                select_from(favourites.outerjoin(reviews, and_(reviews.c.user_id == favourites.c.user_id,
+                                                               reviews.c.movie_id == favourites.c.movie_id))))
+
+    def _load_interactions(self, user_ids: set | None = None) -> list:
+        """(user_id, movie_id, weight) of every favourite, or of the users'"""
+        query = self._interactions_query()
+        if user_ids is None:
+            return db.session.execute(query).all()
+        favourites = UserMovie.__table__
+        interactions = []
+        for _, chunk in chunked(sorted(user_ids), ID_CHUNK_SIZE):
+            interactions.extend(db.session.execute(query.where(favourites.c.user_id.in_(chunk))).all())
+        return interactions
+
+    @staticmethod
+    def _load_users_of(movie_ids: list) -> set:
+        favourites = UserMovie.__table__
+        user_ids = set()
+        for _, chunk in chunked(sorted(movie_ids), ID_CHUNK_SIZE):
+            user_ids.update(db.session.execute(select(favourites.c.user_id).
+                                               where(favourites.c.movie_id.in_(chunk))).scalars())
+        return user_ids
+
+    def _load_norms(self) -> dict:
+        """movie_id -> norm of its column, for every movie in favourites"""
+        interactions = self._interactions_query().subquery()
+        return {movie_id: math.sqrt(squares) for movie_id, squares in
+                db.session.execute(select(interactions.c.movie_id,
+                                          func.sum(interactions.c.weight * interactions.c.weight)).
+                                   group_by(interactions.c.movie_id))}
+
+    @staticmethod
+    def _load_lists(movie_ids: Iterable[int]) -> dict:
+        neighbours = MovieNeighbour.__table__
+        lists = {}
+        for _, chunk in chunked(sorted(movie_ids), ID_CHUNK_SIZE):
+            for movie_id, neighbour_id, score in db.session.execute(
+                    select(neighbours.c.movie_id, neighbours.c.neighbour_id, neighbours.c.score).
+                    where(neighbours.c.movie_id.in_(chunk))):
+                lists.setdefault(movie_id, []).append((neighbour_id, score))
+        return lists
+
+    @staticmethod
+    def _load_movies_listing(movie_ids: list) -> set:
+        neighbours = MovieNeighbour.__table__
+        listing = set()
+        for _, chunk in chunked(sorted(movie_ids), ID_CHUNK_SIZE):
+            listing.update(db.session.execute(select(neighbours.c.movie_id).
+                                              where(neighbours.c.neighbour_id.in_(chunk))).scalars())
+        return listing
+
+    @staticmethod
+    def _load_stale(watermark: int) -> list:
+        stale = StaleMovieNeighbours.__table__
+        return db.session.execute(select(stale.c.movie_id).where(stale.c.id <= watermark)).scalars().all()
+
+    @staticmethod
+    def _stale_watermark() -> int:
+        stale = StaleMovieNeighbours.__table__
+        return db.session.execute(select(func.max(stale.c.id))).scalar() or 0
+
+    @staticmethod
+    def _claim_version(expected: int) -> bool:
+        """
+        Move the movie_neighbours version on from the one read before
+        computing; fails when another process wrote its results since,
+        which are as fresh as these or fresher
+        """
+        versions = TableVersion.__table__
+        table_name = MovieNeighbour.__tablename__
+        if expected == 0:
+            statement = sqlite_insert(versions).on_conflict_do_nothing().values(table_name=table_name, version=1)
+        else:
+            statement = (update(versions).
+                         where(versions.c.table_name == table_name, versions.c.version == expected).
+                         values(version=expected + 1))
+        return db.session.execute(statement).rowcount == 1
+
+    def _write(self, lists: dict, version: int, watermark: int, replace_all: bool = False) -> int | None:
+        """
+        Replace the neighbour lists and dequeue the movies up to the
+        watermark in one transaction
+        :return: number of neighbour rows written, None if another
+            process wrote first
+        """
+        neighbours = MovieNeighbour.__table__
+        stale = StaleMovieNeighbours.__table__
+        if not self._claim_version(version):
+            db.session.rollback()
+            return None
+        if replace_all:
+            db.session.execute(delete(neighbours))
+        else:
+            for _, chunk in chunked(sorted(lists), ID_CHUNK_SIZE):
+                db.session.execute(delete(neighbours).where(neighbours.c.movie_id.in_(chunk)))
+        rows = [{'movie_id': movie_id, 'neighbour_id': neighbour_id, 'score': score}
+                for movie_id, movie_neighbours in lists.items()
+                for neighbour_id, score in movie_neighbours]
+        for _, chunk in chunked(rows, WRITE_CHUNK_SIZE):
+            db.session.execute(insert(neighbours), chunk)
+        db.session.execute(delete(stale).where(stale.c.id <= watermark))
+        db.session.commit()
+        return len(rows)
+
+    def _report(self, mode: str, started: float, timings: dict, **counts) -> dict:
+        timings['total'] = time.perf_counter() - started
+        self._last_report = {'mode': mode, 'backend': self.backend, 'finished_at': time.time(),
+                             **counts, 'timings': {name: round(seconds, 4) for name, seconds in timings.items()}}
+        return self._last_report
+
+    def rebuild(self) -> dict:
+        """Recompute the neighbours of every movie; needs an app context"""
+        started = time.perf_counter()
+        version = get_table_versions([MovieNeighbour.__tablename__])[MovieNeighbour.__tablename__]
+        watermark = self._stale_watermark()
+        interactions = self._load_interactions()
+        norms = self._load_norms()
+        loaded = time.perf_counter()
+        lists = dict(cosine_rows(interactions, sorted(norms), norms, self._top_k, self._batch_size))
+        computed = time.perf_counter()
+        written = self._write(lists, version, watermark, replace_all=True)
+        return self._report('rebuild', started,
+                            {'load': loaded - started, 'similarity': computed - loaded,
+                             'write': time.perf_counter() - computed},
+                            movies=len(lists), interactions=len(interactions),
+                            neighbours=written, written=written is not None)
+
+    def refresh(self) -> dict:
+        """
+        Recompute the neighbours of the queued movies, patch the lists of
+        the movies similar to them, and recompute those lists a queued
+        movie dropped out of while they were full; the first run, or one
+        with more than rebuild_fraction of the liked movies queued,
+        rebuilds everything. Needs an app context
+        """
+        started = time.perf_counter()
+        version = get_table_versions([MovieNeighbour.__tablename__])[MovieNeighbour.__tablename__]
+        watermark = self._stale_watermark()
+        stale_ids = self._load_stale(watermark)
+        if not stale_ids and version:
+            db.session.commit()
+            return self._report('refresh', started, {}, movies=0, interactions=0, neighbours=0, written=False)
+        norms = self._load_norms()
+        if not version or len(stale_ids) > self._rebuild_fraction * max(len(norms), 1):
+            return self.rebuild()
+
+        stale_set = set(stale_ids)
+        interactions = self._load_interactions(self._load_users_of(stale_ids))
+        loaded = time.perf_counter()
+        stale_rows = dict(cosine_rows(interactions, stale_ids, norms, None, self._batch_size))
+        lists = {movie_id: row[:self._top_k] for movie_id, row in stale_rows.items()}
+        # similarity is symmetric, a queued movie's row holds its score in the other lists
+        offered = {}
+        for movie_id, row in stale_rows.items():
+            for neighbour_id, score in row:
+                if neighbour_id not in stale_set:
+                    offered.setdefault(neighbour_id, []).append((movie_id, score))
+        affected = (set(offered) | self._load_movies_listing(stale_ids)) - stale_set
+        current = self._load_lists(affected)
+        recomputed = []
+        for movie_id in affected:
+            old = current.get(movie_id, [])
+            new_scores = dict(offered.get(movie_id, ()))
+            if len(old) >= self._top_k and any(neighbour_id in stale_set and new_scores.get(neighbour_id, 0.0) < score
+                                               for neighbour_id, score in old):
+                # a movie outside the full list may now belong in it
+                recomputed.append(movie_id)
+                continue
+            patched = top_neighbours([(neighbour_id, score) for neighbour_id, score in old
+                                      if neighbour_id not in stale_set] + offered.get(movie_id, []),
+                                     self._top_k)
+            # most offered scores fall below a full list, which is then not rewritten
+            if set(patched) != set(old):
+                lists[movie_id] = patched
+        if recomputed:
+            recomputed_interactions = self._load_interactions(self._load_users_of(recomputed))
+            lists.update(cosine_rows(recomputed_interactions, recomputed, norms, self._top_k, self._batch_size))
+        computed = time.perf_counter()
+        written = self._write(lists, version, watermark)
+        return self._report('refresh', started,
+                            {'load': loaded - started, 'similarity': computed - loaded,
+                             'write': time.perf_counter() - computed},
+                            movies=len(lists), stale_movies=len(stale_ids), recomputed=len(recomputed),
+                            interactions=len(interactions), neighbours=written, written=written is not None)
+
+    def recommend_movies(self, user_id: int, limit: int) -> list | None:
+        """
+        The movies most similar to the user's favourites that are not
+        among them, each neighbour score weighted like the favourite it
+        comes from; one query on movie_neighbours
+        """
+        favourites, reviews = UserMovie.__table__, MovieReview.__table__
+        neighbours, movies = MovieNeighbour.__table__, Movie.__table__
+        added = favourites.alias('added')
+        already_added = select(added.c.id).where(added.c.user_id == user_id,
+                                                 added.c.movie_id == neighbours.c.neighbour_id)
+        score = func.sum(neighbours.c.score * interaction_weight(reviews)).label('score')
+        scores = (select(neighbours.c.neighbour_id, score).
+                  select_from(favourites.
+                              join(neighbours, neighbours.c.movie_id == favourites.c.movie_id).
+                              outerjoin(reviews, and_(reviews.c.user_id == favourites.c.user_id,
+                                                      reviews.c.movie_id == favourites.c.movie_id))).
+                  where(favourites.c.user_id == user_id, ~exists(already_added)).
+                  group_by(neighbours.c.neighbour_id).
+                  order_by(desc(score), neighbours.c.neighbour_id).
+                  limit(limit).
+                  subquery())
+        try:
+            rows = db.session.execute(select(*(movies.c[column] for column in RECOMMENDATION_COLUMNS), scores.c.score).
+                                      join_from(scores, movies, movies.c.id == scores.c.neighbour_id).
+                                      order_by(scores.c.score.desc(), movies.c.id)).mappings().all()
+        except SQLAlchemyError as err:
+            print(err)
+            db.session.rollback()
+            return None
+        return [dict(row) for row in rows]
+
+    def status(self) -> dict:
+        """Queue depth from the database and the last run of this process; needs an app context"""
+        stale = StaleMovieNeighbours.__table__
+        depth, oldest_marked_at = db.session.execute(select(func.count(stale.c.id), func.min(stale.c.marked_at))).one()
+        db.session.commit()
+        return {'backend': self.backend,
+                'top_k': self._top_k,
+                'stale_movies': depth,
+                'oldest_stale_age': time.time() - oldest_marked_at if oldest_marked_at is not None else 0.0,
+                'last_run': self._last_report}
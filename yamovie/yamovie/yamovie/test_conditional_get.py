@@ -0,0 +1,97 @@
+from flask import Flask, g
+from sqlalchemy import event
+
+from api import api
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db, get_table_versions
+from data_manager.movies import Movies
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+app.config['BULK_CHUNK_SIZE'] = 1000
+db.init_app(app)
+app.register_blueprint(api, url_prefix='/api')
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+users_movies_data_manager = UsersMovies(SQLiteDataManager('id', UserMovie, db))
+movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
+
+
+@app.before_request
+def before_request():
+    g.users_data_manager = users_data_manager
+    g.movies_data_manager = movies_data_manager
+    g.users_movies_data_manager = users_movies_data_manager
+    g.movies_reviews_data_manager = movies_reviews_data_manager
+
+
+def create_test_data():
+    db.drop_all()
+    db.create_all()
+    users_data_manager.add_user({'user_name': 'User', 'movies': []})
+    movies_data_manager.add_new_movies([{'movie_name': 'Movie', 'director': '', 'year': 2000,
+                                         'rating': 5.0, 'poster': '', 'website': ''}])
+    users_movies_data_manager.add_user_movie({'user_id': 1, 'movie_id': 1})
+
+
+def test_unchanged_data_is_answered_with_304_without_orm_queries():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data()
+        response = client.get('/api/movies')
+        assert response.status_code == 200 and response.get_etag()[0]
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        response = client.get('/api/movies', headers={'If-None-Match': f'"{response.get_etag()[0]}"'})
+    assert response.status_code == 304
+    assert len(statements) == 1 and 'table_versions' in statements[0]
+
+
+def test_etag_depends_on_query_string():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data()
+        assert client.get('/api/movies').get_etag() != client.get('/api/movies?limit=1').get_etag()
+
+
+def test_write_changes_etag():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data()
+        etag = client.get('/api/users').get_etag()[0]
+        users_data_manager.add_user({'user_name': 'Second user', 'movies': []})
+        response = client.get('/api/users', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_review_bumps_movies_version():
+    with app.app_context():
+        create_test_data()
+        versions = get_table_versions(['movies', 'movies_reviews'])
+        movies_reviews_data_manager.add_movie_review({'user_id': 1, 'movie_id': 1,
+                                                      'rating': 8.0, 'review_text': 'Good'})
+        new_versions = get_table_versions(['movies', 'movies_reviews'])
+    assert all(new_versions[table] > versions[table] for table in versions)
+
+
+def test_cascaded_delete_bumps_child_table_version():
+    with app.app_context():
+        create_test_data()
+        version = get_table_versions(['users_movies'])['users_movies']
+        users_data_manager.delete_user(1)
+        assert get_table_versions(['users_movies'])['users_movies'] > version
+
+
+def test_error_responses_have_no_etag():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data()
+        response = client.get('/api/movies/42/reviews')
+    assert response.status_code == 404
+    assert response.get_etag() == (None, None)
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from flask import Flask
+
+from data_manager.data_models import Movie, EnrichmentJob, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from enrichment import EnrichmentQueue
+from omdb_client import OMDbClient
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+
+
+class StubOMDbHandler(BaseHTTPRequestHandler):
+    failures_left = 0
+
+    def do_GET(self):
+        title = parse_qs(urlparse(self.path).query)['t'][0]
+        if StubOMDbHandler.failures_left:
+            StubOMDbHandler.failures_left -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if title.startswith('Unknown'):
+            movie = {'Response': 'False', 'Error': 'Movie not found!'}
+        else:
+            movie = {'Response': 'True', 'Title': title, 'Director': 'Christopher Nolan', 'Year': '2010',
+                     'imdbRating': '8.8', 'Poster': 'poster.jpg', 'imdbID': 'tt1375666'}
+        body = json.dumps(movie).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def omdb_client():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOMDbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield OMDbClient(f'http://127.0.0.1:{server.server_port}/', 'test-key')
+    server.shutdown()
+
+
+def create_queue(omdb_client: OMDbClient, max_attempts: int = 3) -> EnrichmentQueue:
+    db.drop_all()
+    db.create_all()
+    StubOMDbHandler.failures_left = 0
+    return EnrichmentQueue(app, omdb_client, workers=0, max_attempts=max_attempts, backoff_base=0.0)
+
+
+def test_added_movie_is_pending_until_enriched(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client)
+        assert movies_data_manager.add_movie_for_enrichment('Inception') is True
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'pending'
+        assert queue.status()['queue_depth'] == 1
+
+        assert queue.run_pending() == 1
+        movie = movies_data_manager.get_movie(1)
+        status = queue.status()
+    assert (movie['director'], movie['year'], movie['rating'], movie['enrichment_status']) == \
+           ('Christopher Nolan', 2010, 8.8, 'done')
+    assert status['queue_depth'] == 0
+    assert status['latency']['count'] == 1
+
+
+def test_unknown_title_is_not_retried(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client)
+        movies_data_manager.add_movie_for_enrichment('Unknown title')
+        queue.run_pending()
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'not_found'
+        assert queue.status()['queue_depth'] == 0
+
+
+def test_failed_lookup_is_retried_from_the_table(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client)
+        movies_data_manager.add_movie_for_enrichment('Inception')
+        StubOMDbHandler.failures_left = 1
+        assert queue.process_next() is True
+        assert db.session.get(EnrichmentJob, 1).attempts == 1
+        db.session.remove()
+
+        restarted_queue = EnrichmentQueue(app, omdb_client, workers=0, backoff_base=0.0)
+        assert restarted_queue.run_pending() == 1
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'done'
+
+
+def test_movie_is_marked_failed_after_max_attempts_and_can_be_requeued(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client, max_attempts=2)
+        movies_data_manager.add_movie_for_enrichment('Inception')
+        StubOMDbHandler.failures_left = 2
+        assert queue.run_pending() == 2
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'failed'
+        assert queue.status()['failed'] == 1
+
+        assert queue.requeue_failed() == 1
+        queue.run_pending()
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'done'
+
+
+def test_claimed_job_is_not_processed_twice(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client)
+        movies_data_manager.add_movie_for_enrichment('Inception')
+        assert queue._claim(time.time()) is not None
+        db.session.commit()
+        assert queue._claim(time.time()) is None
+
+
+def test_deleting_pending_movie_deletes_its_job(omdb_client):
+    with app.app_context():
+        queue = create_queue(omdb_client)
+        movies_data_manager.add_movie_for_enrichment('Inception')
+        movies_data_manager.delete_movie(1)
+        assert queue.status()['queue_depth'] == 0
+
+
+class BrokenCacheOMDbClient:
+    def __init__(self, omdb_client: OMDbClient):
+        self._omdb_client = omdb_client
+
+    def fetch_movie(self, title: str) -> dict:
+        if title == 'Broken':
+            raise sqlite3.OperationalError('database is locked')
+        return self._omdb_client.fetch_movie(title)
+
+
+def test_worker_keeps_running_after_an_unexpected_error(omdb_client):
+    worker_app = Flask(__name__)
+    worker_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(worker_app)
+    queue = EnrichmentQueue(worker_app, BrokenCacheOMDbClient(omdb_client), workers=1, poll_interval=0.05)
+    with worker_app.app_context():
+        db.create_all()
+        movies_data_manager.add_movie_for_enrichment('Broken')
+        movies_data_manager.add_movie_for_enrichment('Inception')
+        db.session.remove()
+
+        queue.start()
+        deadline = time.time() + 5
+        while movies_data_manager.get_movie(2)['enrichment_status'] != 'done' and time.time() < deadline:
+            db.session.remove()
+            time.sleep(0.05)
+        queue._poll_interval = 3600  # park the worker, the thread cannot be stopped
+        assert movies_data_manager.get_movie(1)['enrichment_status'] == 'pending'
+        assert movies_data_manager.get_movie(2)['enrichment_status'] == 'done'
+        assert queue._threads[0].is_alive()
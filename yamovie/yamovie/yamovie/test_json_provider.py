@@ -0,0 +1,97 @@
+import datetime
+import json
+
+from flask import Flask, g
+from flask.json.provider import DefaultJSONProvider
+
+from api import api
+from json_provider import OrjsonProvider
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from data_manager.movies import Movies
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+app.config['BULK_CHUNK_SIZE'] = 1000
+db.init_app(app)
+app.register_blueprint(api, url_prefix='/api')
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+users_movies_data_manager = UsersMovies(SQLiteDataManager('id', UserMovie, db))
+movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
+
+
+@app.before_request
+def before_request():
+    g.users_data_manager = users_data_manager
+    g.movies_data_manager = movies_data_manager
+    g.users_movies_data_manager = users_movies_data_manager
+    g.movies_reviews_data_manager = movies_reviews_data_manager
+
+
+def create_test_data(movies: int):
+    db.drop_all()
+    db.create_all()
+    users_data_manager.add_user({'user_name': 'User', 'movies': []})
+    movies_data_manager.add_new_movies([{'movie_name': f'Фильм {number}', 'director': '', 'year': 2000,
+                                         'rating': float(number % 10), 'poster': '', 'website': ''}
+                                        for number in range(1, movies + 1)])
+    users_movies_data_manager.add_user_movie({'user_id': 1, 'movie_id': 1})
+
+
+def test_orjson_provider_matches_stdlib_output():
+    data = {'b': [1, 2.5, None, 'Фильм'], 'a': {'date': datetime.date(2024, 1, 2)}}
+    stdlib_provider = DefaultJSONProvider(app)
+    assert json.loads(app.json.dumps(data)) == json.loads(stdlib_provider.dumps(data))
+    assert json.loads(app.json.dumps(data))['a']['date'] == 'Tue, 02 Jan 2024 00:00:00 GMT'
+    assert app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+    assert app.json.loads(b'{"a": [1]}') == {'a': [1]}
+
+
+def test_streamed_movies_equal_all_pages():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data(7)
+        pages, url = [], '/api/movies?limit=3'
+        while url:
+            response = client.get(url)
+            pages.extend(response.json)
+            url = response.headers.get('X-Next-Cursor') and f"/api/movies?limit=3&after={response.headers['X-Next-Cursor']}"
+        response = client.get('/api/movies?limit=3&stream=1')
+        is_streamed = response.is_streamed
+        streamed_movies = json.loads(response.get_data())
+    assert is_streamed
+    assert 'X-Next-Cursor' not in response.headers
+    assert streamed_movies == pages
+    assert len(pages) == 7
+
+
+def test_stream_follows_sort_and_starts_at_cursor():
+    client = app.test_client()
+    with app.app_context():
+        create_test_data(12)
+        expected = client.get('/api/movies?sort=-rating&limit=100&reviews=false').json
+        first_page = client.get('/api/movies?sort=-rating&limit=4&reviews=false')
+        response = client.get(f"/api/movies?sort=-rating&limit=4&reviews=false&stream=1"
+                              f"&after={first_page.headers['X-Next-Cursor']}")
+        streamed_movies = json.loads(response.get_data())
+    assert streamed_movies == expected[4:]
+
+
+def test_stream_with_stdlib_provider_and_empty_result():
+    client = app.test_client()
+    app.json = DefaultJSONProvider(app)
+    try:
+        with app.app_context():
+            create_test_data(3)
+            movies = json.loads(client.get('/api/users/1/movies?stream=1&limit=1').get_data())
+            no_movies = client.get('/api/movies?stream=1&year_from=3000').get_data()
+    finally:
+        app.json = OrjsonProvider(app)
+    assert [movie['movie_name'] for movie in movies] == ['Фильм 1']
+    assert no_movies == b'[]\n'
@@ -0,0 +1,102 @@
+import json
+import os
+
+from flask import Flask, abort
+
+from data_manager.data_models import Movie, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from metrics import MetricsRegistry, RequestMetrics
+from page_cache import PageCache, LRUPageCacheBackend
+from query_stats import QueryMonitor
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+page_cache = PageCache(LRUPageCacheBackend(10))
+
+with app.app_context():
+    QueryMonitor(budget=10, max_repeats=3).init_app(app, db.engine)
+request_metrics = RequestMetrics(MetricsRegistry())
+request_metrics.init_app(app, page_cache=page_cache)
+
+
+@app.route('/movies/<int:movie_id>')
+def get_movie(movie_id: int):
+    movie = movies_data_manager.get_movie(movie_id)
+    if movie is None:
+        abort(404)
+    return movie
+
+
+def sample_lines(text: str, name: str) -> list:
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_requests_are_counted_by_route_and_status():
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Movie(id=1, movie_name='Movie'))
+        db.session.commit()
+        client.get('/movies/1')
+        client.get('/movies/1')
+        client.get('/movies/2')
+        text = client.get('/metrics').get_data(as_text=True)
+    assert 'yamovie_http_requests_total{blueprint="app",method="GET",route="/movies/<int:movie_id>",' \
+           'status="200"} 2' in text
+    assert 'yamovie_http_requests_total{blueprint="app",method="GET",route="/movies/<int:movie_id>",' \
+           'status="404"} 1' in text
+    assert 'yamovie_http_request_duration_seconds_count{blueprint="app",route="/movies/<int:movie_id>"} 3' in text
+    assert 'yamovie_http_request_duration_seconds_bucket{blueprint="app",route="/movies/<int:movie_id>",' \
+           'le="+Inf"} 3' in text
+    assert 'yamovie_db_queries_total{blueprint="app",route="/movies/<int:movie_id>"} 3' in text
+    # the /metrics request itself is in flight
+    assert 'yamovie_http_requests_in_flight 1' in text
+
+
+def test_cache_counters_and_hit_ratio():
+    page_cache.render('key', ('movies',), lambda: 'page')
+    page_cache.render('key', ('movies',), lambda: 'page')
+    text = request_metrics.registry.render()
+    assert 'yamovie_page_cache_hits_total 1' in text
+    assert 'yamovie_page_cache_misses_total 1' in text
+    assert 'yamovie_page_cache_hit_ratio 0.5' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        registry.observe('latency_seconds', value, {'route': '/'})
+    assert sample_lines(registry.render(), 'latency_seconds') == [
+        'latency_seconds_bucket{route="/",le="0.1"} 1',
+        'latency_seconds_bucket{route="/",le="1"} 3',
+        'latency_seconds_bucket{route="/",le="+Inf"} 4',
+        'latency_seconds_sum{route="/"} 6.25',
+        'latency_seconds_count{route="/"} 4']
+
+
+def test_processes_of_one_server_are_summed(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter('requests_total', 'Requests')
+    registry.gauge('in_flight', 'In flight')
+    registry.inc('requests_total', amount=2)
+    registry.set('in_flight', 1)
+
+    def write_snapshot(pid: int, ppid: int):
+        samples = [['requests_total', [], 5], ['in_flight', [], 3]]
+        with open(tmp_path / f'{pid}.json', 'w', encoding='utf-8') as snapshot_file:
+            json.dump({'pid': pid, 'ppid': ppid, 'samples': samples}, snapshot_file)
+
+    exited_pid = 2 ** 22 + 1  # above the kernel pid limit, never alive
+    write_snapshot(os.getppid(), os.getppid())  # stands in for a running sibling worker
+    write_snapshot(exited_pid, os.getppid())
+    write_snapshot(exited_pid + 1, os.getppid() + 1)
+    text = registry.render()
+    # the exited worker keeps its counter but not its gauge
+    assert 'requests_total 12' in text
+    assert 'in_flight 4' in text
+    assert not (tmp_path / f'{exited_pid + 1}.json').exists()
@@ -0,0 +1,66 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from flask import Flask
+
+from data_manager.data_models import Movie, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from movie_import import import_movies
+from omdb_client import OMDbClient
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+
+
+class StubOMDbHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        title = parse_qs(urlparse(self.path).query)['t'][0]
+        if title.startswith('Unknown'):
+            movie = {'Response': 'False', 'Error': 'Movie not found!'}
+        else:
+            movie = {'Response': 'True', 'Title': title, 'Director': 'Director', 'Year': '2010–2012',
+                     'imdbRating': 'N/A', 'Poster': 'N/A', 'imdbID': 'tt0000001'}
+        body = json.dumps(movie).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def omdb_client():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOMDbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield OMDbClient(f'http://127.0.0.1:{server.server_port}/', 'test-key')
+    server.shutdown()
+
+
+def test_import_movies_adds_found_titles(omdb_client):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        report = import_movies(omdb_client, movies_data_manager, ['Alpha', 'Unknown', 'Beta'])
+        movies = movies_data_manager.get_movies()
+    assert report == {'succeeded': 2, 'failed': [{'index': 1, 'error': 'Movie not found!'}]}
+    assert [(movie['movie_name'], movie['year'], movie['rating'], movie['poster']) for movie in movies] == \
+           [('Alpha', 2010, 0.0, ''), ('Beta', 2010, 0.0, '')]
+
+
+def test_import_movies_reports_duplicates_by_title_index(omdb_client):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        import_movies(omdb_client, movies_data_manager, ['Alpha'])
+        report = import_movies(omdb_client, movies_data_manager, ['Unknown', 'Beta', 'Alpha'])
+    assert report['succeeded'] == 1
+    assert [failure['index'] for failure in report['failed']] == [0, 2]
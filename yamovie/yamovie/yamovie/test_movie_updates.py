@@ -0,0 +1,60 @@
+import pytest
+from flask import Flask, g
+
+from api import api
+from data_manager.data_models import Movie, db
+from data_manager.movies import Movies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+app.register_blueprint(api, url_prefix='/api')
+
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+
+
+@app.before_request
+def before_request():
+    g.movies_data_manager = movies_data_manager
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        movies_data_manager.add_new_movies([{'movie_name': 'Movie', 'director': 'Director', 'year': 1990,
+                                             'rating': 7.0, 'poster': '', 'website': ''}])
+        yield app.test_client()
+
+
+def updated_movie() -> tuple:
+    movie = movies_data_manager.get_movie(1, include_reviews=False)
+    return movie['movie_name'], movie['director'], movie['year'], movie['rating']
+
+
+@pytest.mark.parametrize('year, rating', [(2000, 5), ('2000', '5'), (2000, 5.5)])
+def test_update_accepts_json_numbers_and_strings(client, year, rating):
+    response = client.patch('/api/movies/update_movie/1', json={'movie_name': 'Renamed', 'director': 'Someone',
+                                                                'year': year, 'rating': rating})
+    assert response.status_code == 201
+    assert updated_movie() == ('Renamed', 'Someone', 2000, float(rating))
+
+
+def test_update_without_year_and_rating_resets_them(client):
+    response = client.patch('/api/movies/update_movie/1', json={'movie_name': 'Renamed'})
+    assert response.status_code == 201
+    assert updated_movie() == ('Renamed', '', 0, 0.0)
+
+
+@pytest.mark.parametrize('json, error_message', [
+    ({'movie_name': 'Renamed', 'year': 20000}, 'Год должен иметь 4 цифры'),
+    ({'movie_name': 'Renamed', 'year': 'soon'}, 'Год должен быть числом'),
+    ({'movie_name': 'Renamed', 'rating': 11}, 'Рейтинг должен быть между 1 и 10'),
+    ({'movie_name': ''}, 'Название фильма не может быть пустым'),
+])
+def test_update_rejects_invalid_values(client, json, error_message):
+    response = client.patch('/api/movies/update_movie/1', json=json)
+    assert response.status_code == 400 and error_message in response.json['error_message']
+    assert updated_movie() == ('Movie', 'Director', 1990, 7.0)
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+
+from omdb_client import OMDbClient, OMDbCache
+
+KNOWN_MOVIES = {'inception': {'Response': 'True', 'Title': 'Inception', 'Year': '2010'}}
+
+
+class StubOMDbHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    requested_titles = []
+    connections = 0
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        StubOMDbHandler.connections += 1
+
+    def do_GET(self):
+        title = parse_qs(urlparse(self.path).query)['t'][0]
+        self.requested_titles.append(title)
+        time.sleep(self.delay if title != 'slow' else 1)
+        if title == 'broken':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        movie = KNOWN_MOVIES.get(title.lower(), {'Response': 'False', 'Error': 'Movie not found!'})
+        body = json.dumps(movie).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def stub_server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOMDbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+
+
+@pytest.fixture
+def cache_path(tmp_path) -> str:
+    return str(tmp_path / 'omdb_cache.sqlite')
+
+
+def create_client(cache_path: str, base_url: str, ttl: int = 60, negative_ttl: int = 60, max_entries: int = 10,
+                  **client_options) -> OMDbClient:
+    StubOMDbHandler.requested_titles.clear()
+    StubOMDbHandler.connections = 0
+    StubOMDbHandler.delay = 0.0
+    cache = OMDbCache(cache_path, ttl=ttl, negative_ttl=negative_ttl, max_entries=max_entries)
+    return OMDbClient(base_url, 'test-key', cache, **client_options)
+
+
+def test_repeated_lookup_is_served_from_cache(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url)
+    assert client.fetch_movie('Inception')['Title'] == 'Inception'
+    assert client.fetch_movie('  inception ')['Title'] == 'Inception'
+    assert StubOMDbHandler.requested_titles == ['Inception']
+    assert client.cache.stats()['hits'] == 1
+
+
+def test_cache_survives_new_client(stub_server_url, cache_path):
+    create_client(cache_path, stub_server_url).fetch_movie('Inception')
+    cache = OMDbCache(cache_path, ttl=60, negative_ttl=60, max_entries=10)
+    assert OMDbClient(stub_server_url, 'test-key', cache).fetch_movie('Inception')['Year'] == '2010'
+    assert StubOMDbHandler.requested_titles == ['Inception']
+
+
+def test_negative_result_is_cached(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url)
+    assert client.fetch_movie('Unknown movie')['Response'] == 'False'
+    assert client.fetch_movie('Unknown movie')['Response'] == 'False'
+    assert StubOMDbHandler.requested_titles == ['Unknown movie']
+    assert client.cache.stats()['negative_entries'] == 1
+
+
+def test_request_error_is_not_cached(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.fetch_movie('broken')
+    assert StubOMDbHandler.requested_titles == ['broken', 'broken']
+    assert client.cache.stats()['entries'] == 0
+
+
+def test_expired_entry_is_fetched_again(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url, negative_ttl=0)
+    client.fetch_movie('Inception')
+    client.fetch_movie('Unknown movie')
+    time.sleep(0.01)
+    client.fetch_movie('Inception')
+    client.fetch_movie('Unknown movie')
+    assert StubOMDbHandler.requested_titles == ['Inception', 'Unknown movie', 'Unknown movie']
+
+
+def test_least_recently_used_entry_is_evicted(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url, max_entries=2)
+    client.fetch_movie('first')
+    client.fetch_movie('second')
+    client.fetch_movie('first')
+    client.fetch_movie('third')
+    assert client.cache.stats()['entries'] == 2
+    client.fetch_movie('first')
+    client.fetch_movie('second')
+    assert StubOMDbHandler.requested_titles == ['first', 'second', 'third', 'second']
+
+
+def test_eviction_runs_only_above_max_entries(cache_path):
+    cache = OMDbCache(cache_path, ttl=60, negative_ttl=0, max_entries=20)
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+    cache.set('expired', {'Response': 'False'}, negative=True)
+    for number in range(19):
+        cache.set(f'movie {number}', {'Response': 'True'})
+    assert not [statement for statement in statements if 'DELETE' in statement or 'COUNT' in statement]
+
+    cache.set('movie 19', {'Response': 'True'})
+    # the expired entry and then the two least recently used ones are evicted
+    assert cache.stats()['entries'] == 18
+    assert cache.get('movie 0') is None and cache.get('movie 1') is None and cache.get('movie 2')
+    statements.clear()
+    cache.set('movie 20', {'Response': 'True'})
+    assert len(statements) == 3  # BEGIN, INSERT, COMMIT
+
+
+def test_fetch_movies_runs_lookups_concurrently(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url, max_entries=100, max_workers=8)
+    StubOMDbHandler.delay = 0.05
+    titles = [f'Movie {number}' for number in range(32)]
+    started = time.perf_counter()
+    report = client.fetch_movies(titles)
+    elapsed = time.perf_counter() - started
+    assert [movie['index'] for movie in report['movies']] == list(range(32))
+    assert elapsed < len(titles) * StubOMDbHandler.delay / 2
+
+
+def test_fetch_movies_reuses_pooled_connections(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url, max_entries=100, max_workers=4)
+    client.fetch_movies([f'Movie {number}' for number in range(40)])
+    assert len(StubOMDbHandler.requested_titles) == 40
+    assert StubOMDbHandler.connections <= 4
+
+
+def test_fetch_movies_reports_failed_titles(stub_server_url, cache_path):
+    client = create_client(cache_path, stub_server_url, timeout=0.2)
+    report = client.fetch_movies(['Inception', 'slow', 'broken'])
+    assert [movie['index'] for movie in report['movies']] == [0]
+    assert [failure['index'] for failure in report['failed']] == [1, 2]
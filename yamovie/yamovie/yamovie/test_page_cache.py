@@ -0,0 +1,91 @@
+from flask import Flask, g
+
+from data_manager.data_models import User, db
+from data_manager.users import Users
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from page_cache import PageCache, LRUPageCacheBackend, FilePageCacheBackend, cached_page
+
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+page_cache = PageCache(LRUPageCacheBackend(2))
+users_data_manager.add_write_listener(page_cache.invalidate)
+renders = []
+
+
+@app.before_request
+def before_request():
+    g.page_cache = page_cache
+
+
+@app.route('/users')
+@cached_page('users')
+def list_users():
+    renders.append(1)
+    return ', '.join(user['user_name'] for user in users_data_manager.get_all_users())
+
+
+def test_page_is_rendered_once_until_a_write():
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users_data_manager.add_user({'user_name': 'Alice', 'movies': []})
+        renders.clear()
+        assert client.get('/users').text == 'Alice'
+        assert client.get('/users').text == 'Alice'
+        assert len(renders) == 1
+
+        users_data_manager.add_user({'user_name': 'Bob', 'movies': []})
+        assert client.get('/users').text == 'Alice, Bob'
+        assert len(renders) == 2
+
+
+def test_failed_write_keeps_cached_page():
+    client = app.test_client()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        client.get('/users?limit=5')
+        renders.clear()
+        assert users_data_manager.add_user({'user_name': 'No movies key'}) is None
+        client.get('/users?limit=5')
+    assert renders == []
+
+
+def test_lru_backend_evicts_least_recently_used_page():
+    cache = PageCache(LRUPageCacheBackend(2))
+    for key in ('first', 'second', 'first', 'third'):
+        cache.render(key, ['users'], lambda: key)
+    assert cache.get_page('first', ['users']) == 'first'
+    assert cache.get_page('second', ['users']) is None
+    assert cache.stats()['hits'] == 2
+
+
+def test_stats_count_saved_render_time():
+    cache = PageCache(LRUPageCacheBackend(2))
+    cache.render('page', ['users'], lambda: 'body')
+    cache.render('page', ['users'], lambda: 'body')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_ratio']) == (1, 1, 0.5)
+    assert stats['render_seconds_saved'] > 0
+
+
+def test_file_backend_shares_invalidations_between_processes(tmp_path):
+    first_process = PageCache(FilePageCacheBackend(str(tmp_path), 10))
+    second_process = PageCache(FilePageCacheBackend(str(tmp_path), 10))
+
+    first_process.render('page', ['movies'], lambda: 'old')
+    assert second_process.get_page('page', ['movies']) == 'old'
+    second_process.invalidate(['movies'])
+    assert first_process.get_page('page', ['movies']) is None
+
+
+def test_file_backend_evicts_above_max_entries(tmp_path):
+    cache = PageCache(FilePageCacheBackend(str(tmp_path), 2))
+    for key in ('first', 'second', 'third'):
+        cache.render(key, ['movies'], lambda: key)
+    assert sum(cache.get_page(key, ['movies']) is not None for key in ('first', 'second', 'third')) == 2
@@ -0,0 +1,65 @@
+import pytest
+from flask import Flask, g
+
+from admin import admin_bp
+from profiler import RequestProfiler
+
+app = Flask(__name__)
+app.register_blueprint(admin_bp, url_prefix='/admin')
+
+
+@app.route('/movies/<int:movie_id>')
+def get_movie(movie_id: int):
+    return {'id': movie_id, 'total': sum(range(10000))}
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), enabled=True, token='secret', max_profiles=2)
+    # hooks registered once per test app would pile up, so they are called here
+    app.before_request_funcs[None] = [profiler._start, lambda: setattr(g, 'profiler', profiler)]
+    app.after_request_funcs[None] = [profiler._save]
+    app.teardown_request_funcs[None] = [profiler._stop]
+    yield profiler
+
+
+def test_only_requests_with_the_token_are_profiled(profiler, tmp_path):
+    client = app.test_client()
+    assert 'X-Profile-Id' not in client.get('/movies/1').headers
+    assert 'X-Profile-Id' not in client.get('/movies/1?profile=1').headers
+    profile_id = client.get('/movies/1', headers={'X-Profile': 'secret'}).headers['X-Profile-Id']
+    assert '_GET_movies-int-movie-id_200_' in profile_id
+    assert (tmp_path / f'{profile_id}.prof').exists()
+
+
+def test_oldest_profiles_are_removed(profiler, tmp_path):
+    client = app.test_client()
+    profile_ids = [client.get(f'/movies/{movie_id}?profile=secret').headers['X-Profile-Id']
+                   for movie_id in range(3)]
+    assert sorted(path.stem for path in tmp_path.iterdir()) == profile_ids[1:]
+
+
+def test_admin_lists_slowest_profiles_with_hot_spots(profiler):
+    client = app.test_client()
+    profile_id = client.get('/movies/1?profile=secret').headers['X-Profile-Id']
+    assert client.get('/admin/profiles').status_code == 403
+    profiles = client.get('/admin/profiles?token=secret').get_json()
+    assert [profile['id'] for profile in profiles] == [profile_id]
+    assert profiles[0]['route'] == 'movies-int-movie-id' and profiles[0]['status'] == 200
+    assert any('get_movie' in hot_spot['function'] for hot_spot in profiles[0]['hot_spots'])
+
+    report = client.get(f'/admin/profiles/{profile_id}?sort=tottime', headers={'X-Profile': 'secret'})
+    assert report.mimetype == 'text/plain' and 'function calls' in report.get_data(as_text=True)
+    download = client.get(f'/admin/profiles/{profile_id}/download?token=secret')
+    assert download.status_code == 200 and download.get_data()
+    download.close()
+    assert client.get('/admin/profiles/../secret?token=secret').status_code == 404
+    assert client.get(f'/admin/profiles/{profile_id}?token=secret&sort=name').status_code == 400
+
+
+def test_admin_is_not_found_when_profiling_is_disabled(tmp_path):
+    profiler = RequestProfiler(str(tmp_path))
+    app.before_request_funcs[None] = [lambda: setattr(g, 'profiler', profiler)]
+    app.after_request_funcs[None] = []
+    app.teardown_request_funcs[None] = []
+    assert app.test_client().get('/admin/profiles?profile=1').status_code == 404
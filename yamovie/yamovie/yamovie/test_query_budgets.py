@@ -0,0 +1,114 @@
+import logging
+
+import pytest
+from flask import Flask, g
+
+from api import api
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, db
+from data_manager.movies import Movies
+from data_manager.movies_reviews import MoviesReviews
+from data_manager.users import Users
+from data_manager.users_movies import UsersMovies
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from enrichment import EnrichmentQueue
+from omdb_client import OMDbClient
+from query_stats import QueryMonitor, statement_shape
+from recommendations import RecommendationEngine
+
+ROWS = 20
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+app.config['BULK_CHUNK_SIZE'] = 1000
+db.init_app(app)
+app.register_blueprint(api, url_prefix='/api')
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+movies_data_manager = Movies(SQLiteDataManager('id', Movie, db))
+users_movies_data_manager = UsersMovies(SQLiteDataManager('id', UserMovie, db))
+movies_reviews_data_manager = MoviesReviews(SQLiteDataManager('id', MovieReview, db))
+enrichment_queue = EnrichmentQueue(app, OMDbClient('http://127.0.0.1:9/', 'key'), workers=0)
+recommendation_engine = RecommendationEngine(app, refresh_interval=0)
+
+with app.app_context():
+    QueryMonitor(budget=10, max_repeats=3, headers=True).init_app(app, db.engine)
+
+
+@app.route('/n_plus_one')
+def n_plus_one():
+    for user_id in range(1, 6):
+        users_data_manager.has_user(user_id)
+    return ''
+
+
+@app.before_request
+def before_request():
+    g.users_data_manager = users_data_manager
+    g.movies_data_manager = movies_data_manager
+    g.users_movies_data_manager = users_movies_data_manager
+    g.movies_reviews_data_manager = movies_reviews_data_manager
+    g.enrichment_queue = enrichment_queue
+    g.recommendation_engine = recommendation_engine
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(User(id=number, user_name=f'User {number}') for number in range(1, ROWS + 1))
+        db.session.add_all(Movie(id=number, movie_name=f'Movie {number}') for number in range(1, ROWS + 1))
+        db.session.flush()
+        db.session.add_all(UserMovie(user_id=user_id, movie_id=movie_id)
+                           for user_id in range(1, ROWS + 1) for movie_id in range(1, 6))
+        db.session.add_all(MovieReview(user_id=user_id, movie_id=1, rating=5.0, review_text='')
+                           for user_id in range(2, ROWS + 1))
+        db.session.commit()
+        db.session.expunge_all()
+        recommendation_engine.rebuild()
+        yield app.test_client()
+
+
+@pytest.mark.parametrize('method, url, json, max_queries', [
+    ('GET', '/api/users', None, 2),
+    ('GET', '/api/users?stream=1&limit=10', None, 3),
+    ('POST', '/api/users', {'user_name': 'New'}, 3),
+    ('GET', '/api/users/1/movies', None, 3),
+    ('POST', '/api/users/1/movies/6', None, 4),
+    ('POST', '/api/users/1/movies/bulk', {'movie_ids': list(range(6, ROWS + 1))}, 4),
+    ('DELETE', '/api/users/movies/1', None, 5),
+    ('GET', '/api/movies', None, 2),
+    ('GET', '/api/movies?reviews=false&sort=-rating', None, 2),
+    ('POST', '/api/movies/add_movie', {'movie_name': 'New'}, 3),
+    ('POST', '/api/movies/bulk', {'movies': [{'movie_name': f'New {number}'} for number in range(ROWS)]}, 3),
+    ('PATCH', '/api/movies/update_movie/2', {'movie_name': 'Renamed', 'director': '', 'year': '2000',
+                                             'rating': '5'}, 5),
+    ('DELETE', '/api/movies/delete_movie/20', None, 8),
+    ('GET', '/api/movies/1/reviews', None, 3),
+    ('GET', '/api/users/2/reviews', None, 3),
+    ('GET', '/api/users/1/recommendations', None, 3),
+    ('POST', '/api/users/1/add_movie_review/2', {'rating': 4.0, 'review_text': 'Good'}, 8),
+])
+def test_api_route_query_budget(client, query_budget, method, url, json, max_queries):
+    with query_budget(max_queries):
+        response = client.open(url, method=method, json=json)
+        response.get_data()  # a streamed body reads its pages here
+    assert response.status_code < 400
+
+
+def test_statement_shape_collapses_literals_and_in_lists():
+    assert statement_shape("SELECT * FROM movies WHERE id IN (?, ?, ?) AND name = 'A'") == \
+        statement_shape("SELECT * FROM movies WHERE id IN (?)\n AND name = 'B'")
+    assert statement_shape('SELECT users_1.id FROM users AS users_1 LIMIT 10') == \
+        'SELECT users_1.id FROM users AS users_1 LIMIT ?'
+
+
+def test_monitor_sends_counts_and_warns_about_repeated_queries(client, caplog):
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = client.get('/n_plus_one')
+        client.get('/api/movies')
+    assert response.headers['X-Query-Count'] == '5'
+    assert float(response.headers['X-Query-Time']) >= 0
+    assert [record.getMessage() for record in caplog.records
+            if 'possible N+1' in record.getMessage() and '/n_plus_one' in record.getMessage()]
+    assert not [record for record in caplog.records if '/api/movies' in record.getMessage()]
@@ -0,0 +1,186 @@
+import math
+import os
+import random
+
+import pytest
+from flask import Flask, g
+from sqlalchemy import select, text
+
+import recommendations
+from api import api
+from data_manager.data_models import User, Movie, UserMovie, MovieReview, MovieNeighbour, db
+from data_manager.sqlite_data_manager import SQLiteDataManager
+from data_manager.users import Users
+from query_stats import recorded_queries
+from recommendations import RecommendationEngine, python_cosine_rows
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+app.register_blueprint(api, url_prefix='/api')
+
+users_data_manager = Users(SQLiteDataManager('id', User, db))
+engine = RecommendationEngine(app, top_k=3, batch_size=7, refresh_interval=0)
+
+
+@app.before_request
+def before_request():
+    g.users_data_manager = users_data_manager
+    g.recommendation_engine = engine
+
+
+def create_test_data(users: int, movies: int, favourites: dict, ratings: dict | None = None):
+    """favourites: user_id -> movie ids, ratings: (user_id, movie_id) -> review rating"""
+    db.drop_all()
+    db.create_all()
+    db.session.add_all(User(id=number, user_name=f'User {number}') for number in range(1, users + 1))
+    db.session.add_all(Movie(id=number, movie_name=f'Movie {number}') for number in range(1, movies + 1))
+    db.session.flush()
+    db.session.add_all(UserMovie(user_id=user_id, movie_id=movie_id)
+                       for user_id, movie_ids in favourites.items() for movie_id in movie_ids)
+    db.session.add_all(MovieReview(user_id=user_id, movie_id=movie_id, rating=rating, review_text='')
+                       for (user_id, movie_id), rating in (ratings or {}).items())
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def expected_neighbours(favourites: dict, ratings: dict, top_k: int) -> dict:
+    """The neighbour lists from the definition, over dense columns"""
+    columns = {}
+    for user_id, movie_ids in favourites.items():
+        for movie_id in movie_ids:
+            rating = ratings.get((user_id, movie_id))
+            columns.setdefault(movie_id, {})[user_id] = 1.0 if rating is None else 0.5 + rating / 10
+    norms = {movie_id: math.sqrt(sum(weight * weight for weight in column.values()))
+             for movie_id, column in columns.items()}
+    lists = {}
+    for movie_id, column in columns.items():
+        scores = [(other_id, sum(weight * other_column.get(user_id, 0.0) for user_id, weight in column.items())
+                   / (norms[movie_id] * norms[other_id]))
+                  for other_id, other_column in columns.items() if other_id != movie_id]
+        ranked = sorted((pair for pair in scores if pair[1] > 0), key=lambda pair: (-pair[1], pair[0]))[:top_k]
+        if ranked:
+            lists[movie_id] = ranked
+    return lists
+
+
+def stored_neighbours() -> dict:
+    neighbours = MovieNeighbour.__table__
+    lists = {}
+    for movie_id, neighbour_id, score in db.session.execute(
+            select(neighbours.c.movie_id, neighbours.c.neighbour_id, neighbours.c.score).
+            order_by(neighbours.c.movie_id, neighbours.c.score.desc(), neighbours.c.neighbour_id)):
+        lists.setdefault(movie_id, []).append((neighbour_id, pytest.approx(score)))
+    return lists
+
+
+FAVOURITES = {1: [1, 2, 3], 2: [1, 2], 3: [2, 3, 4], 4: [5], 5: [1, 4, 6]}
+RATINGS = {(1, 1): 10.0, (3, 4): 2.0}
+
+
+def test_rebuild_stores_the_top_k_cosine_neighbours():
+    with app.app_context():
+        create_test_data(6, 8, FAVOURITES, RATINGS)
+        report = engine.rebuild()
+        assert report['written'] and report['movies'] == 6 and report['interactions'] == 12
+        assert set(report['timings']) == {'load', 'similarity', 'write', 'total'}
+        assert stored_neighbours() == expected_neighbours(FAVOURITES, RATINGS, top_k=3)
+        assert engine.status()['stale_movies'] == 0
+
+
+def test_refresh_gives_the_same_neighbours_as_a_rebuild():
+    rng = random.Random(3)
+    favourites = {user_id: rng.sample(range(1, 31), rng.randint(1, 8)) for user_id in range(1, 21)}
+    ratings = {(user_id, movie_ids[0]): rng.choice([3.0, 7.0, 9.0]) for user_id, movie_ids in favourites.items()}
+    with app.app_context():
+        create_test_data(20, 30, favourites, ratings)
+        assert engine.refresh()['mode'] == 'rebuild'  # nothing was built yet
+        for _ in range(5):
+            for _ in range(3):
+                user_id, movie_id = rng.randint(1, 20), rng.randint(1, 30)
+                if movie_id in favourites[user_id]:
+                    favourites[user_id].remove(movie_id)
+                    db.session.execute(text('DELETE FROM users_movies WHERE user_id = :user_id AND movie_id = :movie_id'),
+                                       {'user_id': user_id, 'movie_id': movie_id})
+                else:
+                    favourites[user_id].append(movie_id)
+                    db.session.add(UserMovie(user_id=user_id, movie_id=movie_id))
+            db.session.commit()
+            report = engine.refresh()
+            assert report['mode'] == 'refresh' and report['written']
+            assert stored_neighbours() == expected_neighbours(favourites, ratings, top_k=3)
+        assert engine.status()['stale_movies'] == 0
+
+
+def test_reviews_queue_their_movie():
+    with app.app_context():
+        create_test_data(6, 8, FAVOURITES)
+        engine.rebuild()
+        db.session.add(MovieReview(user_id=3, movie_id=4, rating=2.0, review_text=''))
+        db.session.commit()
+        assert engine.status()['stale_movies'] == 1
+        assert engine.refresh()['stale_movies'] == 1
+        assert stored_neighbours() == expected_neighbours(FAVOURITES, {(3, 4): 2.0}, top_k=3)
+
+
+def test_results_of_an_older_computation_are_not_written():
+    with app.app_context():
+        create_test_data(6, 8, FAVOURITES)
+        engine.rebuild()
+        version = db.session.execute(text("SELECT version FROM table_versions "
+                                          "WHERE table_name = 'movie_neighbours'")).scalar()
+        # another process rebuilt while this one was computing
+        engine.rebuild()
+        assert engine._write({1: []}, version, 0) is None
+        assert stored_neighbours() == expected_neighbours(FAVOURITES, {}, top_k=3)
+
+
+def test_recommendations_are_one_query_and_skip_favourites():
+    with app.app_context():
+        create_test_data(6, 8, FAVOURITES, RATINGS)
+        engine.rebuild()
+        with recorded_queries(db.engine) as stats:
+            movies = engine.recommend_movies(2, 10)
+        assert stats.count == 1
+        lists = expected_neighbours(FAVOURITES, RATINGS, top_k=3)
+        scores = {}
+        for movie_id in FAVOURITES[2]:
+            for neighbour_id, score in lists.get(movie_id, []):
+                if neighbour_id not in FAVOURITES[2]:
+                    scores[neighbour_id] = scores.get(neighbour_id, 0.0) + score
+        assert [(movie['id'], movie['score']) for movie in movies] == [
+            (movie_id, pytest.approx(score)) for movie_id, score in sorted(scores.items(),
+                                                                           key=lambda pair: (-pair[1], pair[0]))]
+        assert set(movies[0]) == {*recommendations.RECOMMENDATION_COLUMNS, 'score'}
+
+
+def test_recommendations_api():
+    with app.app_context():
+        create_test_data(6, 8, FAVOURITES)
+        engine.rebuild()
+        client = app.test_client()
+        response = client.get('/api/users/2/recommendations?limit=1')
+        assert response.status_code == 200 and [movie['id'] for movie in response.json] == [3]
+        assert client.get('/api/users/6/recommendations').json == []
+        assert client.get('/api/users/99/recommendations').status_code == 404
+        assert client.get('/api/recommendations/status').json['top_k'] == 3
+
+
+def test_numpy_rows_match_the_python_rows():
+    if recommendations.sparse is None:
+        # the CI workflow installs numpy and scipy, a skip there would hide the NumPy engine
+        assert not os.environ.get('CI'), 'numpy and scipy are not installed'
+        pytest.skip('numpy and scipy are not installed')
+    rng = random.Random(5)
+    interactions = [(user_id, movie_id, rng.choice([1.0, 0.7, 1.5]))
+                    for user_id in range(1, 50) for movie_id in rng.sample(range(1, 80), rng.randint(1, 10))]
+    norms = {}
+    for _, movie_id, weight in interactions:
+        norms[movie_id] = norms.get(movie_id, 0.0) + weight * weight
+    norms = {movie_id: math.sqrt(squares) for movie_id, squares in norms.items()}
+    movie_ids = list(range(1, 85))
+    for k in (None, 5):
+        numpy_rows = dict(recommendations.numpy_cosine_rows(interactions, movie_ids, norms, k, 16))
+        python_rows = dict(python_cosine_rows(interactions, movie_ids, norms, k, 16))
+        assert {movie_id: [(neighbour_id, pytest.approx(score)) for neighbour_id, score in row]
+                for movie_id, row in python_rows.items()} == numpy_rows
@@ -1,33 +1,35 @@
 from flask import Blueprint, render_template, request, redirect, url_for, abort, g
 
+from pagination import get_page_args, next_page_url
+from page_cache import cached_page
+
 users_bp = Blueprint('users', __name__)
 
 
 @users_bp.route('/users', methods=['GET'])
+@cached_page('users')
 def list_users():
-    users = g.users_data_manager.get_all_users()
-    if users is None:
+    users_page = g.users_data_manager.get_users_page(*get_page_args())
+    if users_page is None:
         abort(404)
-    return render_template('users.html', users=users)
+    users, next_cursor = users_page
+    return render_template('users.html',
+                           users=users,
+                           next_page_url=next_page_url(next_cursor))
 
 
 @users_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user_movies(user_id: int):
     user = g.users_data_manager.get_user(user_id)
-
-    movies = g.movies_data_manager.get_movies()
-    un_favourite_movies = []
-
-    for movie in movies:
-        if movie['id'] not in \
-                [user_movie['id'] for user_movie in user['movies']]:
-            un_favourite_movies.append(movie)
-
     if user is None:
         abort(404)
+
+    movies, next_cursor = g.movies_data_manager.get_candidate_movies_page(user_id,
+                                                                          *get_page_args()) or ([], None)
     return render_template('user_movies.html',
                            user=user,
-                           movies=un_favourite_movies)
+                           movies=movies,
+                           next_page_url=next_page_url(next_cursor))
 
 
 def validate_user_input(user_info: dict) -> list:
@@ -53,7 +55,7 @@ def add_user():
         new_user = {"user_name": user_name,
                     "movies": []}
 
-        if g.users_data_manager.add_user(new_user) is None:
+        if not g.users_data_manager.add_user(new_user):
             abort(400, ['Неверные данные пользователя'])
         return redirect(url_for('users.list_users'))
 
@@ -110,7 +112,10 @@ def add_user_movie(user_id: int, movie_id: int):
         'user_id': user_id,
         'movie_id': movie_id
     }
-    if g.users_movies_data_manager.add_user_movie(user_movie_info) is None:
+    added = g.users_movies_data_manager.add_user_movie(user_movie_info)
+    if added is False:
+        abort(400, ['Фильм уже добавлен в избранное'])
+    if added is None:
         abort(404)
 
     return redirect(url_for('users.get_user_movies', user_id=user_id))